@@ -1,36 +1,69 @@
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
-import os
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 
-def create_app():
+def init_migrate(app):
+    # Flask-Migrate imports Alembic, which only the flask CLI needs
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+def create_app(config=None):
     app = Flask(__name__, template_folder='../templates')
-    app.config['SECRET_KEY'] = os.urandom(24)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quiz_master.db'  # This is relative to the instance folder
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if config:
+        app.config.update(config)
+
+    # Signing keys shared by every worker and host (see app/sessions.py)
+    from app import sessions
+    sessions.init_app(app)
 
+    # Database URL comes from DATABASE_URL, defaulting to sqlite:///quiz_master.db
+    # (relative to the instance folder), with WAL and pooling set up for SQLite
+    from app.database import configure_database, init_engines
+    configure_database(app)
     db.init_app(app)
-    migrate = Migrate(app, db)
+    init_engines(app)
+    if click.get_current_context(silent=True) is not None:
+        init_migrate(app)
 
     login_manager.init_app(app)
     login_manager.login_view = 'login'
     login_manager.login_message_category = 'info'
-    
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app.quiz_cache import quiz_cache
+    from app.grading import answer_key_cache
+    from app.submissions import submission_queue
+    from app.instrumentation import request_metrics
+    from app.passwords import credential_service
+    from app.identity import identity_cache
+    from app.live import exam_monitor
+    from app.autosave import draft_store
+    from app import nplusone, fragments
+    from app.dashboards import data_cache
+    quiz_cache.init_app(app)
+    answer_key_cache.init_app(app)
+    submission_queue.init_app(app)
+    request_metrics.init_app(app)
+    credential_service.init_app(app)
+    identity_cache.init_app(app)
+    exam_monitor.init_app(app)
+    draft_store.init_app(app)
+    nplusone.init_app(app)
+    fragments.init_app(app)
+    data_cache.init_app(app)
+
+    # Creating an app doesn't touch the database: the schema and the default
+    # admin come from `flask init-db` and `flask db upgrade`, and the background
+    # writers start with the first request each process serves
     with app.app_context():
         from app import routes, models
-        db.create_all()
-        
-        # Create default admin if it doesn't exist
-        from app.models import Admin
-        admin = Admin.query.filter_by(username='admin').first()
-        if not admin:
-            admin = Admin(username='admin')
-            admin.set_password('admin123')
-            db.session.add(admin)
-            db.session.commit()
-    
+
     return app
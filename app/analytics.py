@@ -0,0 +1,115 @@
+from app import db
+from app.database import read_session
+from app.models import Subject, Chapter, Quiz, Score
+from app.leaderboard import score_percentage
+
+# Admin dashboard statistics computed from a fixed number of GROUP BY queries.
+# Scores are k/n fractions, so per-chapter histograms of distinct
+# (total_scored, total_questions) pairs stay small no matter how many attempts
+# exist; averages, medians and modes are derived from those histograms.
+
+def chapter_histograms():
+    # {chapter_id: {percentage: attempts}} in a single query
+    rows = read_session().query(
+        Quiz.chapter_id,
+        Score.total_scored,
+        Score.total_questions,
+        db.func.count(Score.id)
+    ).join(Quiz, Score.quiz_id == Quiz.id)\
+     .group_by(Quiz.chapter_id, Score.total_scored, Score.total_questions).all()
+
+    histograms = {}
+    for chapter_id, total_scored, total_questions, count in rows:
+        histogram = histograms.setdefault(chapter_id, {})
+        percentage = total_scored * 100.0 / total_questions
+        histogram[percentage] = histogram.get(percentage, 0) + count
+    return histograms
+
+def quiz_counts():
+    # {chapter_id: number of quizzes}
+    return dict(read_session().query(Quiz.chapter_id, db.func.count(Quiz.id))
+                .group_by(Quiz.chapter_id).all())
+
+def merge_histograms(histograms):
+    merged = {}
+    for histogram in histograms:
+        for value, count in histogram.items():
+            merged[value] = merged.get(value, 0) + count
+    return merged
+
+def summarize(histogram):
+    values = sorted(histogram)
+    total = sum(histogram.values())
+    avg = sum(value * histogram[value] for value in values) / total
+
+    # Median: walk cumulative counts to the middle position(s)
+    def value_at(position):
+        seen = 0
+        for value in values:
+            seen += histogram[value]
+            if position < seen:
+                return value
+    mid = total // 2
+    median = value_at(mid) if total % 2 else (value_at(mid - 1) + value_at(mid)) / 2
+
+    # Mode: most frequent value, lowest score wins ties
+    mode = max(values, key=lambda value: (histogram[value], -value))
+
+    return {
+        'avg_score': avg,
+        'median_score': median,
+        'mode_score': mode,
+        'total_attempts': total
+    }
+
+def subject_and_chapter_stats(subjects, chapters):
+    # Subject and chapter statistics for the admin dashboard, in the order of
+    # the given subjects/chapters, skipping those without attempts
+    histograms = chapter_histograms()
+    counts = quiz_counts()
+
+    chapters_by_subject = {}
+    for chapter in chapters:
+        chapters_by_subject.setdefault(chapter.subject_id, []).append(chapter)
+
+    subject_stats = []
+    for subject in subjects:
+        subject_chapters = chapters_by_subject.get(subject.id, [])
+        histogram = merge_histograms(histograms[c.id] for c in subject_chapters if c.id in histograms)
+        if histogram:
+            stats = summarize(histogram)
+            stats.update({
+                'subject': subject,
+                'num_quizzes': sum(counts.get(c.id, 0) for c in subject_chapters)
+            })
+            subject_stats.append(stats)
+
+    chapter_stats = []
+    for chapter in chapters:
+        if chapter.id in histograms:
+            stats = summarize(histograms[chapter.id])
+            del stats['mode_score']
+            stats.update({
+                'chapter': chapter,
+                'num_quizzes': counts.get(chapter.id, 0)
+            })
+            chapter_stats.append(stats)
+
+    return subject_stats, chapter_stats
+
+def student_subject_performance(user_ids=None):
+    # {user_id: {subject name: average percentage}} in a single query,
+    # for every student or only the given ones
+    query = read_session().query(
+        Score.user_id,
+        Subject.name,
+        db.func.avg(score_percentage)
+    ).join(Quiz, Score.quiz_id == Quiz.id).join(Chapter).join(Subject)
+    if user_ids is not None:
+        query = query.filter(Score.user_id.in_(user_ids))
+    rows = query.group_by(Score.user_id, Subject.id).all()
+
+    performance = {}
+    for user_id, subject_name, subject_avg in rows:
+        performance.setdefault(user_id, {})[subject_name] = subject_avg
+    return performance
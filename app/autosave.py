@@ -0,0 +1,289 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db, grading
+from app.live import exam_monitor
+from app.models import Quiz, Score, AttemptDraft, DraftAnswer
+from app.submissions import Submission, store_submission
+
+logger = logging.getLogger(__name__)
+
+# Attempts in progress. start_quiz opens a draft holding the attempt's start
+# and end time, and the quiz page autosaves answer changes as small deltas.
+# Neither is written by the request: both land in an in-process buffer that a
+# background thread writes every AUTOSAVE_FLUSH_MS milliseconds as one
+# transaction of multi-row upserts, one row per changed answer. Reads merge
+# the database with this process's buffer, and answer rows are per question,
+# so deltas taken by different workers never overwrite each other. A crash
+# loses at most one flush interval of clicks, which the browser still holds.
+#
+# Every AUTOSAVE_SWEEP_SECONDS the same thread submits drafts whose end time
+# passed more than AUTOSAVE_GRACE_SECONDS ago from their saved answers, so
+# students don't all have to post their answers at the deadline. Claiming a
+# draft deletes it, so only one worker finalizes each.
+
+class Draft:
+    __slots__ = ('quiz_id', 'user_id', 'started_at', 'ends_at')
+
+    def __init__(self, quiz_id, user_id, started_at, ends_at):
+        self.quiz_id = quiz_id
+        self.user_id = user_id
+        self.started_at = started_at
+        self.ends_at = ends_at
+
+def _upsert_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+def answer_fields(answers):
+    # {question id: option} as the answer_<question id> fields parse_answers reads
+    return {f'answer_{question_id}': str(option) for question_id, option in answers.items()}
+
+class DraftStore:
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._drafts = {}   # (quiz_id, user_id) -> Draft not yet written
+        self._answers = {}  # (quiz_id, user_id, question_id) -> option not yet written
+        self._writing = ({}, {})  # the batch being flushed, still visible to reads
+        self._thread = None
+        self._pid = None
+        self.flushes = 0
+        self.answers_written = 0
+        self.finalized = 0
+        self.last_flush_ms = 0.0
+
+    def init_app(self, app):
+        app.config.setdefault('AUTOSAVE_FLUSH_MS', 1000)
+        app.config.setdefault('AUTOSAVE_SWEEP_SECONDS', 15)
+        app.config.setdefault('AUTOSAVE_GRACE_SECONDS', 30)
+        app.config.setdefault('AUTOSAVE_SWEEP_BATCH', 200)
+        self._app = app
+        app.before_request(self.start)
+
+    def start(self):
+        # Start the flusher and sweeper of this process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._drafts.clear()
+            self._answers.clear()
+            self._thread = threading.Thread(target=self._run, name='autosave-writer', daemon=True)
+            self._thread.start()
+        atexit.register(self._shutdown)
+
+    def _shutdown(self):
+        if self._pid == os.getpid():
+            self.flush()
+
+    def get(self, quiz_id, user_id):
+        key = (quiz_id, user_id)
+        with self._lock:
+            draft = self._drafts.get(key) or self._writing[0].get(key)
+        if draft is not None:
+            return draft
+        row = db.session.get(AttemptDraft, key)
+        if row is None:
+            return None
+        return Draft(quiz_id, user_id, row.started_at, row.ends_at)
+
+    def begin(self, quiz_id, user_id, started_at, ends_at):
+        # The user's draft for this quiz, opened with these times unless one
+        # exists already
+        draft = self.get(quiz_id, user_id)
+        if draft is None:
+            draft = Draft(quiz_id, user_id, started_at, ends_at)
+            with self._lock:
+                draft = self._drafts.setdefault((quiz_id, user_id), draft)
+        return draft
+
+    def save(self, quiz_id, user_id, answers):
+        # Buffer answer deltas, {question id: option}
+        with self._lock:
+            for question_id, option in answers.items():
+                self._answers[(quiz_id, user_id, question_id)] = option
+
+    def saved_answers(self, quiz_id, user_id):
+        # {question id: option} from the database and the unwritten buffers
+        answers = dict(db.session.query(DraftAnswer.question_id, DraftAnswer.option)
+                       .filter_by(quiz_id=quiz_id, user_id=user_id))
+        with self._lock:
+            for buffer in (self._writing[1], self._answers):
+                for (buffered_quiz, buffered_user, question_id), option in buffer.items():
+                    if buffered_quiz == quiz_id and buffered_user == user_id:
+                        answers[question_id] = option
+        return answers
+
+    def discard(self, quiz_id, user_id):
+        # Drop a submitted draft: unwritten buffers now, its rows within the
+        # caller's transaction. Returns False if another worker deleted it first
+        with self._lock:
+            buffered = self._drafts.pop((quiz_id, user_id), None)
+            for key in [key for key in self._answers if key[:2] == (quiz_id, user_id)]:
+                del self._answers[key]
+        claimed = AttemptDraft.query.filter_by(quiz_id=quiz_id, user_id=user_id)\
+            .delete(synchronize_session=False)
+        DraftAnswer.query.filter_by(quiz_id=quiz_id, user_id=user_id).delete(synchronize_session=False)
+        return bool(claimed or buffered)
+
+    def flush(self):
+        # Write everything buffered so far in one transaction
+        with self._flush_lock:
+            with self._lock:
+                drafts, answers = self._drafts, self._answers
+                if not drafts and not answers:
+                    return
+                self._drafts, self._answers = {}, {}
+                self._writing = (drafts, answers)
+            start = time.perf_counter()
+            try:
+                with self._app.app_context():
+                    self._write(drafts, answers)
+            except Exception:
+                # Put the batch back under anything buffered since
+                with self._lock:
+                    self._drafts = {**drafts, **self._drafts}
+                    self._answers = {**answers, **self._answers}
+                raise
+            finally:
+                with self._lock:
+                    self._writing = ({}, {})
+            self.flushes += 1
+            self.answers_written += len(answers)
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def _write(self, drafts, answers):
+        # Rows of quizzes deleted since they were buffered are dropped; their
+        # foreign keys would fail the whole batch on every retry
+        quiz_ids = {quiz_id for quiz_id, _ in drafts} | {quiz_id for quiz_id, _, _ in answers}
+        existing = {quiz_id for quiz_id, in db.session.query(Quiz.id).filter(Quiz.id.in_(quiz_ids))}
+        drafts = {key: draft for key, draft in drafts.items() if key[0] in existing}
+        answers = {key: option for key, option in answers.items() if key[0] in existing}
+        draft_rows = [{'quiz_id': d.quiz_id, 'user_id': d.user_id, 'started_at': d.started_at,
+                       'ends_at': d.ends_at} for d in drafts.values()]
+        answer_rows = [{'quiz_id': quiz_id, 'user_id': user_id, 'question_id': question_id, 'option': option}
+                       for (quiz_id, user_id, question_id), option in answers.items()]
+        insert = _upsert_insert()
+        try:
+            if insert is None:
+                for row in draft_rows:
+                    if db.session.get(AttemptDraft, (row['quiz_id'], row['user_id'])) is None:
+                        db.session.add(AttemptDraft(**row))
+                for row in answer_rows:
+                    db.session.merge(DraftAnswer(**row))
+            else:
+                if draft_rows:
+                    # A draft another worker opened first keeps its times
+                    db.session.execute(insert(AttemptDraft).on_conflict_do_nothing(), draft_rows)
+                if answer_rows:
+                    statement = insert(DraftAnswer)
+                    db.session.execute(statement.on_conflict_do_update(
+                        index_elements=['quiz_id', 'user_id', 'question_id'],
+                        set_={'option': statement.excluded.option}), answer_rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _run(self):
+        config = self._app.config
+        next_sweep = time.monotonic() + config['AUTOSAVE_SWEEP_SECONDS']
+        while True:
+            time.sleep(config['AUTOSAVE_FLUSH_MS'] / 1000)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Autosave flush failed; will retry')
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + config['AUTOSAVE_SWEEP_SECONDS']
+                try:
+                    with self._app.app_context():
+                        self.finalize_expired(limit=config['AUTOSAVE_SWEEP_BATCH'])
+                except Exception:
+                    logger.exception('Finalizing expired drafts failed')
+
+    def finalize(self, draft):
+        # Submit a draft from its saved answers; returns the Score, or None if
+        # the attempt was already submitted or another worker claimed it. A
+        # queued submission claimed its draft when it was accepted
+        answers = self.saved_answers(draft.quiz_id, draft.user_id)
+        try:
+            if not self.discard(draft.quiz_id, draft.user_id):
+                db.session.rollback()
+                return None
+            quiz = db.session.get(Quiz, draft.quiz_id)
+            if quiz is None or Score.query.filter_by(quiz_id=draft.quiz_id, user_id=draft.user_id).first():
+                db.session.commit()
+                return None
+            key = grading.get_answer_key(quiz)
+            if not len(key):
+                db.session.commit()
+                return None
+            vector = grading.parse_answers(answer_fields(answers), key)
+            correct_answers = grading.grade(key, vector)
+            score = store_submission(Submission(
+                quiz_id=quiz.id,
+                user_id=draft.user_id,
+                content_version=quiz.content_version,
+                total_scored=correct_answers,
+                total_questions=len(key),
+                time_stamp_of_attempt=draft.ends_at,
+                time_taken=int((draft.ends_at - draft.started_at).total_seconds() / 60),
+                question_ids=key.question_ids,
+                options=key.options,
+                answers=vector
+            ))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+        self.finalized += 1
+        exam_monitor.record_submission(quiz.id, draft.user_id, correct_answers * 100.0 / len(key))
+        return score
+
+    def finalize_expired(self, now=None, limit=None):
+        # Submit drafts past their end time and grace period, oldest first;
+        # returns how many were submitted
+        now = now or datetime.now()
+        self.flush()
+        cutoff = now - timedelta(seconds=self._app.config['AUTOSAVE_GRACE_SECONDS'])
+        rows = AttemptDraft.query.filter(AttemptDraft.ends_at < cutoff)\
+            .order_by(AttemptDraft.ends_at).limit(limit).all()
+        drafts = [Draft(row.quiz_id, row.user_id, row.started_at, row.ends_at) for row in rows]
+        finalized = sum(self.finalize(draft) is not None for draft in drafts)
+        # Answers flushed after their attempt was submitted
+        DraftAnswer.query.filter(db.exists().where(
+            Score.quiz_id == DraftAnswer.quiz_id, Score.user_id == DraftAnswer.user_id
+        )).delete(synchronize_session=False)
+        db.session.commit()
+        return finalized
+
+    def stats(self):
+        with self._lock:
+            buffered = len(self._answers)
+        return {
+            'buffered_answers': buffered,
+            'flushes': self.flushes,
+            'answers_written': self.answers_written,
+            'finalized': self.finalized,
+            'last_flush_ms': round(self.last_flush_ms, 2)
+        }
+
+draft_store = DraftStore()
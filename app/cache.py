@@ -0,0 +1,337 @@
+import hashlib
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows: bumps are not serialized, but still change the value
+    fcntl = None
+
+# Caches behind the quiz payloads, answer keys and dashboard fragments and
+# data. Every entry is stored with a version (a quiz's content_version, the
+# fragment stamps), and a get asking for another version is a miss, so no
+# backend can serve a stale copy after an edit made by any worker.
+#
+# CACHE_BACKEND picks where the entries live:
+#
+#   memory  an LRU dict in each process (the default)
+#   sqlite  one SQLite file in WAL mode under CACHE_DIR, shared by every
+#           worker on the host, so an entry is built once per host instead of
+#           once per worker
+#   redis   a Redis server at CACHE_REDIS_URL, shared by every host
+#           (requires `pip install redis`; size it with maxmemory and an LRU
+#           maxmemory-policy)
+#
+# The memory and SQLite backends evict the least recently stored entries once
+# a cache holds more than its byte limit. Explicit invalidations (a deleted
+# quiz) are broadcast to every worker on the host through a generation counter
+# kept in a small memory-mapped file: a memory cache drops its entries when it
+# sees the counter change, which costs one read of shared memory per get.
+# The shared backends delete the entry itself.
+#
+# Entries of the shared backends are kept apart per database URI, and outlive
+# the processes that stored them: run `flask clear-cache` after restoring or
+# recreating the database.
+
+BACKENDS = ('memory', 'sqlite', 'redis')
+
+caches = []  # every Cache, for clear_all
+
+def cache_dir(app):
+    path = app.config.setdefault('CACHE_DIR', os.path.join(app.instance_path, 'cache'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+class GenerationCounter:
+    # Counter shared by the processes of a host through a memory-mapped file;
+    # each process remembers the last value it has seen
+
+    def __init__(self, path):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < 8:
+                os.ftruncate(fd, 8)
+            self._map = mmap.mmap(fd, 8)
+        finally:
+            os.close(fd)
+        self._path = path
+        self._seen = self.value()
+
+    def value(self):
+        return struct.unpack_from('<Q', self._map)[0]
+
+    def changed(self):
+        # True if another process bumped the counter since the last call
+        value = self.value()
+        if value == self._seen:
+            return False
+        self._seen = value
+        return True
+
+    def bump(self):
+        with open(self._path, 'rb') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            value = self.value() + 1
+            struct.pack_into('<Q', self._map, 0, value)
+        if value == self._seen + 1:
+            self._seen = value  # nobody else bumped in between
+        return value
+
+class MemoryBackend:
+    name = 'memory'
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (version, value, size)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, value, size):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (version, value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+    def usage(self):
+        # (entries, bytes)
+        with self._lock:
+            return len(self._entries), self._size
+
+class SQLiteBackend:
+    name = 'sqlite'
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cache_entry (cache TEXT NOT NULL, key TEXT NOT NULL, '
+        'version TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL, '
+        'PRIMARY KEY (cache, key))',
+        'CREATE INDEX IF NOT EXISTS ix_cache_entry_stored_at ON cache_entry (cache, stored_at)',
+        'CREATE TABLE IF NOT EXISTS cache_usage (cache TEXT PRIMARY KEY, bytes INTEGER NOT NULL)',
+    )
+
+    def __init__(self, path, cache, max_bytes):
+        self.path = path
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.evictions = 0
+        with self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        # One connection per thread, opened again after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key, version):
+        row = self._connect().execute('SELECT value FROM cache_entry WHERE cache = ? AND key = ? AND version = ?',
+                                      (self.cache, repr(key), repr(version))).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def put(self, key, version, value, size):
+        conn = self._connect()
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            old = conn.execute('SELECT size FROM cache_entry WHERE cache = ? AND key = ?',
+                               (self.cache, repr(key))).fetchone()
+            conn.execute('INSERT OR REPLACE INTO cache_entry VALUES (?, ?, ?, ?, ?, ?)',
+                         (self.cache, repr(key), repr(version), blob, size, time.time()))
+            conn.execute('INSERT INTO cache_usage VALUES (?, ?) ON CONFLICT (cache) '
+                         'DO UPDATE SET bytes = bytes + excluded.bytes',
+                         (self.cache, size - (old[0] if old else 0)))
+            used = conn.execute('SELECT bytes FROM cache_usage WHERE cache = ?', (self.cache,)).fetchone()[0]
+            while used > self.max_bytes:
+                oldest = conn.execute('SELECT key, size FROM cache_entry WHERE cache = ? '
+                                      'ORDER BY stored_at LIMIT 32', (self.cache,)).fetchall()
+                for oldest_key, oldest_size in oldest:
+                    if used <= self.max_bytes:
+                        break
+                    conn.execute('DELETE FROM cache_entry WHERE cache = ? AND key = ?', (self.cache, oldest_key))
+                    used -= oldest_size
+                    self.evictions += 1
+                conn.execute('UPDATE cache_usage SET bytes = ? WHERE cache = ?', (used, self.cache))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, key):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for size, in conn.execute('DELETE FROM cache_entry WHERE cache = ? AND key = ? RETURNING size',
+                                      (self.cache, repr(key))).fetchall():
+                conn.execute('UPDATE cache_usage SET bytes = bytes - ? WHERE cache = ?', (size, self.cache))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM cache_entry WHERE cache = ?', (self.cache,))
+        conn.execute('DELETE FROM cache_usage WHERE cache = ?', (self.cache,))
+        conn.execute('COMMIT')
+
+    def usage(self):
+        conn = self._connect()
+        entries = conn.execute('SELECT count(*) FROM cache_entry WHERE cache = ?', (self.cache,)).fetchone()[0]
+        used = conn.execute('SELECT bytes FROM cache_usage WHERE cache = ?', (self.cache,)).fetchone()
+        return entries, used[0] if used else 0
+
+class RedisBackend:
+    name = 'redis'
+
+    def __init__(self, url, cache, prefix='quiz_master:', ttl=None):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = f'{prefix}{cache}:'
+        self.ttl = ttl or None
+        self.evictions = 0  # done by the server
+
+    def get(self, key, version):
+        raw = self._client.get(self._prefix + repr(key))
+        if raw is None:
+            return None
+        stored_version, value = pickle.loads(raw)
+        return value if stored_version == repr(version) else None
+
+    def put(self, key, version, value, size):
+        self._client.set(self._prefix + repr(key), pickle.dumps((repr(version), value), pickle.HIGHEST_PROTOCOL),
+                         ex=self.ttl)
+
+    def delete(self, key):
+        self._client.delete(self._prefix + repr(key))
+
+    def clear(self):
+        keys = list(self._client.scan_iter(self._prefix + '*', count=1000))
+        for start in range(0, len(keys), 1000):
+            self._client.unlink(*keys[start:start + 1000])
+
+    def usage(self):
+        # Not tracked per cache; see the server's INFO memory
+        return None, None
+
+class Cache:
+
+    def __init__(self, name, config_key, max_bytes=32 * 1024 * 1024):
+        self.name = name
+        self.config_key = config_key
+        self.max_bytes = max_bytes
+        self.backend = MemoryBackend(max_bytes)
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        caches.append(self)
+
+    def init_app(self, app):
+        self.max_bytes = app.config.setdefault(self.config_key, self.max_bytes)
+        backend = app.config.setdefault('CACHE_BACKEND', os.environ.get('CACHE_BACKEND', 'memory'))
+        if backend not in BACKENDS:
+            raise ValueError(f'CACHE_BACKEND must be one of {", ".join(BACKENDS)}, not {backend!r}')
+        directory = cache_dir(app)
+        database = hashlib.sha1(app.config.get('SQLALCHEMY_DATABASE_URI', '').encode()).hexdigest()[:8]
+        namespace = f'{self.name}@{database}'
+        if backend == 'sqlite':
+            self.backend = SQLiteBackend(os.path.join(directory, 'cache.db'), namespace, self.max_bytes)
+        elif backend == 'redis':
+            url = app.config.setdefault('CACHE_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+            prefix = app.config.setdefault('CACHE_KEY_PREFIX', 'quiz_master:')
+            try:
+                self.backend = RedisBackend(url, namespace, prefix, app.config.get('CACHE_REDIS_TTL'))
+            except ImportError:
+                raise RuntimeError('CACHE_BACKEND=redis requires the redis package (pip install redis)') from None
+        else:
+            self.backend = MemoryBackend(self.max_bytes)
+            self._generation = GenerationCounter(os.path.join(directory, f'{self.name}.generation'))
+
+    def _sync(self):
+        # Drop this process's entries if another worker invalidated any
+        if self._generation is not None and self._generation.changed():
+            self.backend.clear()
+
+    def get(self, key, version):
+        # The value stored for key at this version, or None
+        self._sync()
+        value = self.backend.get(key, version)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key, version, value, size):
+        if size > self.max_bytes:
+            self.backend.delete(key)
+            return
+        self.backend.put(key, version, value, size)
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+        self._broadcast()
+
+    def clear(self):
+        self.backend.clear()
+        self._broadcast()
+
+    def _broadcast(self):
+        if self._generation is not None:
+            self._sync()
+            self._generation.bump()
+
+    def stats(self):
+        entries, used = self.backend.usage()
+        return {
+            'backend': self.backend.name,
+            'entries': entries,
+            'bytes': used,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions
+        }
+
+def clear_all():
+    # Empty every cache, on every backend and in every worker of the host
+    for cache in caches:
+        cache.clear()
@@ -0,0 +1,183 @@
+import os
+
+import click
+from flask.cli import with_appcontext
+
+def init_database(admin_password='admin123'):
+    # Create the schema of an empty database, stamped with the latest
+    # migration, and the default admin if missing. Returns (schema created,
+    # admin created)
+    from flask import current_app
+    from app import db, init_migrate
+    from app.models import Admin
+    created_schema = not db.inspect(db.engine).get_table_names()
+    if created_schema:
+        from flask_migrate import stamp
+        from app.cache import clear_all
+        init_migrate(current_app)
+        db.create_all()
+        stamp()
+        clear_all()  # entries a shared cache kept for an earlier database
+    created_admin = Admin.query.filter_by(username='admin').first() is None
+    if created_admin:
+        admin = Admin(username='admin')
+        admin.set_password(admin_password)
+        db.session.add(admin)
+        db.session.commit()
+    return created_schema, created_admin
+
+@click.command('init-db')
+@click.option('--admin-password', default='admin123', show_default=True,
+              help='Password of the default admin, if it has to be created.')
+@with_appcontext
+def init_db_command(admin_password):
+    """Create the schema of an empty database and the default admin."""
+    created_schema, created_admin = init_database(admin_password)
+    click.echo('Database schema created.' if created_schema else
+               'Database schema exists; apply new migrations with `flask db upgrade`.')
+    click.echo('Default admin account created.' if created_admin else 'Admin account already exists.')
+
+@click.command('clear-cache')
+@with_appcontext
+def clear_cache_command():
+    """Empty the quiz, answer key and dashboard caches of every worker."""
+    from app.cache import caches, clear_all
+    clear_all()
+    click.echo(f'Cleared {len(caches)} caches.')
+
+@click.command('rotate-secret-key')
+@click.option('--keep', default=3, show_default=True, help='Keys to keep in the ring, the new one included.')
+@with_appcontext
+def rotate_secret_key_command(keep):
+    """Put a new key in front of the session signing key ring."""
+    from flask import current_app
+    from app.sessions import new_secret_key, rotate_secret_keys
+    path = current_app.config.get('SECRET_KEY_FILE')
+    if not path or not os.path.exists(path):
+        # The ring comes from SECRET_KEYS / SECRET_KEY in the config or environment
+        click.echo(f'Keys are not read from a key file. Prepend this key to SECRET_KEYS on every host:\n'
+                   f'{new_secret_key()}')
+        return
+    keys = rotate_secret_keys(current_app, keep)
+    click.echo(f'Wrote {path} with {len(keys)} keys. Copy it to every host and restart the workers; '
+               'sessions signed with a dropped key end.')
+
+@click.command('rebuild-leaderboard')
+@with_appcontext
+def rebuild_leaderboard_command():
+    """Recompute the leaderboard aggregates from the score table."""
+    from app import db, fragments, leaderboard
+    count = leaderboard.rebuild()
+    fragments.bump('scores')
+    db.session.commit()
+    click.echo(f'Leaderboard rebuilt for {count} students.')
+
+@click.command('rebuild-rollups')
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), help='First attempt day to rebuild.')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), help='Last attempt day to rebuild.')
+@with_appcontext
+def rebuild_rollups_command(date_from, date_to):
+    """Recompute the hourly attempt rollups from the score table."""
+    from datetime import timedelta
+    from app import db, fragments, rollups
+    count = rollups.rebuild(date_from, date_to + timedelta(days=1) if date_to else None)
+    fragments.bump('scores')
+    db.session.commit()
+    click.echo(f'Rebuilt {count} hourly rollups.')
+
+@click.command('finalize-attempts')
+@with_appcontext
+def finalize_attempts_command():
+    """Submit expired in-progress attempts from their autosaved answers."""
+    from app.autosave import draft_store
+    count = draft_store.finalize_expired()
+    click.echo(f'Submitted {count} expired attempts.')
+
+@click.command('analyze-items')
+@click.option('--quiz-id', type=int, help='Analyze a single quiz.')
+@click.option('--all', 'analyze_all', is_flag=True, help='Reanalyze every quiz, not just stale ones.')
+@with_appcontext
+def analyze_items_command(quiz_id, analyze_all):
+    """Compute per-question item statistics from stored attempt responses."""
+    from app import db, item_analysis
+    from app.models import AttemptResponse
+    if quiz_id is not None:
+        quiz_ids = [quiz_id]
+    elif analyze_all:
+        quiz_ids = [quiz_id for quiz_id, in db.session.query(AttemptResponse.quiz_id).distinct()]
+    else:
+        quiz_ids = item_analysis.stale_quiz_ids()
+    for quiz_id in quiz_ids:
+        analysis = item_analysis.analyze_quiz(quiz_id)
+        db.session.commit()
+        click.echo(f'Quiz {quiz_id}: analyzed {analysis.attempt_count} attempts.')
+    if not quiz_ids:
+        click.echo('Item statistics are up to date.')
+
+@click.command('import-questions')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--quiz-id', type=int, help='Import every row into this quiz instead of using a quiz_id column.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per INSERT and transaction.')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False), help='Write rejected rows to this CSV file.')
+@with_appcontext
+def import_questions_command(path, quiz_id, fmt, chunk_size, errors_path):
+    """Bulk import questions from a CSV or JSON Lines file."""
+    from app import question_import
+    fmt = fmt or question_import.detect_format(path)
+
+    def progress(report):
+        click.echo(f'\r{report.imported} imported, {report.error_count} rejected', nl=False)
+
+    with open(path, 'rb') as stream:
+        report = question_import.import_questions(stream, fmt, quiz_id=quiz_id,
+                                                  chunk_size=chunk_size, progress=progress)
+    click.echo()
+    for line, message in report.errors[:20]:
+        click.echo(f'line {line}: {message}', err=True)
+    if report.error_count > 20:
+        click.echo(f'... and {report.error_count - 20} more rejected rows', err=True)
+    if errors_path:
+        with open(errors_path, 'w', newline='', encoding='utf-8') as out:
+            question_import.write_error_report(report, out)
+        click.echo(f'Rejected rows written to {errors_path}.')
+
+@click.command('export-scores')
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'parquet']), help='Defaults to the file extension.')
+@click.option('--subject-id', type=int)
+@click.option('--chapter-id', type=int)
+@click.option('--quiz-id', type=int)
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), help='First attempt day included.')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), help='Last attempt day included.')
+@with_appcontext
+def export_scores_command(path, fmt, subject_id, chapter_id, quiz_id, date_from, date_to):
+    """Export scores joined to students, quizzes, chapters and subjects."""
+    from datetime import timedelta
+    from app import exports
+    fmt = fmt or ('parquet' if path.endswith('.parquet') else 'csv')
+    query = exports.score_export_query(subject_id=subject_id, chapter_id=chapter_id, quiz_id=quiz_id,
+                                       date_from=date_from,
+                                       date_to=date_to + timedelta(days=1) if date_to else None)
+    if fmt == 'parquet':
+        if not exports.parquet_available():
+            raise click.UsageError('Parquet export requires pyarrow (pip install pyarrow).')
+        count = exports.write_parquet(query, path)
+    else:
+        count = -1  # header
+        with open(path, 'w', newline='', encoding='utf-8') as out:
+            for chunk in exports.iter_csv(query):
+                out.write(chunk)
+                count += chunk.count('\n')
+    click.echo(f'Exported {count} scores to {path}.')
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(clear_cache_command)
+    app.cli.add_command(rotate_secret_key_command)
+    app.cli.add_command(rebuild_leaderboard_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(finalize_attempts_command)
+    app.cli.add_command(analyze_items_command)
+    app.cli.add_command(import_questions_command)
+    app.cli.add_command(export_scores_command)
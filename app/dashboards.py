@@ -0,0 +1,102 @@
+import json
+from datetime import datetime
+
+from app import db, fragments, leaderboard
+from app.cache import Cache
+from app.leaderboard import score_percentage
+from app.listings import question_counts
+from app.models import Subject, Chapter, Quiz, Score
+
+# Student dashboard data shared by user_dashboard and the /api JSON
+# endpoints. Each section is computed once per version of the data it
+# depends on (see app/fragments.py) and kept per process, so the HTML page
+# and the API serve the same cached values. The ETag of a section is derived
+# from those versions alone: a client holding the current one gets a 304
+# before anything is computed.
+
+data_cache = Cache('dashboard_data', 'DASHBOARD_DATA_CACHE_MAX_BYTES', max_bytes=16 * 1024 * 1024)
+
+def _overview(user_id):
+    percentages = [scored * 100.0 / total for scored, total in
+                   db.session.query(Score.total_scored, Score.total_questions)
+                   .filter(Score.user_id == user_id)
+                   .order_by(Score.time_stamp_of_attempt.desc())]
+    if not percentages:
+        return {'total_attempts': 0, 'avg_score': 0, 'personal_best': 0, 'recent_avg': 0}
+    recent = percentages[:5]
+    return {
+        'total_attempts': len(percentages),
+        'avg_score': sum(percentages) / len(percentages),
+        'personal_best': max(percentages),
+        'recent_avg': sum(recent) / len(recent)
+    }
+
+def _performance(user_id):
+    # Per subject, then per chapter, in id order
+    rows = db.session.query(Subject.id, Subject.name, Chapter.id, Chapter.name, score_percentage)\
+        .select_from(Score).join(Quiz).join(Chapter).join(Subject)\
+        .filter(Score.user_id == user_id).order_by(Subject.id, Chapter.id).all()
+    subjects = {}
+    for subject_id, subject_name, chapter_id, chapter_name, percentage in rows:
+        subject = subjects.setdefault(subject_id, {'id': subject_id, 'name': subject_name, 'chapters': {}})
+        subject['chapters'].setdefault(chapter_id, (chapter_name, []))[1].append(percentage)
+
+    performance = []
+    for subject in subjects.values():
+        scores = [p for _, chapter_scores in subject['chapters'].values() for p in chapter_scores]
+        performance.append({
+            'subject': {'id': subject['id'], 'name': subject['name']},
+            'avg_score': sum(scores) / len(scores),
+            'best_score': max(scores),
+            'total_attempts': len(scores),
+            'chapters': [{
+                'chapter': {'id': chapter_id, 'name': chapter_name},
+                'avg_score': sum(chapter_scores) / len(chapter_scores),
+                'attempts': len(chapter_scores)
+            } for chapter_id, (chapter_name, chapter_scores) in subject['chapters'].items()]
+        })
+    return performance
+
+def _available_quizzes(user_id):
+    # Quizzes that haven't started yet; the same for every student
+    rows = db.session.query(Quiz.id, Quiz.date_of_quiz, Quiz.time_duration, Chapter.name, Subject.name)\
+        .select_from(Quiz).join(Chapter).join(Subject)\
+        .filter(Quiz.date_of_quiz > datetime.now()).order_by(Quiz.id).all()
+    counts = question_counts([quiz_id for quiz_id, *_ in rows])
+    return [{
+        'id': quiz_id,
+        'subject_name': subject_name,
+        'chapter_name': chapter_name,
+        'date_of_quiz': date_of_quiz.isoformat(timespec='minutes'),
+        'time_duration': time_duration,
+        'question_count': counts.get(quiz_id, 0)
+    } for quiz_id, date_of_quiz, time_duration, chapter_name, subject_name in rows]
+
+SECTIONS = {
+    # name: (dependencies, per student, loader)
+    'overview': (('user_scores',), True, _overview),
+    'performance': (('user_scores', 'subjects', 'chapters'), True, _performance),
+    'ranking': (('scores', 'students'), True, leaderboard.get_ranking),
+    'available_quizzes': (('subjects', 'chapters', 'quizzes', 'minute'), False, _available_quizzes),
+}
+
+def _cache_key(name, user_id):
+    return name, (user_id if SECTIONS[name][1] else None)
+
+def version(name):
+    # Versions of the section's dependencies, for the current user
+    current = fragments.stamps()
+    return tuple(current[dependency] for dependency in SECTIONS[name][0])
+
+def etag(name, user_id):
+    return fragments.etag(_cache_key(name, user_id), version(name))
+
+def get(name, user_id):
+    # Section data of the current user, computed once per version
+    key = _cache_key(name, user_id)
+    current = version(name)
+    value = data_cache.get(key, current)
+    if value is None:
+        value = SECTIONS[name][2](user_id)
+        data_cache.put(key, current, value, len(json.dumps(value)))
+    return value
@@ -0,0 +1,100 @@
+import os
+
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+
+# Engine configuration for create_app. SQLite connections are tuned with WAL
+# journaling and pragmas applied on every new connection; a server database
+# can be selected with the DATABASE_URL environment variable. An optional
+# "reader" bind gives long read-only queries (dashboards, exports) their own
+# pool so they never hold a writer connection.
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,       # ms to wait on a locked database before failing
+    'cache_size': -64000,       # negative means KiB, i.e. 64 MB of page cache
+    'mmap_size': 268435456,     # 256 MB memory-mapped I/O
+    'temp_store': 'MEMORY',
+}
+
+def _database_url(name, default=None):
+    url = os.environ.get(name, default)
+    # Some hosting providers still hand out the pre-SQLAlchemy-1.4 scheme
+    if url and url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def configure_database(app):
+    # Fill in database settings before db.init_app; explicit config wins
+    config = app.config
+    config.setdefault('SQLALCHEMY_DATABASE_URI', _database_url('DATABASE_URL', 'sqlite:///quiz_master.db'))
+    config.setdefault('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    is_sqlite = uri.startswith('sqlite')
+    if is_sqlite and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri):
+        # In-memory databases live in a single connection; nothing to pool or split
+        return
+    if is_sqlite:
+        engine_options = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+            'pool_timeout': 30,
+        }
+    else:
+        engine_options = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': 30,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        }
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options)
+
+    # Read-only bind: an explicit replica URL, or a second pool on the same
+    # SQLite file (WAL lets readers run alongside the writer)
+    read_url = _database_url('DATABASE_READ_URL')
+    if read_url is None and is_sqlite and config.get('SQLITE_READ_POOL', True):
+        read_url = config['SQLALCHEMY_DATABASE_URI']
+    if read_url:
+        read_options = dict(config['SQLALCHEMY_ENGINE_OPTIONS'])
+        read_options['pool_size'] = int(os.environ.get('DB_READ_POOL_SIZE', read_options['pool_size'] * 2))
+        config.setdefault('SQLALCHEMY_BINDS', {})
+        config['SQLALCHEMY_BINDS'].setdefault('reader', {'url': read_url, **read_options})
+
+def init_engines(app):
+    # Attach per-connection setup to the engines created by db.init_app
+    pragmas = app.config['SQLITE_PRAGMAS']
+    with app.app_context():
+        for name, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite':
+                _install_sqlite_pragmas(engine, pragmas, read_only=(name == 'reader'))
+
+    @app.teardown_appcontext
+    def close_read_session(exc):
+        session = g.pop('read_session', None)
+        if session is not None:
+            session.close()
+
+def _install_sqlite_pragmas(engine, pragmas, read_only):
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+
+def read_session():
+    # Session on the reader bind for the current app context, falling back to
+    # the regular session when no reader is configured
+    if 'reader' not in db.engines:
+        return db.session
+    if 'read_session' not in g:
+        g.read_session = Session(db.engines['reader'])
+    return g.read_session
@@ -0,0 +1,90 @@
+import csv
+import io
+
+from app import db
+from app.database import read_session
+from app.models import User, Subject, Chapter, Quiz, Score
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional: pip install pyarrow
+    pa = None
+
+# Score exports for institutional reporting: every attempt joined to its
+# student, quiz, chapter and subject. Rows are streamed from the reader bind
+# with yield_per, so memory stays constant however many attempts match; CSV
+# is produced chunk by chunk and Parquet is written one row group per chunk.
+
+COLUMNS = ('score_id', 'user_id', 'email', 'full_name', 'subject', 'chapter', 'quiz_id',
+           'quiz_date', 'total_scored', 'total_questions', 'percentage', 'attempted_at', 'time_taken')
+
+CHUNK_ROWS = 5000
+
+def parquet_available():
+    return pa is not None
+
+def score_export_query(subject_id=None, chapter_id=None, quiz_id=None, date_from=None, date_to=None):
+    # date_from is inclusive, date_to exclusive, both on the attempt time
+    query = db.select(
+        Score.id, Score.user_id, User.email, User.full_name, Subject.name, Chapter.name,
+        Score.quiz_id, Quiz.date_of_quiz, Score.total_scored, Score.total_questions,
+        db.func.round(Score.total_scored * 100.0 / Score.total_questions, 2),
+        Score.time_stamp_of_attempt, Score.time_taken
+    ).join(User, Score.user_id == User.id)\
+     .join(Quiz, Score.quiz_id == Quiz.id)\
+     .join(Chapter, Quiz.chapter_id == Chapter.id)\
+     .join(Subject, Chapter.subject_id == Subject.id)
+    if subject_id is not None:
+        query = query.where(Chapter.subject_id == subject_id)
+    if chapter_id is not None:
+        query = query.where(Quiz.chapter_id == chapter_id)
+    if quiz_id is not None:
+        query = query.where(Score.quiz_id == quiz_id)
+    if date_from is not None:
+        query = query.where(Score.time_stamp_of_attempt >= date_from)
+    if date_to is not None:
+        query = query.where(Score.time_stamp_of_attempt < date_to)
+    return query.order_by(Score.id)
+
+def iter_score_chunks(query, chunk_rows=CHUNK_ROWS):
+    # Lists of rows, chunk_rows at a time, from a server-side cursor
+    result = read_session().execute(query.execution_options(yield_per=chunk_rows, stream_results=True))
+    for partition in result.partitions():
+        yield partition
+
+def iter_csv(query, chunk_rows=CHUNK_ROWS):
+    # CSV text, one string per chunk of rows, header first
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for chunk in iter_score_chunks(query, chunk_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)  # datetimes print as "YYYY-MM-DD HH:MM:SS"
+        yield buffer.getvalue()
+
+def _parquet_schema():
+    return pa.schema([
+        ('score_id', pa.int64()), ('user_id', pa.int64()), ('email', pa.string()),
+        ('full_name', pa.string()), ('subject', pa.string()), ('chapter', pa.string()),
+        ('quiz_id', pa.int64()), ('quiz_date', pa.timestamp('us')), ('total_scored', pa.int32()),
+        ('total_questions', pa.int32()), ('percentage', pa.float64()),
+        ('attempted_at', pa.timestamp('us')), ('time_taken', pa.int32())
+    ])
+
+def write_parquet(query, sink, chunk_rows=CHUNK_ROWS):
+    # Write the export to a path or binary file object; returns the row count
+    if pa is None:
+        raise RuntimeError('Parquet export requires pyarrow')
+    schema = _parquet_schema()
+    count = 0
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for chunk in iter_score_chunks(query, chunk_rows):
+            columns = list(zip(*chunk))
+            writer.write_batch(pa.record_batch(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema), row_group_size=chunk_rows)
+            count += len(chunk)
+    return count
@@ -0,0 +1,123 @@
+import hashlib
+from datetime import datetime
+
+from flask import g
+from flask_login import current_user
+from markupsafe import Markup
+
+from app import db
+from app.cache import Cache
+from app.models import CacheStamp, Score, User
+
+# Rendered dashboard sections. A template wraps a section in
+#
+#     {% call cached_fragment('admin_subject_stats', 'subjects', 'scores') %}...{% endcall %}
+#
+# and the HTML is kept per process, keyed by the fragment name (plus an
+# optional key) and tagged with the current version of each dependency, so a
+# section is only rendered again when something it shows has changed. Routes
+# pass the section data through LazyData so a section served from the cache
+# doesn't run its queries either.
+#
+# Dependencies:
+#   subjects, chapters, quizzes  stamps bumped by the admin routes that edit them
+#   scores                       newest score id, plus a stamp for rebuilds and
+#                                deletions
+#   students                     newest user id
+#   user_scores                  the current student's number of scores and
+#                                newest score id, plus the scores stamp, so
+#                                scores removed by a cascading delete count
+#   minute                       the current minute, for sections that depend
+#                                on the clock
+#
+# All versions are read with one query per request. Stamps live in the
+# database, so an edit made through any worker dirties every worker's copy.
+
+fragment_cache = Cache('fragments', 'FRAGMENT_CACHE_MAX_BYTES', max_bytes=32 * 1024 * 1024)
+
+def _upsert_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+def bump(*names):
+    # Dirty every fragment depending on these stamps; runs inside the
+    # caller's transaction
+    insert = _upsert_insert()
+    if insert is None:
+        for name in names:
+            if not CacheStamp.query.filter_by(name=name).update(
+                    {CacheStamp.version: CacheStamp.version + 1}, synchronize_session=False):
+                db.session.add(CacheStamp(name=name, version=1))
+        return
+    statement = insert(CacheStamp).values([{'name': name, 'version': 1} for name in names])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['name'], set_={'version': CacheStamp.version + 1}))
+
+def stamps():
+    # Dependency versions for this request, read once
+    if 'fragment_stamps' not in g:
+        selects = [
+            db.select(CacheStamp.name, CacheStamp.version),
+            db.select(db.literal('latest_score'), db.func.max(Score.id)),
+            db.select(db.literal('latest_student'), db.func.max(User.id)),
+        ]
+        if current_user.is_authenticated and not current_user.is_admin():
+            selects += [
+                db.select(db.literal('user_scores'), db.func.max(Score.id))
+                  .where(Score.user_id == current_user.id),
+                db.select(db.literal('user_score_count'), db.func.count(Score.id))
+                  .where(Score.user_id == current_user.id),
+            ]
+        versions = dict(db.session.execute(db.union_all(*selects)).all())
+        g.fragment_stamps = {
+            'subjects': versions.get('subjects'),
+            'chapters': versions.get('chapters'),
+            'quizzes': versions.get('quizzes'),
+            'scores': (versions.get('scores'), versions.get('latest_score')),
+            'students': versions.get('latest_student'),
+            'user_scores': (versions.get('scores'), versions.get('user_score_count'), versions.get('user_scores')),
+            'minute': datetime.now().strftime('%Y-%m-%d %H:%M'),
+        }
+    return g.fragment_stamps
+
+def etag(*parts):
+    # Strong validator for a response built from these parts and versions
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def cached_fragment(name, *dependencies, key=None, caller=None):
+    # Template global, used with {% call %}: the cached HTML of the block, or
+    # the block rendered now and cached
+    current = stamps()
+    version = tuple(current[dependency] for dependency in dependencies)
+    cache_key = (name, key)
+    html = fragment_cache.get(cache_key, version)
+    if html is None:
+        html = Markup(caller())
+        fragment_cache.put(cache_key, version, html, len(html.encode('utf-8')))
+    return html
+
+class LazyData:
+    # Template values loaded on first use
+
+    def __init__(self, **loaders):
+        self._loaders = loaders
+        self._values = {}
+
+    def __getattr__(self, name):
+        loaders = self.__dict__['_loaders']
+        if name not in loaders:
+            raise AttributeError(name)
+        values = self.__dict__['_values']
+        if name not in values:
+            values[name] = loaders[name]()
+        return values[name]
+
+def init_app(app):
+    fragment_cache.init_app(app)
+    app.add_template_global(cached_fragment)
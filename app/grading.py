@@ -0,0 +1,53 @@
+from operator import eq
+
+from app import db
+from app.cache import Cache
+from app.models import Question
+
+# Answer keys are kept as one byte per question (the correct option, 1-4) in
+# question id order, together with the matching question ids. A submission is
+# parsed into the same layout (0 for unanswered or invalid) and graded with a
+# single element-wise comparison. Keys are tagged with Quiz.content_version,
+# so edits made by any worker are picked up on the next lookup.
+
+answer_key_cache = Cache('answer_keys', 'ANSWER_KEY_CACHE_MAX_BYTES', max_bytes=8 * 1024 * 1024)
+
+class AnswerKey:
+    __slots__ = ('question_ids', 'options')
+
+    def __init__(self, question_ids, options):
+        self.question_ids = tuple(question_ids)
+        self.options = bytes(options)
+
+    def __len__(self):
+        return len(self.options)
+
+def load_answer_key(quiz_id):
+    rows = db.session.query(Question.id, Question.correct_option)\
+        .filter(Question.quiz_id == quiz_id).order_by(Question.id).all()
+    return AnswerKey([question_id for question_id, _ in rows],
+                     [correct_option for _, correct_option in rows])
+
+def get_answer_key(quiz):
+    key = answer_key_cache.get(quiz.id, quiz.content_version)
+    if key is None:
+        key = load_answer_key(quiz.id)
+        answer_key_cache.put(quiz.id, quiz.content_version, key, 9 * len(key))
+    return key
+
+def parse_answers(form, key):
+    # Answer vector aligned with the key from answer_<question id> form fields
+    answers = bytearray(len(key))
+    for i, question_id in enumerate(key.question_ids):
+        value = form.get(f'answer_{question_id}')
+        if value in ('1', '2', '3', '4'):
+            answers[i] = int(value)
+    return bytes(answers)
+
+def grade(key, answers):
+    return sum(map(eq, key.options, answers))
+
+def grade_many(key, answer_vectors):
+    # Batch regrade, e.g. after an answer-key correction
+    options = key.options
+    return [sum(map(eq, options, answers)) for answers in answer_vectors]
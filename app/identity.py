@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from app import db, login_manager
+from app.cache import GenerationCounter, cache_dir
+from app.models import User, Admin
+
+# current_user for every authenticated request. Instead of loading the full
+# User or Admin row on each request, the user loader returns a small immutable
+# Identity kept in a per-process LRU cache. Entries expire after
+# IDENTITY_CACHE_TTL seconds so changes made on other hosts are picked up. A
+# worker that updates or deletes the row drops its entry at once and bumps a
+# host-wide generation counter, which makes the other workers on the host
+# drop all of theirs (see app/cache.py).
+
+class Identity:
+    __slots__ = ('id', 'role', 'display_name')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, role, display_name):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'role', role)
+        object.__setattr__(self, 'display_name', display_name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Identity is read-only')
+
+    def __eq__(self, other):
+        return isinstance(other, Identity) and (self.role, self.id) == (other.role, other.id)
+
+    def __hash__(self):
+        return hash((self.role, self.id))
+
+    def __repr__(self):
+        return f'<Identity {self.role} {self.id}>'
+
+    def get_id(self):
+        # Admin ids carry a prefix so they never collide with student ids
+        return f'admin_{self.id}' if self.role == 'admin' else str(self.id)
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+class IdentityCache:
+
+    def __init__(self, max_entries=4096, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (role, id) -> (expires_at, identity)
+        self._lock = threading.Lock()
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.setdefault('IDENTITY_CACHE_SIZE', self.max_entries)
+        self.ttl = app.config.setdefault('IDENTITY_CACHE_TTL', self.ttl)
+        self._generation = GenerationCounter(os.path.join(cache_dir(app), 'identity.generation'))
+
+    def _sync(self):
+        if self._generation is not None and self._generation.changed():
+            self.clear()
+
+    def get(self, key):
+        self._sync()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, identity):
+        key = (identity.role, identity.id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, role, id):
+        with self._lock:
+            if self._entries.pop((role, id), None) is not None:
+                self.invalidations += 1
+        if self._generation is not None:
+            self._sync()
+            self._generation.bump()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+identity_cache = IdentityCache()
+
+def identity_for(account):
+    # Identity for login_user; also warms the cache for the requests that follow
+    if isinstance(account, Admin):
+        identity = Identity(account.id, 'admin', account.username)
+    else:
+        identity = Identity(account.id, 'student', account.full_name)
+    identity_cache.put(identity)
+    return identity
+
+def _load_identity(role, id):
+    if role == 'admin':
+        row = db.session.execute(db.select(Admin.username).where(Admin.id == id)).first()
+    else:
+        row = db.session.execute(db.select(User.full_name).where(User.id == id)).first()
+    return Identity(id, role, row[0]) if row is not None else None
+
+@login_manager.user_loader
+def load_user(user_id):
+    prefix, _, number = user_id.rpartition('_')
+    if prefix not in ('', 'admin'):
+        return None
+    role = 'admin' if prefix else 'student'
+    try:
+        id = int(number)
+    except ValueError:
+        return None
+    identity = identity_cache.get((role, id))
+    if identity is None:
+        identity = _load_identity(role, id)
+        if identity is not None:
+            identity_cache.put(identity)
+    return identity
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    identity_cache.invalidate('student', target.id)
+
+@event.listens_for(Admin, 'after_update')
+@event.listens_for(Admin, 'after_delete')
+def _invalidate_admin(mapper, connection, target):
+    identity_cache.invalidate('admin', target.id)
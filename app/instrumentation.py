@@ -0,0 +1,266 @@
+import cProfile
+import os
+import random
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+from app import db
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # pyinstrument is optional; cProfile is always available
+    PyinstrumentProfiler = None
+
+# Per-endpoint request metrics: wall time, number of SQL statements and the
+# time spent in them, ORM rows loaded, and template render time. Counters are
+# kept per process and exposed in the Prometheus text format at /metrics and
+# on the admin performance page.
+#
+# With PROFILE_SAMPLE_RATE > 0 a sample of requests also runs under a
+# profiler; samples slower than PROFILE_SLOW_MS are written to PROFILE_DIR
+# (.prof files from cProfile, or speedscope JSON when PROFILER=pyinstrument)
+# for flame-graph tools such as snakeviz, flameprof or speedscope.
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class EndpointStats:
+    __slots__ = ('requests', 'errors', 'wall_time', 'max_wall_time', 'sql_count',
+                 'sql_time', 'rows', 'template_time', 'buckets')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.wall_time = 0.0
+        self.max_wall_time = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.rows = 0
+        self.template_time = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def as_dict(self):
+        n = max(self.requests, 1)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_ms': self.wall_time * 1000 / n,
+            'max_ms': self.max_wall_time * 1000,
+            'total_s': self.wall_time,
+            'avg_sql': self.sql_count / n,
+            'avg_sql_ms': self.sql_time * 1000 / n,
+            'avg_rows': self.rows / n,
+            'avg_template_ms': self.template_time * 1000 / n
+        }
+
+class RequestMetrics:
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self.started_at = time.time()
+        self.profiles_written = 0
+
+    def init_app(self, app):
+        app.config.setdefault('INSTRUMENTATION_ENABLED', True)
+        app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+        app.config.setdefault('PROFILE_SAMPLE_RATE', float(os.environ.get('PROFILE_SAMPLE_RATE', 0)))
+        app.config.setdefault('PROFILE_SLOW_MS', 500)
+        app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+        app.config.setdefault('PROFILER', 'cprofile')
+        if not app.config['INSTRUMENTATION_ENABLED']:
+            return
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.Model, 'load', _instance_loaded, propagate=True)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_after_render, app)
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+
+    def _start_request(self):
+        g.metrics = {'sql_count': 0, 'sql_time': 0.0, 'rows': 0,
+                     'template_time': 0.0, 'template_depth': 0}
+        g.metrics_profiler = self._maybe_start_profiler()
+        g.metrics_start = time.perf_counter()
+
+    def _finish_request(self, exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        counters = g.pop('metrics')
+        endpoint = request.endpoint or 'unmatched'
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            self._finish_profiler(profiler, endpoint, elapsed)
+
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.requests += 1
+            if exc is not None:
+                stats.errors += 1
+            stats.wall_time += elapsed
+            stats.max_wall_time = max(stats.max_wall_time, elapsed)
+            stats.sql_count += counters['sql_count']
+            stats.sql_time += counters['sql_time']
+            stats.rows += counters['rows']
+            stats.template_time += counters['template_time']
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[i] += 1
+                    break
+
+    def _maybe_start_profiler(self):
+        rate = current_app.config['PROFILE_SAMPLE_RATE']
+        if rate <= 0 or random.random() >= rate:
+            return None
+        # Only one profiler can be active per process, so concurrent
+        # requests are simply not sampled
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        if current_app.config['PROFILER'] == 'pyinstrument' and PyinstrumentProfiler is not None:
+            profiler = PyinstrumentProfiler(async_mode='disabled')
+        else:
+            profiler = cProfile.Profile()
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.enable()
+            else:
+                profiler.start()
+        except ValueError:
+            self._profile_lock.release()
+            return None
+        return profiler
+
+    def _finish_profiler(self, profiler, endpoint, elapsed):
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+            if elapsed * 1000 < current_app.config['PROFILE_SLOW_MS']:
+                return
+            directory = current_app.config['PROFILE_DIR']
+            os.makedirs(directory, exist_ok=True)
+            name = f'{endpoint}-{int(time.time() * 1000)}-{int(elapsed * 1000)}ms'
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(os.path.join(directory, name + '.prof'))
+            else:
+                with open(os.path.join(directory, name + '.speedscope.json'), 'w') as f:
+                    f.write(profiler.output(renderer=SpeedscopeRenderer()))
+            self.profiles_written += 1
+        finally:
+            self._profile_lock.release()
+
+    def snapshot(self):
+        # {endpoint: stats dict}, slowest total time first
+        with self._lock:
+            items = [(endpoint, stats.as_dict()) for endpoint, stats in self._endpoints.items()]
+        return dict(sorted(items, key=lambda item: item[1]['total_s'], reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.started_at = time.time()
+
+    def prometheus_text(self, gauges=None):
+        # Render all counters in the Prometheus text exposition format
+        with self._lock:
+            endpoints = [(endpoint, _copy(stats)) for endpoint, stats in sorted(self._endpoints.items())]
+
+        lines = []
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{labels} {value}')
+
+        label = lambda endpoint: '{endpoint="%s"}' % _escape(endpoint)
+        metric('quiz_master_requests_total', 'counter', 'Requests handled.',
+               [(label(e), s.requests) for e, s in endpoints])
+        metric('quiz_master_request_errors_total', 'counter', 'Requests that raised an exception.',
+               [(label(e), s.errors) for e, s in endpoints])
+
+        lines.append('# HELP quiz_master_request_duration_seconds Request wall time.')
+        lines.append('# TYPE quiz_master_request_duration_seconds histogram')
+        for endpoint, stats in endpoints:
+            name = _escape(endpoint)
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'quiz_master_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'quiz_master_request_duration_seconds_bucket{{endpoint="{name}",le="+Inf"}} {stats.requests}')
+            lines.append(f'quiz_master_request_duration_seconds_sum{{endpoint="{name}"}} {stats.wall_time:.6f}')
+            lines.append(f'quiz_master_request_duration_seconds_count{{endpoint="{name}"}} {stats.requests}')
+
+        metric('quiz_master_sql_queries_total', 'counter', 'SQL statements executed.',
+               [(label(e), s.sql_count) for e, s in endpoints])
+        metric('quiz_master_sql_seconds_total', 'counter', 'Time spent executing SQL.',
+               [(label(e), f'{s.sql_time:.6f}') for e, s in endpoints])
+        metric('quiz_master_orm_rows_loaded_total', 'counter', 'ORM objects loaded from query results.',
+               [(label(e), s.rows) for e, s in endpoints])
+        metric('quiz_master_template_seconds_total', 'counter', 'Time spent rendering templates.',
+               [(label(e), f'{s.template_time:.6f}') for e, s in endpoints])
+
+        for name, help_text, value in gauges or ():
+            metric(f'quiz_master_{name}', 'gauge', help_text, [('', value)])
+        return '\n'.join(lines) + '\n'
+
+def _copy(stats):
+    copy = EndpointStats()
+    for slot in EndpointStats.__slots__:
+        setattr(copy, slot, getattr(stats, slot))
+    copy.buckets = list(stats.buckets)
+    return copy
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _current():
+    # Counters of the request being handled, or None outside requests (CLI,
+    # the submission writer thread)
+    if has_request_context():
+        return g.get('metrics')
+    return None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['query_start'].pop()
+    counters = _current()
+    if counters is not None:
+        counters['sql_count'] += 1
+        counters['sql_time'] += time.perf_counter() - start
+
+def _instance_loaded(target, context):
+    counters = _current()
+    if counters is not None:
+        counters['rows'] += 1
+
+def _before_render(sender, template, context, **extra):
+    counters = _current()
+    if counters is not None:
+        if counters['template_depth'] == 0:
+            counters['template_start'] = time.perf_counter()
+        counters['template_depth'] += 1
+
+def _after_render(sender, template, context, **extra):
+    counters = _current()
+    if counters is not None and counters['template_depth']:
+        counters['template_depth'] -= 1
+        if counters['template_depth'] == 0:
+            counters['template_time'] += time.perf_counter() - counters['template_start']
+
+request_metrics = RequestMetrics()
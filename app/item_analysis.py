@@ -0,0 +1,124 @@
+from datetime import datetime
+from itertools import groupby
+
+import numpy as np
+
+from app import db
+from app.models import Question, AttemptResponse, ItemAnalysis, QuestionStats
+from app.responses import get_key_snapshots
+
+# Item statistics for every question of a quiz, computed in one vectorized
+# pass over the quiz's answer matrix (attempts x questions) and persisted in
+# QuestionStats so the questions page never recomputes them:
+#   p_value         share of attempts that answered the question correctly
+#   discrimination  point-biserial correlation between answering correctly and
+#                   the attempt's score on the remaining questions
+#   optionN_count   how often each option (and no option) was chosen
+# Attempts graded against older content versions are aligned by question id;
+# a question only counts towards the attempts that actually contained it.
+
+def load_answer_matrix(quiz_id):
+    # Returns (question_ids, chosen, present, correct) with one row per attempt
+    snapshots = get_key_snapshots(quiz_id)
+    rows = db.session.execute(
+        db.select(AttemptResponse.content_version, AttemptResponse.answers)
+        .where(AttemptResponse.quiz_id == quiz_id)
+        .order_by(AttemptResponse.content_version)
+    ).all()
+
+    question_ids = []
+    columns = {}
+    for version in sorted(snapshots):
+        for question_id in snapshots[version][0]:
+            if question_id not in columns:
+                columns[question_id] = len(question_ids)
+                question_ids.append(question_id)
+
+    chosen = np.zeros((len(rows), len(question_ids)), dtype=np.uint8)
+    present = np.zeros(chosen.shape, dtype=bool)
+    correct = np.zeros(chosen.shape, dtype=bool)
+
+    start = 0
+    for version, group in groupby(rows, key=lambda row: row[0]):
+        version_ids, options = snapshots[version]
+        block = np.frombuffer(b''.join(answers for _, answers in group), dtype=np.uint8)
+        block = block.reshape(-1, len(version_ids))
+        key = np.frombuffer(options, dtype=np.uint8)
+        cols = [columns[question_id] for question_id in version_ids]
+        stop = start + len(block)
+        chosen[start:stop, cols] = block
+        present[start:stop, cols] = True
+        correct[start:stop, cols] = block == key
+        start = stop
+
+    return question_ids, chosen, present, correct
+
+def compute_item_stats(chosen, present, correct):
+    # All statistics as arrays indexed by question column
+    attempts = present.sum(axis=0)
+    n = np.maximum(attempts, 1)
+
+    x = correct.astype(np.float64)
+    rest = x.sum(axis=1, keepdims=True) - x
+    rest *= present
+
+    p = x.sum(axis=0) / n
+    rest_mean = rest.sum(axis=0) / n
+    covariance = (x * rest).sum(axis=0) / n - p * rest_mean
+    variance = p * (1 - p) * ((rest ** 2).sum(axis=0) / n - rest_mean ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discrimination = np.where(variance > 0, covariance / np.sqrt(variance), np.nan)
+
+    option_counts = np.stack([((chosen == option) & present).sum(axis=0) for option in range(5)])
+
+    return {
+        'attempts': attempts,
+        'p_value': np.where(attempts > 0, p, np.nan),
+        'discrimination': discrimination,
+        'option_counts': option_counts
+    }
+
+def _optional(value):
+    return None if np.isnan(value) else float(value)
+
+def analyze_quiz(quiz_id):
+    # Recompute and persist the item statistics of one quiz; caller commits
+    question_ids, chosen, present, correct = load_answer_matrix(quiz_id)
+    stats = compute_item_stats(chosen, present, correct)
+    existing = {question_id for question_id, in
+                db.session.query(Question.id).filter(Question.quiz_id == quiz_id)}
+
+    rows = [{
+        'question_id': question_id,
+        'quiz_id': quiz_id,
+        'attempts': int(stats['attempts'][i]),
+        'p_value': _optional(stats['p_value'][i]),
+        'discrimination': _optional(stats['discrimination'][i]),
+        'unanswered_count': int(stats['option_counts'][0, i]),
+        'option1_count': int(stats['option_counts'][1, i]),
+        'option2_count': int(stats['option_counts'][2, i]),
+        'option3_count': int(stats['option_counts'][3, i]),
+        'option4_count': int(stats['option_counts'][4, i])
+    } for i, question_id in enumerate(question_ids) if question_id in existing]
+
+    QuestionStats.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(db.insert(QuestionStats), rows)
+
+    analysis = db.session.get(ItemAnalysis, quiz_id) or ItemAnalysis(quiz_id=quiz_id)
+    analysis.attempt_count = len(chosen)
+    analysis.computed_at = datetime.utcnow()
+    db.session.add(analysis)
+    return analysis
+
+def stale_quiz_ids():
+    # Quizzes whose stored responses changed since their last analysis
+    counts = db.select(AttemptResponse.quiz_id, db.func.count().label('attempts'))\
+        .group_by(AttemptResponse.quiz_id).subquery()
+    rows = db.session.execute(
+        db.select(counts.c.quiz_id)
+        .outerjoin(ItemAnalysis, ItemAnalysis.quiz_id == counts.c.quiz_id)
+        .where(db.or_(ItemAnalysis.attempt_count.is_(None),
+                      ItemAnalysis.attempt_count != counts.c.attempts))
+    )
+    return [quiz_id for quiz_id, in rows]
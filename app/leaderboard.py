@@ -0,0 +1,103 @@
+from app import db
+from app.models import Score, UserStats
+
+# Percentage expression shared by the incremental and rebuild paths so both
+# produce the same values the dashboards used to compute in Python.
+score_percentage = Score.total_scored * 100.0 / Score.total_questions
+
+def _upsert_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+def record_attempt(user_id, percentage):
+    # Fold one new attempt into the user's aggregate row. Runs inside the
+    # caller's transaction so the Score insert and the aggregate commit together.
+    # A single upsert, so two first attempts stored at once both count
+    insert = _upsert_insert()
+    if insert is None:
+        updated = UserStats.query.filter_by(user_id=user_id).update({
+            UserStats.attempt_count: UserStats.attempt_count + 1,
+            UserStats.percentage_sum: UserStats.percentage_sum + percentage,
+            UserStats.best_score: db.case((UserStats.best_score < percentage, percentage),
+                                          else_=UserStats.best_score),
+            UserStats.avg_score: (UserStats.percentage_sum + percentage) / (UserStats.attempt_count + 1),
+        }, synchronize_session=False)
+        if not updated:
+            db.session.add(UserStats(user_id=user_id,
+                                     attempt_count=1,
+                                     percentage_sum=percentage,
+                                     best_score=percentage,
+                                     avg_score=percentage))
+        return
+    statement = insert(UserStats).values(user_id=user_id, attempt_count=1, percentage_sum=percentage,
+                                         best_score=percentage, avg_score=percentage)
+    excluded = statement.excluded
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={
+            'attempt_count': UserStats.attempt_count + excluded.attempt_count,
+            'percentage_sum': UserStats.percentage_sum + excluded.percentage_sum,
+            'best_score': db.case((UserStats.best_score < excluded.best_score, excluded.best_score),
+                                  else_=UserStats.best_score),
+            'avg_score': (UserStats.percentage_sum + excluded.percentage_sum)
+                         / (UserStats.attempt_count + excluded.attempt_count),
+        }))
+
+def get_ranking(user_id):
+    # Rank comes from counting the rows ahead of the user on ix_user_stats_rank
+    total_students = UserStats.query.count()
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        return {'rank': 'N/A', 'total_students': total_students, 'percentile': 0}
+
+    rank = rank_of(stats)
+    return {
+        'rank': rank,
+        'total_students': total_students,
+        'percentile': ((total_students - rank + 1) / total_students) * 100
+    }
+
+def rank_of(stats):
+    ahead = UserStats.query.filter(db.or_(
+        UserStats.avg_score > stats.avg_score,
+        db.and_(UserStats.avg_score == stats.avg_score, UserStats.user_id < stats.user_id)
+    )).count()
+    return ahead + 1
+
+def ranked_query():
+    return UserStats.query.order_by(UserStats.avg_score.desc(), UserStats.user_id)
+
+def _aggregate_select():
+    return db.select(
+        Score.user_id,
+        db.func.count(Score.id),
+        db.func.sum(score_percentage),
+        db.func.max(score_percentage),
+        db.func.avg(score_percentage)
+    ).group_by(Score.user_id)
+
+def _insert_aggregates(select):
+    db.session.execute(db.insert(UserStats).from_select(
+        ['user_id', 'attempt_count', 'percentage_sum', 'best_score', 'avg_score'], select))
+
+def refresh_users(user_ids):
+    # Recompute aggregates for specific users, e.g. after their scores were
+    # removed by a cascading subject/chapter delete. Caller commits.
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    UserStats.query.filter(UserStats.user_id.in_(user_ids)).delete(synchronize_session=False)
+    _insert_aggregates(_aggregate_select().where(Score.user_id.in_(user_ids)))
+
+def rebuild():
+    # Recompute the whole table from the score table
+    UserStats.query.delete(synchronize_session=False)
+    _insert_aggregates(_aggregate_select())
+    db.session.commit()
+    return UserStats.query.count()
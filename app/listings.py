@@ -0,0 +1,163 @@
+from app import db, analytics, leaderboard, fragments
+from app.models import User, Subject, Chapter, Quiz, Question, UserStats
+from app.pagination import DEFAULT_PAGE_SIZE, keyset_page
+
+# Paginated admin listings behind /admin/list/<collection> and the first page
+# of each list on the admin dashboard. Every collection names the sorts it
+# allows (each backed by an index ending in the primary key, so pages are
+# index range scans) and the filters it understands, and the data versions
+# (app/fragments.py) its pages depend on, which make up their ETags.
+
+class Listing:
+    # Each listing defines query(filters) and to_json(row)
+    sorts = {}  # name -> column, always including the primary key as 'id'
+    default_sort = 'id'
+    dependencies = ()
+
+    def version(self):
+        current = fragments.stamps()
+        return tuple(current[dependency] for dependency in self.dependencies)
+
+    def rows(self, page, filters):
+        return page.items
+
+    def page(self, filters, cursor=None, limit=DEFAULT_PAGE_SIZE, sort=None, descending=False):
+        # Raises KeyError for an unknown sort, InvalidCursor for a bad cursor
+        sort = sort or self.default_sort
+        keys = [(self.sorts[sort], descending)]
+        if sort != 'id':
+            keys.append((self.sorts['id'], descending))  # tie breaker
+        page = keyset_page(self.query(filters), keys, cursor, limit,
+                           ordering=f"{sort}:{'desc' if descending else 'asc'}")
+        return page, self.rows(page, filters)
+
+def _contains(column, text):
+    return db.func.lower(column).contains(text.lower(), autoescape=True)
+
+def question_counts(quiz_ids=None):
+    # {quiz_id: number of questions} without loading the questions
+    query = db.session.query(Question.quiz_id, db.func.count(Question.id)).group_by(Question.quiz_id)
+    if quiz_ids is not None:
+        query = query.filter(Question.quiz_id.in_(quiz_ids))
+    return dict(query.all())
+
+class SubjectListing(Listing):
+    sorts = {'name': Subject.name, 'id': Subject.id}
+    default_sort = 'name'
+    dependencies = ('subjects',)
+
+    def query(self, filters):
+        query = Subject.query
+        if filters.get('q'):
+            query = query.filter(_contains(Subject.name, filters['q']))
+        return query
+
+    def to_json(self, subject):
+        return {'id': subject.id, 'name': subject.name, 'description': subject.description}
+
+class ChapterListing(Listing):
+    sorts = {'name': Chapter.name, 'id': Chapter.id}
+    default_sort = 'name'
+    dependencies = ('subjects', 'chapters')
+
+    def query(self, filters):
+        query = Chapter.query.options(db.joinedload(Chapter.subject))
+        if filters.get('subject_id') is not None:
+            query = query.filter(Chapter.subject_id == filters['subject_id'])
+        if filters.get('q'):
+            query = query.filter(_contains(Chapter.name, filters['q']))
+        return query
+
+    def to_json(self, chapter):
+        return {'id': chapter.id, 'name': chapter.name, 'description': chapter.description,
+                'subject_id': chapter.subject_id, 'subject': chapter.subject.name}
+
+class QuizListing(Listing):
+    sorts = {'date': Quiz.date_of_quiz, 'duration': Quiz.time_duration, 'id': Quiz.id}
+    default_sort = 'date'
+    dependencies = ('chapters', 'quizzes')
+
+    def query(self, filters):
+        query = Quiz.query.options(db.joinedload(Quiz.chapter))
+        if filters.get('chapter_id') is not None:
+            query = query.filter(Quiz.chapter_id == filters['chapter_id'])
+        if filters.get('subject_id') is not None:
+            query = query.filter(Quiz.chapter_id.in_(
+                db.select(Chapter.id).where(Chapter.subject_id == filters['subject_id'])))
+        if filters.get('q'):
+            query = query.filter(Quiz.chapter_id.in_(
+                db.select(Chapter.id).where(_contains(Chapter.name, filters['q']))))
+        return query
+
+    def rows(self, page, filters):
+        counts = question_counts([quiz.id for quiz in page.items])
+        return [{'quiz': quiz, 'question_count': counts.get(quiz.id, 0)} for quiz in page.items]
+
+    def to_json(self, row):
+        quiz = row['quiz']
+        return {'id': quiz.id, 'chapter_id': quiz.chapter_id, 'chapter': quiz.chapter.name,
+                'date_of_quiz': quiz.date_of_quiz.isoformat(), 'time_duration': quiz.time_duration,
+                'remarks': quiz.remarks, 'question_count': row['question_count']}
+
+class StudentListing(Listing):
+    sorts = {'name': User.full_name, 'email': User.email, 'id': User.id}
+    default_sort = 'name'
+    dependencies = ('students',)
+
+    def query(self, filters):
+        query = User.query
+        if filters.get('q'):
+            query = query.filter(db.or_(_contains(User.full_name, filters['q']),
+                                        _contains(User.email, filters['q'])))
+        return query
+
+    def to_json(self, user):
+        return {'id': user.id, 'email': user.email, 'full_name': user.full_name,
+                'qualification': user.qualification, 'dob': user.dob.date().isoformat()}
+
+class RankingListing(Listing):
+    # Always in leaderboard order, walking ix_user_stats_rank from the top
+    sorts = {'rank': UserStats.avg_score}
+    default_sort = 'rank'
+    dependencies = ('subjects', 'chapters', 'students', 'scores')
+
+    def page(self, filters, cursor=None, limit=DEFAULT_PAGE_SIZE, sort=None, descending=False):
+        if sort not in (None, 'rank') or descending:
+            raise KeyError(sort)
+        keys = [(UserStats.avg_score, True), (UserStats.user_id, False)]
+        page = keyset_page(self.query(filters), keys, cursor, limit, ordering='rank')
+        return page, self.rows(page, filters)
+
+    def query(self, filters):
+        query = UserStats.query.options(db.joinedload(UserStats.user))
+        if filters.get('q'):
+            query = query.join(User).filter(_contains(User.full_name, filters['q']))
+        return query
+
+    def rows(self, page, filters):
+        performance = analytics.student_subject_performance([stats.user_id for stats in page.items])
+        rows = []
+        for position, stats in enumerate(page.items, page.offset + 1):
+            rows.append({
+                # Unfiltered pages are consecutive slices of the leaderboard;
+                # filtered rows look their rank up on the index
+                'rank': leaderboard.rank_of(stats) if filters.get('q') else position,
+                'student': stats.user,
+                'avg_score': stats.avg_score,
+                'total_attempts': stats.attempt_count,
+                'subject_performance': performance.get(stats.user_id, {})
+            })
+        return rows
+
+    def to_json(self, row):
+        return {'rank': row['rank'], 'user_id': row['student'].id, 'full_name': row['student'].full_name,
+                'avg_score': row['avg_score'], 'total_attempts': row['total_attempts'],
+                'subject_performance': row['subject_performance']}
+
+LISTINGS = {
+    'subjects': SubjectListing(),
+    'chapters': ChapterListing(),
+    'quizzes': QuizListing(),
+    'students': StudentListing(),
+    'rankings': RankingListing()
+}
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Live exam monitoring. start_quiz and submit_quiz bump in-memory counters per
+# quiz; a publisher thread turns the counters of every quiz that changed into
+# one JSON snapshot per LIVE_MONITOR_INTERVAL and wakes the Server-Sent Events
+# streams watching it, so a burst of submissions costs one serialization per
+# interval however many admins are watching, and no stream touches the
+# database. Counters are per process and start empty when it starts: with
+# several workers, each reports the exams it served.
+
+DISTRIBUTION_BUCKETS = 10  # 0-9%, 10-19%, ..., 90-100%
+RATE_WINDOW = 60  # seconds of submissions behind submissions_per_minute
+
+class QuizCounters:
+
+    def __init__(self, quiz_id):
+        self.quiz_id = quiz_id
+        self.since = datetime.now()
+        self.started = set()  # user ids, so reloading the quiz page counts once
+        self.submitted = 0
+        self.percentage_sum = 0.0
+        self.distribution = [0] * DISTRIBUTION_BUCKETS
+        self.recent = deque()  # monotonic times of submissions in the rate window
+        self.dirty = True
+        self.sequence = 0  # bumped with every published snapshot
+        self.payload = None
+        self.watchers = 0
+        self.touched = time.monotonic()
+
+    def snapshot(self, now):
+        while self.recent and self.recent[0] < now - RATE_WINDOW:
+            self.recent.popleft()
+        return {
+            'quiz_id': self.quiz_id,
+            'since': self.since.isoformat(timespec='seconds'),
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'started': len(self.started),
+            'submitted': self.submitted,
+            'in_progress': max(len(self.started) - self.submitted, 0),
+            'avg_score': self.percentage_sum / self.submitted if self.submitted else 0,
+            'distribution': self.distribution,
+            'submissions_per_minute': len(self.recent) * 60 / RATE_WINDOW
+        }
+
+class ExamMonitor:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._published = threading.Condition(self._lock)
+        self._quizzes = {}
+        self._thread = None
+        self._pid = None
+        self.interval = 1.0
+        self.keepalive = 15.0
+        self.idle_seconds = 6 * 3600
+        self.published = 0
+
+    def init_app(self, app):
+        app.config.setdefault('LIVE_MONITOR_INTERVAL', 1.0)
+        app.config.setdefault('LIVE_MONITOR_KEEPALIVE', 15.0)
+        app.config.setdefault('LIVE_MONITOR_IDLE_SECONDS', 6 * 3600)
+        self.interval = app.config['LIVE_MONITOR_INTERVAL']
+        self.keepalive = app.config['LIVE_MONITOR_KEEPALIVE']
+        self.idle_seconds = app.config['LIVE_MONITOR_IDLE_SECONDS']
+
+    def _counters(self, quiz_id):
+        # Caller holds the lock
+        counters = self._quizzes.get(quiz_id)
+        if counters is None:
+            counters = self._quizzes[quiz_id] = QuizCounters(quiz_id)
+        counters.touched = time.monotonic()
+        return counters
+
+    def record_start(self, quiz_id, user_id):
+        with self._lock:
+            counters = self._counters(quiz_id)
+            if user_id not in counters.started:
+                counters.started.add(user_id)
+                counters.dirty = True
+
+    def record_submission(self, quiz_id, user_id, percentage):
+        with self._lock:
+            counters = self._counters(quiz_id)
+            counters.started.add(user_id)  # started before this process did
+            counters.submitted += 1
+            counters.percentage_sum += percentage
+            counters.distribution[min(int(percentage // 10), DISTRIBUTION_BUCKETS - 1)] += 1
+            counters.recent.append(time.monotonic())
+            counters.dirty = True
+
+    def _ensure_publisher(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='exam-monitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.publish()
+
+    def publish(self):
+        # Snapshot every changed quiz, plus watched quizzes whose submission
+        # rate is still decaying, then wake the streams once
+        now = time.monotonic()
+        with self._lock:
+            changed = False
+            for quiz_id, counters in list(self._quizzes.items()):
+                if counters.dirty or (counters.watchers and counters.recent):
+                    counters.payload = json.dumps(counters.snapshot(now), separators=(',', ':'))
+                    counters.sequence += 1
+                    counters.dirty = False
+                    changed = True
+                elif not counters.watchers and now - counters.touched > self.idle_seconds:
+                    del self._quizzes[quiz_id]
+            if changed:
+                self.published += 1
+                self._published.notify_all()
+
+    def stream(self, quiz_id):
+        # Server-Sent Events for one quiz: the current snapshot at once, then
+        # each new one, with a comment line as keepalive when nothing changes
+        self._ensure_publisher()
+        with self._lock:
+            counters = self._counters(quiz_id)
+            counters.watchers += 1
+            if counters.payload is None:
+                counters.payload = json.dumps(counters.snapshot(time.monotonic()), separators=(',', ':'))
+            sequence, payload = counters.sequence, counters.payload
+        try:
+            yield f'retry: 3000\ndata: {payload}\n\n'
+            while True:
+                with self._published:
+                    self._published.wait_for(lambda: counters.sequence != sequence, timeout=self.keepalive)
+                    if counters.sequence == sequence:
+                        payload = None
+                    else:
+                        sequence, payload = counters.sequence, counters.payload
+                yield f'data: {payload}\n\n' if payload else ': keepalive\n\n'
+        finally:
+            with self._lock:
+                counters.watchers -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'quizzes': len(self._quizzes),
+                'watchers': sum(counters.watchers for counters in self._quizzes.values()),
+                'published': self.published
+            }
+
+exam_monitor = ExamMonitor()
@@ -1,43 +1,44 @@
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from app import db, login_manager
+from app import db
+from app.passwords import credential_service
 from datetime import datetime
 
-@login_manager.user_loader
-def load_user(user_id):
-    # Try to load user first
-    if user_id.startswith('admin_'):
-        return Admin.query.get(int(user_id[5:]))
-    return User.query.get(int(user_id))
+class PasswordMixin:
+    # Hashing runs in the credential service's process pool (app/passwords.py)
 
-class User(UserMixin, db.Model):
+    def set_password(self, password):
+        self.password_hash = credential_service.hash_password(password)
+
+    def check_password(self, password):
+        # On success, upgrade hashes made with outdated parameters; the
+        # caller's commit stores the new hash
+        if not credential_service.verify_password(self.password_hash, password):
+            return False
+        if credential_service.needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
+
+class User(PasswordMixin, UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))
     full_name = db.Column(db.String(100), nullable=False)
     qualification = db.Column(db.String(100))
     dob = db.Column(db.DateTime, nullable=False)
     scores = db.relationship('Score', backref='user', lazy=True)
-    
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-        
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+
+    __table_args__ = (
+        # Keyset pages of the student listing sorted by name
+        db.Index('ix_user_full_name', 'full_name', 'id'),
+    )
     
     def is_admin(self):
         return False
 
-class Admin(UserMixin, db.Model):
+class Admin(PasswordMixin, UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-        
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+    password_hash = db.Column(db.String(255))
     
     def get_id(self):
         # Return admin ID with prefix to distinguish from regular users
@@ -53,6 +54,10 @@ class Subject(db.Model):
     chapters = db.relationship('Chapter', backref='subject', lazy=True,
                              cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_subject_name', 'name', 'id'),
+    )
+
 class Chapter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
@@ -61,16 +66,39 @@ class Chapter(db.Model):
     quizzes = db.relationship('Quiz', backref='chapter', lazy=True,
                             cascade='all, delete-orphan')
 
+    __table_args__ = (
+        # Keyset pages of the chapter listing, across and within subjects
+        db.Index('ix_chapter_name', 'name', 'id'),
+        db.Index('ix_chapter_subject_name', 'subject_id', 'name', 'id'),
+    )
+
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
     date_of_quiz = db.Column(db.DateTime, nullable=False)
     time_duration = db.Column(db.Integer, nullable=False)  # in minutes
     remarks = db.Column(db.Text)
+    # Bumped whenever the quiz or its questions change; keys cached payloads
+    content_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     questions = db.relationship('Question', backref='quiz', lazy=True,
                               cascade='all, delete-orphan')
     scores = db.relationship('Score', backref='quiz', lazy=True,
                            cascade='all, delete-orphan')
+    answer_key_snapshots = db.relationship('AnswerKeySnapshot', lazy=True,
+                                         cascade='all, delete-orphan')
+    item_analysis = db.relationship('ItemAnalysis', uselist=False,
+                                  cascade='all, delete-orphan')
+    attempt_rollups = db.relationship('AttemptRollup', lazy=True,
+                                    cascade='all, delete-orphan')
+    attempt_drafts = db.relationship('AttemptDraft', lazy=True,
+                                   cascade='all, delete-orphan')
+    draft_answers = db.relationship('DraftAnswer', lazy=True,
+                                  cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_quiz_chapter_date', 'chapter_id', 'date_of_quiz'),
+        db.Index('ix_quiz_date', 'date_of_quiz'),
+    )
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -81,6 +109,8 @@ class Question(db.Model):
     option3 = db.Column(db.String(200), nullable=False)
     option4 = db.Column(db.String(200), nullable=False)
     correct_option = db.Column(db.Integer, nullable=False)  # 1, 2, 3, or 4
+    stats = db.relationship('QuestionStats', uselist=False,
+                          cascade='all, delete-orphan')
 
 class Score(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -91,3 +121,114 @@ class Score(db.Model):
     time_stamp_of_attempt = db.Column(db.DateTime, nullable=False,
                                     default=datetime.utcnow)
     time_taken = db.Column(db.Integer, nullable=False)  # time taken in minutes
+    response = db.relationship('AttemptResponse', backref='score', uselist=False,
+                             cascade='all, delete-orphan')
+
+    __table_args__ = (
+        # One attempt per user per quiz; also serves lookups by quiz_id
+        db.UniqueConstraint('quiz_id', 'user_id', name='uq_score_quiz_user'),
+        # User history, newest first
+        db.Index('ix_score_user_attempt', 'user_id', 'time_stamp_of_attempt'),
+        # Attempt time ranges for the activity charts
+        db.Index('ix_score_attempt_time', 'time_stamp_of_attempt'),
+        # Covers the per-quiz score histograms without touching the table
+        db.Index('ix_score_quiz_result', 'quiz_id', 'total_scored', 'total_questions'),
+    )
+
+class UserStats(db.Model):
+    # Materialized per-user aggregate of the score table, kept in step with
+    # every Score insert so rankings never have to scan all attempts.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    percentage_sum = db.Column(db.Float, nullable=False, default=0.0)
+    best_score = db.Column(db.Float, nullable=False, default=0.0)
+    avg_score = db.Column(db.Float, nullable=False, default=0.0)
+    user = db.relationship('User', backref=db.backref('stats', uselist=False))
+
+    __table_args__ = (
+        # Rank order: highest average first, ties broken by user id, declared
+        # in that order so ranking pages are a single forward index scan
+        db.Index('ix_user_stats_rank', avg_score.desc(), user_id),
+    )
+
+class AttemptRollup(db.Model):
+    # Attempts on one quiz within one hour, kept in step with every Score
+    # insert so the activity charts never scan the score table (app/rollups.py)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)  # start of the hour
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    percentage_sum = db.Column(db.Float, nullable=False, default=0.0)
+    time_taken_sum = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Time ranges across all quizzes
+        db.Index('ix_attempt_rollup_bucket', 'bucket'),
+    )
+
+class AttemptDraft(db.Model):
+    # An attempt in progress: when it started and when it must be submitted,
+    # server-side so a reload resumes it and an expired one is finalized
+    # without the browser (app/autosave.py)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # Expired drafts, oldest first
+        db.Index('ix_attempt_draft_ends_at', 'ends_at'),
+    )
+
+class DraftAnswer(db.Model):
+    # The latest autosaved option (0 = cleared) for one question of a draft
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    question_id = db.Column(db.Integer, primary_key=True)
+    option = db.Column(db.SmallInteger, nullable=False)
+
+class CacheStamp(db.Model):
+    # Version of one kind of content, bumped when it changes; dashboard
+    # fragments cached against an older version are rendered again (app/fragments.py)
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class AnswerKeySnapshot(db.Model):
+    # Question order and answer key of one quiz content version, shared by all
+    # attempt responses graded against it
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    content_version = db.Column(db.Integer, primary_key=True)
+    question_ids = db.Column(db.LargeBinary, nullable=False)  # packed uint32 per question
+    correct_options = db.Column(db.LargeBinary, nullable=False)  # one byte per question
+
+class AttemptResponse(db.Model):
+    # The options a student chose, one byte per question (0 = unanswered) in
+    # the question order of the matching AnswerKeySnapshot
+    score_id = db.Column(db.Integer, db.ForeignKey('score.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, nullable=False)
+    content_version = db.Column(db.Integer, nullable=False)
+    answers = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (
+        db.ForeignKeyConstraint(['quiz_id', 'content_version'],
+                                ['answer_key_snapshot.quiz_id', 'answer_key_snapshot.content_version']),
+        db.Index('ix_attempt_response_quiz', 'quiz_id', 'content_version'),
+    )
+
+class ItemAnalysis(db.Model):
+    # When a quiz's item statistics were last computed and from how many attempts
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class QuestionStats(db.Model):
+    # Persisted item statistics, see app/item_analysis.py
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
+    attempts = db.Column(db.Integer, nullable=False)
+    p_value = db.Column(db.Float)  # share of attempts answering correctly
+    discrimination = db.Column(db.Float)  # point-biserial against the rest score
+    unanswered_count = db.Column(db.Integer, nullable=False, default=0)
+    option1_count = db.Column(db.Integer, nullable=False, default=0)
+    option2_count = db.Column(db.Integer, nullable=False, default=0)
+    option3_count = db.Column(db.Integer, nullable=False, default=0)
+    option4_count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,82 @@
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app, g
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# N+1 detector. Every lazy relationship load that reaches the database is
+# counted per relationship (e.g. "Quiz.chapter") while a guard is active; the
+# load after the first NPLUSONE_THRESHOLD of the same relationship raises
+# NPlusOneError ("raise") or logs a warning ("warn"). Requests are guarded when
+# NPLUSONE_GUARD is set, or automatically in debug and testing mode. Scripts
+# can use lazy_load_guard() directly:
+#
+#     with lazy_load_guard(threshold=5):
+#         render_dashboard()
+#
+# Loads covered by joinedload/selectinload, or many-to-one loads answered
+# from the identity map, never count.
+
+class NPlusOneError(Exception):
+    pass
+
+class LazyLoadTracker:
+
+    def __init__(self, threshold, mode='raise'):
+        self.threshold = threshold
+        self.mode = mode
+        self.counts = Counter()
+
+    def record(self, relationship):
+        self.counts[relationship] += 1
+        if self.counts[relationship] != self.threshold + 1:
+            return
+        message = (f'{relationship} was lazy loaded more than {self.threshold} times; '
+                   f'add a joinedload/selectinload option to the query that loads its parents')
+        if self.mode == 'raise':
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+_tracker = ContextVar('lazy_load_tracker', default=None)
+
+@contextmanager
+def lazy_load_guard(threshold=10, mode='raise'):
+    tracker = LazyLoadTracker(threshold, mode)
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _count_lazy_load(orm_execute_state):
+    tracker = _tracker.get()
+    if (tracker is not None and orm_execute_state.is_relationship_load
+            and orm_execute_state.lazy_loaded_from is not None):
+        tracker.record(str(orm_execute_state.loader_strategy_path[-1]))
+
+def init_app(app):
+    app.config.setdefault('NPLUSONE_GUARD', None)  # "raise", "warn", "off"; None picks by mode
+    app.config.setdefault('NPLUSONE_THRESHOLD', 10)
+    app.before_request(_start_guard)
+    app.teardown_request(_stop_guard)
+
+def _start_guard():
+    mode = current_app.config['NPLUSONE_GUARD']
+    if mode is None:
+        mode = 'raise' if current_app.debug or current_app.testing else 'off'
+    if mode != 'off':
+        g.nplusone_token = _tracker.set(LazyLoadTracker(current_app.config['NPLUSONE_THRESHOLD'], mode))
+
+def _stop_guard(exc):
+    token = g.pop('nplusone_token', None)
+    if token is not None:
+        try:
+            _tracker.reset(token)
+        except ValueError:  # torn down from another context, e.g. after streaming
+            _tracker.set(None)
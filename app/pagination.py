@@ -0,0 +1,93 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from app import db
+
+# Keyset (seek-method) pagination. A page is fetched with
+#
+#     WHERE (sort, id) comes after (last sort value, last id) ORDER BY sort, id LIMIT n
+#
+# instead of OFFSET, so every page costs the same index range scan however
+# deep the client has paged, and rows inserted while paging never shift later
+# pages. The cursor handed to the client is an opaque url-safe token holding
+# the last row's key, the ordering it belongs to and the number of rows
+# already returned.
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+class InvalidCursor(ValueError):
+    pass
+
+class Page:
+
+    def __init__(self, items, next_cursor, offset):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.offset = offset  # rows returned by the pages before this one
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'cannot put {type(value).__name__} in a cursor')
+
+def encode_cursor(ordering, key, offset):
+    data = json.dumps({'o': ordering, 'k': key, 'n': offset}, default=_json_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).rstrip(b'=').decode()
+
+def decode_cursor(cursor, ordering, keys):
+    # Returns (key values converted to the column types, offset)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if data['o'] != ordering or len(data['k']) != len(keys):
+            raise InvalidCursor('cursor belongs to a different ordering')
+        values = []
+        for (column, _), value in zip(keys, data['k']):
+            python_type = column.type.python_type
+            values.append(datetime.fromisoformat(value) if python_type is datetime else python_type(value))
+        return values, int(data['n'])
+    except InvalidCursor:
+        raise
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(f'malformed cursor: {e}') from e
+
+def _after(keys, values):
+    # (a, b) after (x, y): a > x OR (a = x AND b > y), with < for descending keys
+    column, descending = keys[0]
+    after = column < values[0] if descending else column > values[0]
+    if len(keys) == 1:
+        return after
+    return db.or_(after, db.and_(column == values[0], _after(keys[1:], values[1:])))
+
+def seek_condition(keys, values):
+    # The redundant bound on the leading column lets the planner start an
+    # index range scan at the cursor instead of filtering from the top
+    column, descending = keys[0]
+    if len(keys) == 1:
+        return _after(keys, values)
+    bound = column <= values[0] if descending else column >= values[0]
+    return db.and_(bound, _after(keys, values))
+
+def keyset_page(query, keys, cursor=None, limit=DEFAULT_PAGE_SIZE, ordering=''):
+    # keys: (column, descending) pairs, the last one unique (normally the
+    # primary key); items must expose every key column as an attribute
+    offset = 0
+    if cursor:
+        values, offset = decode_cursor(cursor, ordering, keys)
+        query = query.filter(seek_condition(keys, values))
+    query = query.order_by(*(column.desc() if descending else column for column, descending in keys))
+    items = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(ordering, [getattr(last, column.key) for column, _ in keys],
+                                    offset + len(items))
+    return Page(items, next_cursor, offset)
@@ -0,0 +1,107 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing for User and Admin. scrypt and pbkdf2 are deliberately
+# slow, so when a whole class logs in at once the hashes are computed in a
+# bounded process pool instead of on the request threads:
+#   PASSWORD_HASH_METHOD       Werkzeug method string, e.g. "scrypt:32768:8:1"
+#                              or "pbkdf2:sha256:600000"
+#   PASSWORD_HASH_WORKERS      pool size per app process; 0 hashes inline
+#   PASSWORD_HASH_MAX_PENDING  hashes queued or running before new logins are
+#                              turned away with CredentialServiceBusy
+#   PASSWORD_HASH_TIMEOUT      seconds a request waits for a free slot; once
+#                              admitted it waits for its result
+# A hash made with other parameters than the configured method still verifies;
+# needs_rehash tells the models to replace it after a successful login.
+
+class CredentialServiceBusy(Exception):
+    pass
+
+class CredentialService:
+
+    def __init__(self):
+        self._pool = None
+        self._pool_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._method_prefixes = {}
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        workers = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+        app.config.setdefault('PASSWORD_HASH_METHOD', os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'))
+        app.config.setdefault('PASSWORD_HASH_WORKERS', workers)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', max(workers, 1) * 16)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 2)
+
+    def _executor(self):
+        # One pool per OS process; a forked web worker must not reuse its
+        # parent's pool. Pool children are forked rather than spawned because
+        # spawning re-runs the entry script (run.py builds the app at import
+        # time); they only ever call hashlib through Werkzeug.
+        with self._lock:
+            if self._pool_pid != os.getpid():
+                method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._pool = ProcessPoolExecutor(current_app.config['PASSWORD_HASH_WORKERS'],
+                                                 mp_context=multiprocessing.get_context(method))
+                self._slots = threading.BoundedSemaphore(current_app.config['PASSWORD_HASH_MAX_PENDING'])
+                self._pool_pid = os.getpid()
+            return self._pool, self._slots
+
+    def _run(self, fn, *args):
+        config = current_app.config
+        if config['PASSWORD_HASH_WORKERS'] <= 0:
+            return fn(*args)
+        pool, slots = self._executor()
+        if not slots.acquire(timeout=config['PASSWORD_HASH_TIMEOUT']):
+            self.rejected += 1
+            raise CredentialServiceBusy()
+        try:
+            return pool.submit(fn, *args).result()
+        finally:
+            slots.release()
+
+    def hash_password(self, password):
+        self.hashed += 1
+        return self._run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    def verify_password(self, pwhash, password):
+        if not pwhash:
+            return False
+        self.verified += 1
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self._method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+
+    def _method_prefix(self, method):
+        # Werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"); hash
+        # once per method to learn the exact prefix it writes
+        prefix = self._method_prefixes.get(method)
+        if prefix is None:
+            prefix = generate_password_hash('', method).split('$', 1)[0]
+            self._method_prefixes[method] = prefix
+        return prefix
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+            self._pool_pid = None
+
+    def stats(self):
+        return {
+            'hashed': self.hashed,
+            'verified': self.verified,
+            'rejected': self.rejected
+        }
+
+credential_service = CredentialService()
@@ -0,0 +1,48 @@
+import gc
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import db
+from app.grading import get_answer_key
+from app.models import Quiz
+from app.quiz_cache import get_quiz_payload
+
+logger = logging.getLogger(__name__)
+
+# Warm-up for servers that import the app once and fork their workers from it
+# (gunicorn with preload_app, see gunicorn.conf.py). The parent compiles every
+# template and loads the answer keys and question payloads of the quizzes
+# running now or coming up, then closes its database connections, which must
+# not be shared with the children, and moves everything it allocated out of
+# the garbage collector's reach. Workers forked afterwards start with warm
+# caches whose memory they share copy-on-write until an entry changes.
+
+def warm(app):
+    # Returns counts and timing of what was loaded
+    started = time.perf_counter()
+    templates = 0
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+        templates += 1
+
+    since = datetime.now() - timedelta(hours=app.config.get('PRELOAD_QUIZ_HOURS', 24))
+    with app.test_request_context():
+        quizzes = Quiz.query.options(joinedload(Quiz.chapter), selectinload(Quiz.questions))\
+            .filter(Quiz.date_of_quiz >= since).order_by(Quiz.date_of_quiz)\
+            .limit(app.config.get('PRELOAD_QUIZ_LIMIT', 500)).all()
+        for quiz in quizzes:
+            get_answer_key(quiz)
+            get_quiz_payload(quiz)
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+    summary = {'templates': templates, 'quizzes': len(quizzes),
+               'seconds': round(time.perf_counter() - started, 3)}
+    logger.info('Preloaded %(templates)d templates and %(quizzes)d quizzes in %(seconds)ss', summary)
+    return summary
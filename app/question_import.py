@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from app import db
+from app.models import Quiz, Question
+from app.quiz_cache import bump_content_version
+
+# Bulk question import from CSV (with a header row) or JSON Lines. The file is
+# parsed as a stream, validated chunk by chunk and written with one
+# executemany INSERT per chunk, each chunk in its own transaction, so memory
+# use depends on the chunk size and not on the file size. Rows that fail
+# validation are skipped and reported with their line number.
+#
+# Columns: quiz_id (optional when importing into a given quiz),
+# question_statement (or statement), option1..option4, correct_option (1-4).
+
+OPTION_MAX_LENGTH = Question.__table__.c.option1.type.length
+MAX_REPORTED_ERRORS = 1000
+
+class ImportReport:
+
+    def __init__(self):
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []  # (line, message), the first MAX_REPORTED_ERRORS only
+        self.quiz_ids = set()
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+def iter_records(stream, fmt):
+    # Yield (line number, dict) from a binary stream without reading it whole
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, f'invalid JSON: {e}'
+                continue
+            yield line_number, record if isinstance(record, dict) else 'expected a JSON object'
+
+def _text(record, *names):
+    for name in names:
+        value = record.get(name)
+        if value is not None:
+            return str(value).strip()
+    return ''
+
+def validate_record(record, quiz_id=None):
+    # Returns (row for the Question insert, None) or (None, error message)
+    if isinstance(record, str):
+        return None, record
+    row = {'question_statement': _text(record, 'question_statement', 'statement')}
+    if not row['question_statement']:
+        return None, 'question_statement is required'
+    for n in range(1, 5):
+        option = _text(record, f'option{n}')
+        if not option:
+            return None, f'option{n} is required'
+        if len(option) > OPTION_MAX_LENGTH:
+            return None, f'option{n} is longer than {OPTION_MAX_LENGTH} characters'
+        row[f'option{n}'] = option
+    try:
+        row['correct_option'] = int(_text(record, 'correct_option'))
+    except ValueError:
+        return None, 'correct_option must be a number from 1 to 4'
+    if not 1 <= row['correct_option'] <= 4:
+        return None, 'correct_option must be a number from 1 to 4'
+    if quiz_id is not None:
+        row['quiz_id'] = quiz_id
+    else:
+        try:
+            row['quiz_id'] = int(_text(record, 'quiz_id'))
+        except ValueError:
+            return None, 'quiz_id is required'
+    return row, None
+
+def import_questions(stream, fmt='csv', quiz_id=None, chunk_size=1000, progress=None):
+    # Import every valid record; rows are committed chunk by chunk
+    report = ImportReport()
+    known_quizzes = set()
+    records = iter_records(stream, fmt)
+    while True:
+        try:
+            chunk = list(islice(records, chunk_size))
+        except (UnicodeDecodeError, csv.Error) as e:
+            # Not a UTF-8 CSV/JSON Lines file past this point; keep what was
+            # committed and report where reading stopped
+            report.add_error(None, f'file could not be read after {report.imported} imported rows: {e}')
+            break
+        if not chunk:
+            break
+        rows = []
+        for line_number, record in chunk:
+            row, error = validate_record(record, quiz_id)
+            if error:
+                report.add_error(line_number, error)
+            else:
+                rows.append((line_number, row))
+
+        unknown = {row['quiz_id'] for _, row in rows} - known_quizzes
+        if unknown:
+            known_quizzes.update(id for id, in db.session.query(Quiz.id).filter(Quiz.id.in_(unknown)))
+        valid = []
+        for line_number, row in rows:
+            if row['quiz_id'] in known_quizzes:
+                valid.append(row)
+            else:
+                report.add_error(line_number, f"quiz {row['quiz_id']} does not exist")
+
+        if valid:
+            # A Core insert on the table skips the ORM bulk-insert bookkeeping
+            db.session.execute(Question.__table__.insert(), valid)
+            # Bump with every chunk: a payload cached between two chunks
+            # must not outlive the next one
+            for chunk_quiz_id in {row['quiz_id'] for row in valid}:
+                bump_content_version(chunk_quiz_id)
+                report.quiz_ids.add(chunk_quiz_id)
+            db.session.commit()
+            report.imported += len(valid)
+        if progress is not None:
+            progress(report)
+    report.errors.sort(key=lambda error: (error[0] is None, error[0] or 0))
+    return report
+
+def write_error_report(report, stream):
+    # CSV of (line, error) for a text stream
+    writer = csv.writer(stream)
+    writer.writerow(['line', 'error'])
+    writer.writerows(report.errors)
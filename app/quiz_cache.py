@@ -0,0 +1,33 @@
+from flask import render_template
+from markupsafe import Markup
+
+from app.cache import Cache
+from app.models import Quiz
+
+# Cache of pre-rendered quiz content for start_quiz. Entries are keyed by quiz
+# id and tagged with Quiz.content_version, so a version bump made by any
+# worker turns every cached copy into a miss (see app/cache.py). Payloads never
+# include correct_option: only the rendered question fragment is kept.
+
+quiz_cache = Cache('quiz_payloads', 'QUIZ_CACHE_MAX_BYTES')
+
+def get_quiz_payload(quiz):
+    # Rendered question list for start_quiz, built once per content version
+    payload = quiz_cache.get(quiz.id, quiz.content_version)
+    if payload is None:
+        questions_html = render_template('_quiz_questions.html', questions=quiz.questions)
+        payload = {
+            'chapter_name': quiz.chapter.name,
+            'question_count': len(quiz.questions),
+            'questions_html': Markup(questions_html)
+        }
+        quiz_cache.put(quiz.id, quiz.content_version, payload, len(questions_html.encode('utf-8')))
+    return payload
+
+def bump_content_version(quiz_id):
+    # Called by the admin editing routes before they commit
+    from app import fragments
+    Quiz.query.filter_by(id=quiz_id).update(
+        {Quiz.content_version: Quiz.content_version + 1}, synchronize_session=False)
+    fragments.bump('quizzes')
+    quiz_cache.invalidate(quiz_id)
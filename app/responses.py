@@ -0,0 +1,80 @@
+import sys
+from array import array
+
+from app import db
+from app.models import Question, Score, AnswerKeySnapshot, AttemptResponse
+
+# Per-question responses are stored as one packed answer vector per attempt
+# instead of one row per answer. The question order the vector refers to is
+# stored once per quiz content version in AnswerKeySnapshot, so an attempt
+# costs a single small row no matter how many questions the quiz has.
+
+def pack_ids(question_ids):
+    ids = array('I', question_ids)
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids.tobytes()
+
+def unpack_ids(data):
+    ids = array('I')
+    ids.frombytes(data)
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids.tolist()
+
+def _insert_ignore(model, values):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        if db.session.get(model, (values['quiz_id'], values['content_version'])) is None:
+            db.session.add(model(**values))
+        return
+    db.session.execute(insert(model).values(**values).on_conflict_do_nothing())
+
+def record_responses(score, quiz_id, content_version, key, answers):
+    # Runs inside the caller's transaction, next to the Score insert
+    _insert_ignore(AnswerKeySnapshot, {
+        'quiz_id': quiz_id,
+        'content_version': content_version,
+        'question_ids': pack_ids(key.question_ids),
+        'correct_options': key.options
+    })
+    score.response = AttemptResponse(quiz_id=quiz_id,
+                                      content_version=content_version,
+                                      answers=answers)
+
+def get_attempt_responses(score):
+    # Per-question view of one attempt for view_attempt, or None when the
+    # attempt predates response storage
+    response = score.response
+    if response is None:
+        return None
+    snapshot = db.session.get(AnswerKeySnapshot, (response.quiz_id, response.content_version))
+    question_ids = unpack_ids(snapshot.question_ids)
+    questions = {question.id: question for question in
+                 Question.query.filter(Question.id.in_(question_ids))}
+    return [{
+        'question': questions.get(question_id),
+        'chosen_option': chosen,
+        'correct_option': correct
+    } for question_id, chosen, correct in zip(question_ids, response.answers, snapshot.correct_options)]
+
+def iter_quiz_responses(quiz_id, batch_size=1000):
+    # Stream (user_id, content_version, answers) for every stored attempt of a
+    # quiz without materializing ORM objects
+    rows = db.session.execute(
+        db.select(Score.user_id, AttemptResponse.content_version, AttemptResponse.answers)
+        .join(AttemptResponse, AttemptResponse.score_id == Score.id)
+        .where(AttemptResponse.quiz_id == quiz_id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in rows:
+        yield row.user_id, row.content_version, row.answers
+
+def get_key_snapshots(quiz_id):
+    # {content_version: (question_ids, correct_options)} for decoding streams
+    return {snapshot.content_version: (unpack_ids(snapshot.question_ids), snapshot.correct_options)
+            for snapshot in AnswerKeySnapshot.query.filter_by(quiz_id=quiz_id)}
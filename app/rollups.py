@@ -0,0 +1,153 @@
+from datetime import timedelta
+
+from app import db
+from app.database import read_session
+from app.models import Chapter, Quiz, Score, AttemptRollup
+from app.leaderboard import score_percentage
+
+# Hourly attempt rollups per quiz. Each Score insert adds itself to the
+# (quiz, hour) row inside the same transaction; dashboards and the activity
+# API aggregate these rows for any range, quiz, chapter or subject instead
+# of grouping raw attempts. `flask rebuild-rollups` recomputes them from the
+# score table, e.g. after restoring a backup.
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def _upsert_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+def record_attempt(quiz_id, attempted_at, percentage, time_taken):
+    # Fold one new attempt into its hour. Runs inside the caller's
+    # transaction, next to the Score insert
+    values = {'quiz_id': quiz_id, 'bucket': hour_bucket(attempted_at), 'attempts': 1,
+              'percentage_sum': percentage, 'time_taken_sum': time_taken}
+    insert = _upsert_insert()
+    if insert is None:
+        updated = AttemptRollup.query.filter_by(quiz_id=quiz_id, bucket=values['bucket']).update({
+            AttemptRollup.attempts: AttemptRollup.attempts + 1,
+            AttemptRollup.percentage_sum: AttemptRollup.percentage_sum + percentage,
+            AttemptRollup.time_taken_sum: AttemptRollup.time_taken_sum + time_taken,
+        }, synchronize_session=False)
+        if not updated:
+            db.session.add(AttemptRollup(**values))
+        return
+    statement = insert(AttemptRollup).values(**values)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['quiz_id', 'bucket'],
+        set_={
+            'attempts': AttemptRollup.attempts + statement.excluded.attempts,
+            'percentage_sum': AttemptRollup.percentage_sum + statement.excluded.percentage_sum,
+            'time_taken_sum': AttemptRollup.time_taken_sum + statement.excluded.time_taken_sum,
+        }))
+
+def _bucket_expression(column):
+    # Truncate a timestamp to its hour in SQL, stored the way the DateTime
+    # type stores hour_bucket() values so both paths hit the same row
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return db.func.strftime('%Y-%m-%d %H:00:00.000000', column)
+    if dialect == 'postgresql':
+        return db.func.date_trunc('hour', column)
+    return db.func.date_format(column, '%Y-%m-%d %H:00:00')
+
+def rebuild(start=None, end=None):
+    # Recompute the rollups of [start, end), widened to whole hours, or of
+    # everything; commits and returns the number of rollup rows written
+    delete = AttemptRollup.query
+    scores = db.select(
+        Score.quiz_id,
+        _bucket_expression(Score.time_stamp_of_attempt).label('bucket'),
+        db.func.count(Score.id),
+        db.func.sum(score_percentage),
+        db.func.sum(Score.time_taken)
+    )
+    if start is not None:
+        start = hour_bucket(start)
+        delete = delete.filter(AttemptRollup.bucket >= start)
+        scores = scores.where(Score.time_stamp_of_attempt >= start)
+    if end is not None:
+        if end != hour_bucket(end):
+            end = hour_bucket(end) + timedelta(hours=1)
+        delete = delete.filter(AttemptRollup.bucket < end)
+        scores = scores.where(Score.time_stamp_of_attempt < end)
+    delete.delete(synchronize_session=False)
+    result = db.session.execute(db.insert(AttemptRollup).from_select(
+        ['quiz_id', 'bucket', 'attempts', 'percentage_sum', 'time_taken_sum'],
+        scores.group_by(Score.quiz_id, 'bucket')))
+    db.session.commit()
+    return result.rowcount
+
+def _filtered(query, start=None, end=None, quiz_id=None, chapter_id=None, subject_id=None):
+    # start is inclusive and end exclusive, both on the hour buckets
+    if start is not None:
+        query = query.filter(AttemptRollup.bucket >= hour_bucket(start))
+    if end is not None:
+        query = query.filter(AttemptRollup.bucket < end)
+    if quiz_id is not None:
+        query = query.filter(AttemptRollup.quiz_id == quiz_id)
+    if chapter_id is not None or subject_id is not None:
+        quizzes = db.select(Quiz.id)
+        if chapter_id is not None:
+            quizzes = quizzes.where(Quiz.chapter_id == chapter_id)
+        if subject_id is not None:
+            quizzes = quizzes.join(Chapter).where(Chapter.subject_id == subject_id)
+        query = query.filter(AttemptRollup.quiz_id.in_(quizzes))
+    return query
+
+def _averages(attempts, percentage_sum, time_taken_sum):
+    return {
+        'attempts': attempts or 0,
+        'avg_score': percentage_sum / attempts if attempts else 0,
+        'avg_time_taken': time_taken_sum / attempts if attempts else 0
+    }
+
+def totals(**filters):
+    # Attempt count and average score/time over the matching rollups
+    row = _filtered(read_session().query(
+        db.func.sum(AttemptRollup.attempts),
+        db.func.sum(AttemptRollup.percentage_sum),
+        db.func.sum(AttemptRollup.time_taken_sum)
+    ), **filters).one()
+    return _averages(*row)
+
+def attempts_by_hour_of_day(**filters):
+    # {hour of day: attempts}
+    hour = db.func.extract('hour', AttemptRollup.bucket)
+    return {int(h): count for h, count in _filtered(read_session().query(
+        hour, db.func.sum(AttemptRollup.attempts)
+    ), **filters).group_by(hour).all()}
+
+def series(granularity='hour', **filters):
+    # Attempts and averages per hour or per day, oldest first
+    if granularity == 'day':
+        period = db.func.date(AttemptRollup.bucket)
+    else:
+        period = AttemptRollup.bucket
+    rows = _filtered(read_session().query(
+        period,
+        db.func.sum(AttemptRollup.attempts),
+        db.func.sum(AttemptRollup.percentage_sum),
+        db.func.sum(AttemptRollup.time_taken_sum)
+    ), **filters).group_by(period).order_by(period).all()
+    return [dict(_averages(*sums), period=str(period) if granularity == 'day' else period.isoformat())
+            for period, *sums in rows]
+
+def quiz_averages(**filters):
+    # [(quiz_id, chapter name, attempts and averages)] for quizzes with attempts
+    rows = _filtered(read_session().query(
+        AttemptRollup.quiz_id,
+        Chapter.name,
+        db.func.sum(AttemptRollup.attempts),
+        db.func.sum(AttemptRollup.percentage_sum),
+        db.func.sum(AttemptRollup.time_taken_sum)
+    ).join(Quiz, AttemptRollup.quiz_id == Quiz.id).join(Chapter), **filters)\
+     .group_by(AttemptRollup.quiz_id, Chapter.name).order_by(AttemptRollup.quiz_id).all()
+    return [(quiz_id, chapter_name, _averages(*sums)) for quiz_id, chapter_name, *sums in rows]
@@ -1,19 +1,24 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, abort, session
+from flask import render_template, request, redirect, url_for, flash, jsonify, abort, Response, send_file, stream_with_context
 from flask_login import login_user, login_required, logout_user, current_user
-from app import db, login_manager
-from app.models import User, Admin, Subject, Chapter, Quiz, Question, Score
+from app import db, leaderboard, analytics, grading, responses, rollups, fragments, dashboards
+from app.submissions import Submission, is_duplicate_attempt, store_submission, submission_queue
+from app.models import User, Admin, Subject, Chapter, Quiz, Question, Score, QuestionStats
+from app.quiz_cache import quiz_cache, get_quiz_payload, bump_content_version
+from app.instrumentation import request_metrics
+from app.passwords import CredentialServiceBusy, credential_service
+from app.identity import identity_for, identity_cache
+from app.live import exam_monitor
+from app.autosave import answer_fields, draft_store
+from app.listings import LISTINGS
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor
+from app.fragments import LazyData
+from app.sessions import issue_attempt_token, read_attempt_token
 from datetime import datetime, timedelta
 from functools import wraps
+import tempfile
+from sqlalchemy.exc import IntegrityError
 from flask import current_app as app
 
-@login_manager.user_loader
-def load_user(user_id):
-    # Check if it's an admin ID (prefixed with 'admin_')
-    if user_id.startswith('admin_'):
-        return Admin.query.get(int(user_id[6:]))  # Remove 'admin_' prefix
-    else:
-        return User.query.get(int(user_id))
-
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -32,6 +37,13 @@ def student_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def login_busy(template):
+    # Every hashing slot is taken: ask the client to retry instead of queueing
+    flash('The server is busy signing other students in. Please try again in a few seconds.')
+    response = app.make_response((render_template(template), 503))
+    response.headers['Retry-After'] = '5'
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -48,9 +60,13 @@ def login():
         password = request.form.get('password')
         user = User.query.filter_by(email=email).first()
         
-        if user and user.check_password(password):
-            login_user(user)
-            return redirect(url_for('user_dashboard'))
+        try:
+            if user and user.check_password(password):
+                db.session.commit()  # stores an upgraded hash, if any
+                login_user(identity_for(user))
+                return redirect(url_for('user_dashboard'))
+        except CredentialServiceBusy:
+            return login_busy('login.html')
         flash('Invalid email or password')
     return render_template('login.html')
 
@@ -66,9 +82,13 @@ def admin_login():
         password = request.form.get('password')
         admin = Admin.query.filter_by(username=username).first()
         
-        if admin and admin.check_password(password):
-            login_user(admin)
-            return redirect(url_for('admin_dashboard'))
+        try:
+            if admin and admin.check_password(password):
+                db.session.commit()  # stores an upgraded hash, if any
+                login_user(identity_for(admin))
+                return redirect(url_for('admin_dashboard'))
+        except CredentialServiceBusy:
+            return login_busy('admin_login.html')
         flash('Invalid credentials')
     return render_template('admin_login.html')
 
@@ -92,7 +112,10 @@ def register():
             
         user = User(email=email, full_name=full_name, 
                    qualification=qualification, dob=dob)
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except CredentialServiceBusy:
+            return login_busy('register.html')
         
         db.session.add(user)
         db.session.commit()
@@ -111,239 +134,148 @@ def logout():
 @login_required
 @admin_required
 def admin_dashboard():
-    subjects = Subject.query.all()
-    chapters = Chapter.query.all()
-    quizzes = Quiz.query.all()
-    
-    # Get all students
-    students = User.query.all()
-    
-    # Overall statistics
-    overall_stats = {
-        'total_students': len(students),
-        'total_quizzes': len(quizzes),
-        'total_attempts': Score.query.count(),
-        'avg_score': db.session.query(db.func.avg(Score.total_scored * 100.0 / Score.total_questions)).scalar() or 0,
-        'avg_time_taken': db.session.query(db.func.avg(Score.time_taken)).scalar() or 0
+    # Sections are cached fragments; their data is only loaded when a section
+    # has to be rendered again
+    def overall_stats():
+        # Attempt figures come from the hourly rollups
+        attempt_totals = rollups.totals()
+        return {
+            'total_students': User.query.count(),
+            'total_quizzes': Quiz.query.count(),
+            'total_attempts': attempt_totals['attempts'],
+            'avg_score': attempt_totals['avg_score'],
+            'avg_time_taken': attempt_totals['avg_time_taken']
+        }
+    
+    def time_stats():
+        # Attempt distribution by hour of day, and per day for the last 7 days
+        seven_days_ago = datetime.now() - timedelta(days=7)
+        return {
+            'hourly_attempts': {str(hour): count for hour, count in rollups.attempts_by_hour_of_day().items()},
+            'daily_attempts': {day['period']: day['attempts']
+                               for day in rollups.series('day', start=seven_days_ago)},
+            'quiz_time_stats': {quiz_id: {'chapter_name': chapter_name, 'avg_time': stats['avg_time_taken']}
+                               for quiz_id, chapter_name, stats in rollups.quiz_averages()}
+        }
+    
+    # Only the first page of each list; the rest is fetched from admin_list
+    def first_page(name):
+        return lambda: LISTINGS[name].page({})
+    
+    data = LazyData(
+        subjects=lambda: Subject.query.all(),
+        chapters=lambda: Chapter.query.options(db.joinedload(Chapter.subject)).all(),
+        overall_stats=overall_stats,
+        time_stats=time_stats,
+        subjects_page=first_page('subjects'),
+        chapters_page=first_page('chapters'),
+        quizzes_page=first_page('quizzes'),
+        rankings_page=first_page('rankings'),
+        # Subject-wise and chapter-wise statistics
+        subject_and_chapter_stats=lambda: analytics.subject_and_chapter_stats(data.subjects, data.chapters)
+    )
+    return render_template('admin_dashboard.html', data=data, today=datetime.now().date())
+
+def parse_list_args(args):
+    # Paging, sort and filter parameters of admin_list
+    limit = args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        abort(400)
+    if args.get('dir', 'asc') not in ('asc', 'desc'):
+        abort(400)
+    filters = {
+        'q': args.get('q', '').strip(),
+        'subject_id': args.get('subject_id', type=int),
+        'chapter_id': args.get('chapter_id', type=int)
     }
-    
-    # Get hourly attempt distribution
-    hourly_attempts = db.session.query(
-        db.func.extract('hour', Score.time_stamp_of_attempt).label('hour'),
-        db.func.count().label('count')
-    ).group_by('hour').all()
-    
-    # Get daily attempt distribution for last 7 days
-    seven_days_ago = datetime.now() - timedelta(days=7)
-    daily_attempts = db.session.query(
-        db.func.date(Score.time_stamp_of_attempt).label('date'),
-        db.func.count().label('count')
-    ).filter(Score.time_stamp_of_attempt >= seven_days_ago)\
-     .group_by('date').all()
-    
-    # Get quiz-wise average time taken
-    quiz_time_stats = db.session.query(
-        Quiz.id,
-        Quiz.chapter_id,
-        db.func.avg(Score.time_taken).label('avg_time')
-    ).join(Score).group_by(Quiz.id).all()
-    
-    # Add time-based metrics to overall_stats
-    overall_stats.update({
-        'hourly_attempts': {str(hour): count for hour, count in hourly_attempts},
-        'daily_attempts': {str(date): count for date, count in daily_attempts},
-        'quiz_time_stats': {quiz_id: {'chapter_id': chapter_id, 'avg_time': float(avg_time)} 
-                           for quiz_id, chapter_id, avg_time in quiz_time_stats}
-    })
-    
-    # Student rankings
-    student_rankings = []
-    for student in students:
-        scores = Score.query.filter_by(user_id=student.id).all()
-        if scores:
-            avg_score = sum(s.total_scored * 100.0 / s.total_questions for s in scores) / len(scores)
-            total_attempts = len(scores)
-            # Calculate subject-wise performance
-            subject_performance = {}
-            for subject in subjects:
-                subject_quizzes = Quiz.query.join(Chapter).filter(Chapter.subject_id == subject.id).all()
-                if subject_quizzes:
-                    quiz_ids = [q.id for q in subject_quizzes]
-                    subject_scores = [s for s in scores if s.quiz_id in quiz_ids]
-                    if subject_scores:
-                        subject_avg = sum(s.total_scored * 100.0 / s.total_questions for s in subject_scores) / len(subject_scores)
-                        subject_performance[subject.name] = subject_avg
-            
-            student_rankings.append({
-                'student': student,
-                'avg_score': avg_score,
-                'total_attempts': total_attempts,
-                'subject_performance': subject_performance
-            })
-    
-    # Sort by average score
-    student_rankings.sort(key=lambda x: x['avg_score'], reverse=True)
-    
-    # Add rank to each student
-    for i, ranking in enumerate(student_rankings, 1):
-        ranking['rank'] = i
-    
-    # Subject-wise statistics
-    subject_stats = []
-    for subject in subjects:
-        subject_quizzes = Quiz.query.join(Chapter).filter(Chapter.subject_id == subject.id).all()
-        if subject_quizzes:
-            quiz_ids = [q.id for q in subject_quizzes]
-            scores = Score.query.filter(Score.quiz_id.in_(quiz_ids)).all()
-            if scores:
-                all_scores = [s.total_scored * 100.0 / s.total_questions for s in scores]
-                avg_score = sum(all_scores) / len(all_scores)
-                # Calculate median
-                sorted_scores = sorted(all_scores)
-                mid = len(sorted_scores) // 2
-                median = sorted_scores[mid] if len(sorted_scores) % 2 else (sorted_scores[mid-1] + sorted_scores[mid]) / 2
-                # Calculate mode
-                from statistics import mode, multimode
-                try:
-                    score_mode = mode(all_scores)
-                except:
-                    score_mode = multimode(all_scores)[0]  # Take first mode if multiple exist
-                
-                subject_stats.append({
-                    'subject': subject,
-                    'avg_score': avg_score,
-                    'median_score': median,
-                    'mode_score': score_mode,
-                    'total_attempts': len(scores),
-                    'num_quizzes': len(subject_quizzes)
-                })
-    
-    # Chapter-wise statistics
-    chapter_stats = []
-    for chapter in chapters:
-        chapter_quizzes = Quiz.query.filter_by(chapter_id=chapter.id).all()
-        if chapter_quizzes:
-            quiz_ids = [q.id for q in chapter_quizzes]
-            scores = Score.query.filter(Score.quiz_id.in_(quiz_ids)).all()
-            if scores:
-                all_scores = [s.total_scored * 100.0 / s.total_questions for s in scores]
-                avg_score = sum(all_scores) / len(all_scores)
-                # Calculate median
-                sorted_scores = sorted(all_scores)
-                mid = len(sorted_scores) // 2
-                median = sorted_scores[mid] if len(sorted_scores) % 2 else (sorted_scores[mid-1] + sorted_scores[mid]) / 2
-                
-                chapter_stats.append({
-                    'chapter': chapter,
-                    'avg_score': avg_score,
-                    'median_score': median,
-                    'total_attempts': len(scores),
-                    'num_quizzes': len(chapter_quizzes)
-                })
-    
-    return render_template('admin_dashboard.html',
-                         subjects=subjects,
-                         chapters=chapters,
-                         quizzes=quizzes,
-                         overall_stats=overall_stats,
-                         student_rankings=student_rankings,
-                         subject_stats=subject_stats,
-                         chapter_stats=chapter_stats)
+    return filters, {
+        'cursor': args.get('cursor'),
+        'limit': limit,
+        'sort': args.get('sort'),
+        'descending': args.get('dir') == 'desc'
+    }
+
+@app.template_global()
+def next_page_url(collection, page):
+    # Next page of a list fragment, keeping the current sort and filters
+    args = request.args.to_dict() if request.endpoint == 'admin_list' else {}
+    args.update(cursor=page.next_cursor, format='html')
+    return url_for('admin_list', collection=collection, **args)
+
+def conditional_json(tag, build):
+    # JSON from build(), or a 304 without calling it when the client already
+    # holds this ETag
+    if request.if_none_match.contains(tag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(tag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/admin/list/<collection>')
+@login_required
+@admin_required
+def admin_list(collection):
+    # One keyset page of a dashboard list, as JSON or as the HTML rows the
+    # dashboard appends ("Load more") or swaps in (search box)
+    listing = LISTINGS.get(collection)
+    if listing is None:
+        abort(404)
+    filters, paging = parse_list_args(request.args)
+
+    def build_page():
+        try:
+            return listing.page(filters, **paging)
+        except (KeyError, InvalidCursor):
+            abort(400)
+
+    if request.args.get('format') == 'html':
+        page, rows = build_page()
+        return render_template(f'_list_{collection}.html', collection=collection, page=page, rows=rows)
+
+    def build_json():
+        page, rows = build_page()
+        return {
+            'items': [listing.to_json(row) for row in rows],
+            'next_cursor': page.next_cursor
+        }
+    return conditional_json(fragments.etag(collection, sorted(request.args.items(multi=True)), listing.version()),
+                            build_json)
 
 @app.route('/user/dashboard')
 @login_required
 @student_required
 def user_dashboard():
-    # Get available quizzes (future quizzes)
-    available_quizzes = Quiz.query.filter(Quiz.date_of_quiz > datetime.now()).all()
-    
-    # Get user's quiz attempts
-    user_scores = Score.query.filter_by(user_id=current_user.id).order_by(Score.time_stamp_of_attempt.desc()).all()
-    
-    # Calculate overall statistics
-    total_attempts = len(user_scores)
-    if total_attempts > 0:
-        avg_score = sum(s.total_scored * 100.0 / s.total_questions for s in user_scores) / total_attempts
-        personal_best = max((s.total_scored * 100.0 / s.total_questions) for s in user_scores)
-        recent_avg = sum(s.total_scored * 100.0 / s.total_questions for s in user_scores[:5]) / min(5, total_attempts)
-    else:
-        avg_score = personal_best = recent_avg = 0
-    
-    overall_stats = {
-        'total_attempts': total_attempts,
-        'avg_score': avg_score,
-        'personal_best': personal_best,
-        'recent_avg': recent_avg
-    }
-    
-    # Calculate user's ranking
-    all_students = User.query.all()
-    rankings = []
-    for student in all_students:
-        student_scores = Score.query.filter_by(user_id=student.id).all()
-        if student_scores:
-            student_avg = sum(s.total_scored * 100.0 / s.total_questions for s in student_scores) / len(student_scores)
-            rankings.append((student.id, student_avg))
-    
-    # Sort by average score
-    rankings.sort(key=lambda x: x[1], reverse=True)
-
-    # Check if the user is in the rankings
-    user_rank = next((i for i, (student_id, _) in enumerate(rankings, 1) if student_id == current_user.id), None)
-    total_students = len(rankings)
-    
-    ranking_info = {
-        'rank': user_rank if user_rank is not None else 'N/A',
-        'total_students': total_students,
-        'percentile': ((total_students - user_rank + 1) / total_students) * 100 if user_rank is not None and total_students > 0 else 0
-    }
-    
-    # Calculate subject-wise performance
-    subjects = Subject.query.all()
-    subject_performance = []
-    
-    for subject in subjects:
-        # Get all quizzes for this subject
-        subject_quizzes = Quiz.query.join(Chapter).filter(Chapter.subject_id == subject.id).all()
-        if subject_quizzes:
-            quiz_ids = [q.id for q in subject_quizzes]
-            subject_scores = [s for s in user_scores if s.quiz_id in quiz_ids]
-            
-            if subject_scores:
-                total_subject_attempts = len(subject_scores)
-                subject_avg = sum(s.total_scored * 100.0 / s.total_questions for s in subject_scores) / total_subject_attempts
-                subject_best = max(s.total_scored * 100.0 / s.total_questions for s in subject_scores)
-                
-                # Get chapter breakdown
-                chapters = Chapter.query.filter_by(subject_id=subject.id).all()
-                chapter_stats = []
-                
-                for chapter in chapters:
-                    chapter_quizzes = [q for q in subject_quizzes if q.chapter_id == chapter.id]
-                    if chapter_quizzes:
-                        chapter_scores = [s for s in subject_scores if s.quiz_id in [q.id for q in chapter_quizzes]]
-                        if chapter_scores:
-                            chapter_avg = sum(s.total_scored * 100.0 / s.total_questions for s in chapter_scores) / len(chapter_scores)
-                            chapter_stats.append({
-                                'chapter': chapter,
-                                'avg_score': chapter_avg,
-                                'attempts': len(chapter_scores)
-                            })
-                
-                subject_performance.append({
-                    'subject': subject,
-                    'avg_score': subject_avg,
-                    'best_score': subject_best,
-                    'total_attempts': total_subject_attempts,
-                    'chapters': chapter_stats
-                })
+    # Sections are cached fragments, see admin_dashboard, rendered from the
+    # same cached data as the JSON API
+    def user_scores():
+        return Score.query.filter_by(user_id=current_user.id)\
+            .options(db.joinedload(Score.quiz).joinedload(Quiz.chapter).joinedload(Chapter.subject))\
+            .order_by(Score.time_stamp_of_attempt.desc()).all()
+    
+    def section(name):
+        return lambda: dashboards.get(name, current_user.id)
+    
+    data = LazyData(
+        overview=section('overview'),
+        performance=section('performance'),
+        available_quizzes=section('available_quizzes'),
+        user_scores=user_scores
+    )
     
     return render_template('user_dashboard.html',
-                         available_quizzes=available_quizzes,
-                         user_scores=user_scores,
-                         overall_stats=overall_stats,
-                         subject_performance=subject_performance,
-                         ranking_info=ranking_info)
+                         data=data,
+                         ranking_info=dashboards.get('ranking', current_user.id))
+
+@app.route('/api/user/<any(overview, ranking, performance):section>')
+@app.route('/api/quizzes/available', defaults={'section': 'available_quizzes'})
+@login_required
+@student_required
+def dashboard_api(section):
+    # The sections of user_dashboard as JSON
+    return conditional_json(dashboards.etag(section, current_user.id),
+                            lambda: dashboards.get(section, current_user.id))
 
 # Admin routes for managing subjects, chapters, and quizzes
 @app.route('/admin/subject/add', methods=['POST'])
@@ -359,6 +291,7 @@ def add_subject():
         
     subject = Subject(name=name, description=description)
     db.session.add(subject)
+    fragments.bump('subjects')
     db.session.commit()
     
     flash('Subject added successfully')
@@ -369,7 +302,13 @@ def add_subject():
 @admin_required
 def delete_subject(id):
     subject = Subject.query.get_or_404(id)
+    # Scores cascade away with the subject, so their owners need fresh aggregates
+    affected_users = [user_id for user_id, in db.session.query(Score.user_id)
+                      .join(Quiz).join(Chapter).filter(Chapter.subject_id == id).distinct()]
     db.session.delete(subject)
+    db.session.flush()
+    leaderboard.refresh_users(affected_users)
+    fragments.bump('subjects', 'chapters', 'quizzes', 'scores')
     db.session.commit()
     flash('Subject deleted successfully')
     return redirect(url_for('admin_dashboard'))
@@ -389,6 +328,7 @@ def add_chapter():
     subject = Subject.query.get_or_404(subject_id)
     chapter = Chapter(subject=subject, name=name, description=description)
     db.session.add(chapter)
+    fragments.bump('chapters')
     db.session.commit()
     
     flash('Chapter added successfully')
@@ -399,7 +339,13 @@ def add_chapter():
 @admin_required
 def delete_chapter(id):
     chapter = Chapter.query.get_or_404(id)
+    # Scores cascade away with the chapter, so their owners need fresh aggregates
+    affected_users = [user_id for user_id, in db.session.query(Score.user_id)
+                      .join(Quiz).filter(Quiz.chapter_id == id).distinct()]
     db.session.delete(chapter)
+    db.session.flush()
+    leaderboard.refresh_users(affected_users)
+    fragments.bump('chapters', 'quizzes', 'scores')
     db.session.commit()
     flash('Chapter deleted successfully')
     return redirect(url_for('admin_dashboard'))
@@ -430,12 +376,14 @@ def create_quiz():
             remarks=remarks
         )
         db.session.add(quiz)
+        fragments.bump('quizzes')
         db.session.commit()
         
         questions_data = parse_questions_from_form(request.form)
         if not questions_data:
             flash('At least one question is required')
             db.session.delete(quiz)
+            fragments.bump('quizzes')
             db.session.commit()
             return redirect(url_for('create_quiz'))
             
@@ -451,6 +399,7 @@ def create_quiz():
             ]):
                 flash('All question fields are required')
                 db.session.delete(quiz)
+                fragments.bump('quizzes')
                 db.session.commit()
                 return redirect(url_for('create_quiz'))
                 
@@ -466,6 +415,7 @@ def create_quiz():
             db.session.add(question)
         
         try:
+            fragments.bump('quizzes')
             db.session.commit()
             flash('Quiz created successfully')
             return redirect(url_for('admin_dashboard'))
@@ -507,6 +457,7 @@ def edit_quiz(quiz_id):
         quiz.date_of_quiz = date_of_quiz
         quiz.time_duration = time_duration
         quiz.remarks = remarks
+        bump_content_version(quiz.id)
         
         # Delete existing questions
         Question.query.filter_by(quiz_id=quiz.id).delete()
@@ -568,7 +519,9 @@ def delete_quiz(quiz_id):
         # Delete all questions first
         Question.query.filter_by(quiz_id=quiz_id).delete()
         db.session.delete(quiz)
+        fragments.bump('quizzes')
         db.session.commit()
+        quiz_cache.invalidate(quiz_id)
         flash('Quiz deleted successfully')
     except Exception as e:
         db.session.rollback()
@@ -581,7 +534,19 @@ def delete_quiz(quiz_id):
 @admin_required
 def view_quiz_questions(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    return render_template('view_questions.html', quiz=quiz)
+    question_stats = {stats.question_id: stats for stats in QuestionStats.query.filter_by(quiz_id=quiz_id)}
+    return render_template('view_questions.html', quiz=quiz, question_stats=question_stats)
+
+@app.route('/admin/quiz/<int:quiz_id>/item-analysis', methods=['POST'])
+@login_required
+@admin_required
+def analyze_quiz_items(quiz_id):
+    from app import item_analysis
+    Quiz.query.get_or_404(quiz_id)
+    analysis = item_analysis.analyze_quiz(quiz_id)
+    db.session.commit()
+    flash(f'Item statistics updated from {analysis.attempt_count} attempts')
+    return redirect(url_for('view_quiz_questions', quiz_id=quiz_id))
 
 @app.route('/admin/quiz/<int:quiz_id>/question/add', methods=['POST'])
 @login_required
@@ -610,11 +575,29 @@ def add_question(quiz_id):
         correct_option=int(correct_option)
     )
     db.session.add(question)
+    bump_content_version(quiz_id)
     db.session.commit()
     
     flash('Question added successfully')
     return redirect(url_for('view_quiz_questions', quiz_id=quiz_id))
 
+@app.route('/admin/questions/import', methods=['POST'])
+@app.route('/admin/quiz/<int:quiz_id>/questions/import', methods=['POST'])
+@login_required
+@admin_required
+def import_questions(quiz_id=None):
+    from app import question_import
+    quiz = Quiz.query.get_or_404(quiz_id) if quiz_id is not None else None
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or JSON Lines file to import')
+        return redirect(url_for('view_quiz_questions', quiz_id=quiz_id) if quiz else url_for('admin_dashboard'))
+
+    report = question_import.import_questions(upload.stream,
+                                              question_import.detect_format(upload.filename),
+                                              quiz_id=quiz_id)
+    return render_template('import_report.html', report=report, quiz=quiz, filename=upload.filename)
+
 @app.route('/admin/question/<int:question_id>/edit', methods=['POST'])
 @login_required
 @admin_required
@@ -627,6 +610,7 @@ def edit_question(question_id):
     question.option3 = request.form.get('option3').strip()
     question.option4 = request.form.get('option4').strip()
     question.correct_option = int(request.form.get('correct_option'))
+    bump_content_version(question.quiz_id)
     
     db.session.commit()
     flash('Question updated successfully')
@@ -639,6 +623,7 @@ def delete_question(question_id):
     question = Question.query.get_or_404(question_id)
     quiz_id = question.quiz_id
     db.session.delete(question)
+    bump_content_version(quiz_id)
     db.session.commit()
     flash('Question deleted successfully')
     return redirect(url_for('view_quiz_questions', quiz_id=quiz_id))
@@ -650,45 +635,87 @@ def start_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     now = datetime.now()
     
-    # Check if quiz has ended
-    quiz_end_time = quiz.date_of_quiz + timedelta(minutes=quiz.time_duration)
-    if now > quiz_end_time:
-        flash('This quiz has ended')
-        return redirect(url_for('user_dashboard'))
-    
     # Check if user has already attempted
-    if Score.query.filter_by(quiz_id=quiz_id, user_id=current_user.id).first():
+    if submission_queue.is_pending(quiz_id, current_user.id) or \
+            Score.query.filter_by(quiz_id=quiz_id, user_id=current_user.id).first():
         flash('You have already attempted this quiz')
         return redirect(url_for('user_dashboard'))
     
-    # Check if quiz has questions
-    if not quiz.questions:
-        flash('This quiz has no questions')
+    # An attempt started earlier (a reload, another device) resumes with its
+    # own timing and saved answers
+    draft = draft_store.get(quiz_id, current_user.id)
+    if draft is not None and draft.ends_at <= now:
+        draft_store.finalize(draft)
+        flash('Your time for this quiz is up; your saved answers have been submitted')
         return redirect(url_for('user_dashboard'))
     
-    # Calculate quiz duration based on time remaining until quiz end
-    remaining_time = min(
-        quiz.time_duration,
-        int((quiz_end_time - now).total_seconds() / 60)
-    )
-    
-    if remaining_time <= 0:
+    # Check if quiz has ended
+    quiz_end_time = quiz.date_of_quiz + timedelta(minutes=quiz.time_duration)
+    if draft is None and now > quiz_end_time:
         flash('This quiz has ended')
         return redirect(url_for('user_dashboard'))
     
-    # Store quiz timing in session
-    quiz_start = now
-    quiz_end = quiz_start + timedelta(minutes=remaining_time)
+    # Check if quiz has questions, using the cached payload so concurrent
+    # starts don't each reload and re-render the question list
+    payload = get_quiz_payload(quiz)
+    if not payload['question_count']:
+        flash('This quiz has no questions')
+        return redirect(url_for('user_dashboard'))
     
-    session['quiz_start_time'] = quiz_start.timestamp()
-    session['quiz_end_time'] = quiz_end.timestamp()
-    session['quiz_id'] = quiz_id  # Store quiz ID to prevent session reuse
+    if draft is None:
+        # Calculate quiz duration based on time remaining until quiz end
+        remaining_time = min(
+            quiz.time_duration,
+            int((quiz_end_time - now).total_seconds() / 60)
+        )
+        
+        if remaining_time <= 0:
+            flash('This quiz has ended')
+            return redirect(url_for('user_dashboard'))
+        
+        draft = draft_store.begin(quiz_id, current_user.id, now, now + timedelta(minutes=remaining_time))
+        saved_answers = {}
+    else:
+        remaining_time = int((draft.ends_at - now).total_seconds() / 60)
+        saved_answers = answer_fields(draft_store.saved_answers(quiz_id, current_user.id))
+    
+    exam_monitor.record_start(quiz_id, current_user.id)
     
     return render_template('take_quiz.html',
                          quiz=quiz,
+                         payload=payload,
                          remaining_time=remaining_time,
                          now=now,
-                         quiz_end_time=quiz_end)
+                         quiz_end_time=draft.ends_at,
+                         saved_answers=saved_answers,
+                         attempt_token=issue_attempt_token(quiz_id, current_user.id, draft.started_at, draft.ends_at))
+
+@app.route('/quiz/<int:quiz_id>/autosave', methods=['POST'])
+@login_required
+@student_required
+def autosave_quiz(quiz_id):
+    # Answer deltas from the quiz page, {"answers": {"answer_<question id>": option}}
+    # with option 0 for a cleared answer, and the page's attempt token in
+    # X-Attempt-Token; buffered, not written by this request
+    timing = read_attempt_token(request.headers.get('X-Attempt-Token'), quiz_id, current_user.id)
+    if timing is None:
+        abort(409)
+    if datetime.now() > timing[1] + timedelta(seconds=app.config['AUTOSAVE_GRACE_SECONDS']):
+        abort(409)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('answers'), dict):
+        abort(400)
+    quiz = Quiz.query.get_or_404(quiz_id)
+    question_ids = set(grading.get_answer_key(quiz).question_ids)
+    answers = {}
+    for field, value in data['answers'].items():
+        question_id = field[len('answer_'):] if field.startswith('answer_') else ''
+        if not question_id.isdigit() or int(question_id) not in question_ids \
+                or str(value) not in ('0', '1', '2', '3', '4'):
+            abort(400)
+        answers[int(question_id)] = int(value)
+    draft_store.save(quiz_id, current_user.id, answers)
+    return '', 204
 
 @app.route('/quiz/<int:quiz_id>/submit', methods=['POST'])
 @login_required
@@ -697,17 +724,16 @@ def submit_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     now = datetime.now()
     
-    # Verify quiz session
-    session_quiz_id = session.get('quiz_id')
-    quiz_start_time = session.get('quiz_start_time')
-    quiz_end_time = session.get('quiz_end_time')
-    
-    if not all([session_quiz_id, quiz_start_time, quiz_end_time]) or session_quiz_id != quiz_id:
-        flash('Invalid quiz session')
-        return redirect(url_for('user_dashboard'))
-    
-    quiz_start_time = datetime.fromtimestamp(quiz_start_time)
-    quiz_end_time = datetime.fromtimestamp(quiz_end_time)
+    # Attempt timing from the token start_quiz put in the form; a saved draft
+    # stands in for a missing or invalid one
+    timing = read_attempt_token(request.form.get('attempt_token'), quiz_id, current_user.id)
+    if timing is None:
+        draft = draft_store.get(quiz_id, current_user.id)
+        if draft is None:
+            flash('Invalid quiz session')
+            return redirect(url_for('user_dashboard'))
+        timing = draft.started_at, draft.ends_at
+    quiz_start_time, quiz_end_time = timing
     
     # Check if quiz time has expired
     if now > quiz_end_time:
@@ -715,38 +741,68 @@ def submit_quiz(quiz_id):
         # Continue to process answers even if time expired
     
     # Check if user has already attempted
-    if Score.query.filter_by(quiz_id=quiz_id, user_id=current_user.id).first():
+    if submission_queue.is_pending(quiz_id, current_user.id) or \
+            Score.query.filter_by(quiz_id=quiz_id, user_id=current_user.id).first():
         flash('You have already attempted this quiz')
         return redirect(url_for('user_dashboard'))
     
-    total_questions = len(quiz.questions)
+    answer_key = grading.get_answer_key(quiz)
+    total_questions = len(answer_key)
     if total_questions == 0:
         flash('This quiz has no questions')
         return redirect(url_for('user_dashboard'))
     
-    correct_answers = 0
-    for question in quiz.questions:
-        user_answer = request.form.get(f'answer_{question.id}')
-        if user_answer and int(user_answer) == question.correct_option:
-            correct_answers += 1
+    # Posted answers win over autosaved ones, which fill in the rest
+    submitted = answer_fields(draft_store.saved_answers(quiz_id, current_user.id))
+    submitted.update(request.form.items())
+    answers = grading.parse_answers(submitted, answer_key)
+    correct_answers = grading.grade(answer_key, answers)
     
     # Calculate time taken in minutes
     time_taken = int((now - quiz_start_time).total_seconds() / 60)
     
-    score = Score(
+    submission = Submission(
         quiz_id=quiz_id,
         user_id=current_user.id,
+        content_version=quiz.content_version,
         total_scored=correct_answers,
         total_questions=total_questions,
         time_stamp_of_attempt=now,
-        time_taken=time_taken
+        time_taken=time_taken,
+        question_ids=answer_key.question_ids,
+        options=answer_key.options,
+        answers=answers
     )
-    db.session.add(score)
-    db.session.commit()
+    if submission_queue.enabled:
+        # Journaled now, stored by the background writer's next group commit.
+        # The draft is claimed in the same transaction, committed once the
+        # submission is journaled, so no worker's sweeper submits its
+        # autosaved answers in the meantime
+        try:
+            draft_store.discard(quiz_id, current_user.id)
+            accepted = submission_queue.submit(submission)
+        except Exception:
+            db.session.rollback()
+            raise
+        if not accepted:
+            db.session.rollback()
+            flash('You have already attempted this quiz')
+            return redirect(url_for('user_dashboard'))
+        db.session.commit()
+    else:
+        try:
+            draft_store.discard(quiz_id, current_user.id)
+            store_submission(submission)
+            db.session.commit()
+        except IntegrityError as error:
+            db.session.rollback()
+            if not is_duplicate_attempt(error):
+                raise
+            # A concurrent submit for the same quiz won the uq_score_quiz_user race
+            flash('You have already attempted this quiz')
+            return redirect(url_for('user_dashboard'))
     
-    # Clear quiz session
-    session.pop('quiz_start_time', None)
-    session.pop('quiz_end_time', None)
+    exam_monitor.record_submission(quiz_id, current_user.id, correct_answers * 100.0 / total_questions)
     
     flash(f'Quiz submitted successfully. You scored {correct_answers} out of {total_questions}')
     return redirect(url_for('user_dashboard'))
@@ -761,7 +817,148 @@ def view_attempt(attempt_id):
         flash('Access denied')
         return redirect(url_for('user_dashboard'))
     
-    return render_template('view_attempt.html', score=score)
+    return render_template('view_attempt.html', score=score,
+                         responses=responses.get_attempt_responses(score))
+
+def runtime_gauges():
+    # Process-local cache and queue figures reported next to the request metrics
+    gauges = []
+    for name, cache in (('quiz_cache', quiz_cache), ('answer_key_cache', grading.answer_key_cache),
+                        ('fragment_cache', fragments.fragment_cache),
+                        ('dashboard_data_cache', dashboards.data_cache)):
+        stats = cache.stats()
+        if stats['bytes'] is not None:  # not tracked by the redis backend
+            gauges.append((f'{name}_bytes', 'Bytes held by the cache.', stats['bytes']))
+        gauges.append((f'{name}_hits', 'Cache hits since startup.', stats['hits']))
+        gauges.append((f'{name}_misses', 'Cache misses since startup.', stats['misses']))
+    queue = submission_queue.stats()
+    gauges.append(('submission_queue_depth', 'Submissions waiting to be written.', queue['queue_depth']))
+    gauges.append(('submission_queue_last_flush_ms', 'Duration of the last group commit.', queue['last_flush_ms']))
+    identity = identity_cache.stats()
+    gauges.append(('identity_cache_hits', 'current_user lookups served from the cache.', identity['hits']))
+    gauges.append(('identity_cache_misses', 'current_user lookups that queried the database.', identity['misses']))
+    autosave = draft_store.stats()
+    gauges.append(('autosave_buffered_answers', 'Autosaved answers waiting to be written.', autosave['buffered_answers']))
+    gauges.append(('autosave_finalized', 'Expired attempts submitted from their drafts.', autosave['finalized']))
+    monitor = exam_monitor.stats()
+    gauges.append(('live_monitor_watchers', 'Open live exam monitoring streams.', monitor['watchers']))
+    gauges.append(('password_checks_rejected', 'Logins turned away because every hashing slot was busy.',
+                   credential_service.rejected))
+    return gauges
+
+@app.route('/admin/quiz/<int:quiz_id>/live')
+@login_required
+@admin_required
+def live_monitor(quiz_id):
+    quiz = Quiz.query.options(db.joinedload(Quiz.chapter)).get_or_404(quiz_id)
+    return render_template('live_monitor.html', quiz=quiz)
+
+@app.route('/admin/quiz/<int:quiz_id>/live/events')
+@login_required
+@admin_required
+def live_monitor_events(quiz_id):
+    # Not wrapped in stream_with_context: the stream reads in-memory counters
+    # only, so the request context and its database session end right away
+    Quiz.query.get_or_404(quiz_id)
+    response = Response(exam_monitor.stream(quiz_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: flush every event
+    return response
+
+@app.route('/metrics')
+def metrics():
+    # Scrapers authenticate with METRICS_TOKEN; admins can view it when logged in
+    token = app.config['METRICS_TOKEN']
+    authorized = token and request.headers.get('Authorization') == f'Bearer {token}'
+    if not authorized and not (current_user.is_authenticated and current_user.is_admin()):
+        abort(403)
+    return Response(request_metrics.prometheus_text(runtime_gauges()),
+                    mimetype='text/plain; version=0.0.4')
+
+def parse_export_filters(args):
+    # Filters shared by the export view; date_to is the last day included
+    filters = {
+        'subject_id': args.get('subject_id', type=int),
+        'chapter_id': args.get('chapter_id', type=int),
+        'quiz_id': args.get('quiz_id', type=int),
+        'date_from': None,
+        'date_to': None
+    }
+    try:
+        if args.get('date_from'):
+            filters['date_from'] = datetime.strptime(args['date_from'], '%Y-%m-%d')
+        if args.get('date_to'):
+            filters['date_to'] = datetime.strptime(args['date_to'], '%Y-%m-%d') + timedelta(days=1)
+    except ValueError:
+        abort(400)
+    return filters
+
+@app.route('/admin/activity')
+@login_required
+@admin_required
+def attempt_activity():
+    # Attempt counts and averages per hour or day from the rollups; defaults
+    # to the last 7 days, or ?days=N, or an explicit date_from/date_to
+    filters = parse_export_filters(request.args)
+    granularity = request.args.get('granularity', 'day')
+    days = request.args.get('days', 7, type=int)
+    if granularity not in ('hour', 'day') or days < 1:
+        abort(400)
+    start = filters.pop('date_from') or datetime.now() - timedelta(days=days)
+    end = filters.pop('date_to')
+    return jsonify({
+        'granularity': granularity,
+        'from': start.isoformat(),
+        'to': end.isoformat() if end else None,
+        'totals': rollups.totals(start=start, end=end, **filters),
+        'series': rollups.series(granularity, start=start, end=end, **filters)
+    })
+
+@app.route('/admin/export/scores')
+@login_required
+@admin_required
+def export_scores():
+    from app import exports
+    query = exports.score_export_query(**parse_export_filters(request.args))
+    filename = f"scores-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+    if request.args.get('format') == 'parquet':
+        if not exports.parquet_available():
+            flash('Parquet export needs pyarrow installed on the server')
+            return redirect(url_for('admin_dashboard'))
+        # Parquet's footer comes last, so spool to a temporary file first
+        spool = tempfile.TemporaryFile()
+        exports.write_parquet(query, spool)
+        spool.seek(0)
+        return send_file(spool, mimetype='application/vnd.apache.parquet',
+                         as_attachment=True, download_name=f'{filename}.parquet')
+
+    return Response(stream_with_context(exports.iter_csv(query)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}.csv'})
+
+@app.route('/admin/performance')
+@login_required
+@admin_required
+def admin_performance():
+    return render_template('admin_performance.html',
+                         endpoints=request_metrics.snapshot(),
+                         started_at=datetime.fromtimestamp(request_metrics.started_at),
+                         profiles_written=request_metrics.profiles_written,
+                         quiz_cache_stats=quiz_cache.stats(),
+                         answer_key_cache_stats=grading.answer_key_cache.stats(),
+                         fragment_cache_stats=fragments.fragment_cache.stats(),
+                         dashboard_data_cache_stats=dashboards.data_cache.stats(),
+                         queue_stats=submission_queue.stats(),
+                         credential_stats=credential_service.stats(),
+                         identity_stats=identity_cache.stats())
+
+@app.route('/admin/performance/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_performance():
+    request_metrics.reset()
+    flash('Request metrics reset')
+    return redirect(url_for('admin_performance'))
 
 def parse_questions_from_form(form):
     questions = []
@@ -0,0 +1,142 @@
+import logging
+import os
+import secrets
+import tempfile
+from datetime import datetime
+
+from flask import current_app
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import BadSignature, Signer, URLSafeTimedSerializer
+
+logger = logging.getLogger(__name__)
+
+# Signing keys for the session cookie and quiz attempt tokens. Sessions live
+# entirely in the signed cookie, so any worker on any host can serve any
+# request as long as they all load the same key ring: no sticky sessions and
+# no session store. The ring comes from, in order:
+#
+#   SECRET_KEYS      a list in the config
+#   SECRET_KEY       a single key in the config
+#   the same two in the environment, SECRET_KEYS comma-separated
+#   SECRET_KEY_FILE  one key per line (default instance/secret_keys), created
+#                    with a random key if missing, which is enough for the
+#                    workers of one host
+#
+# Keys are listed newest first. The newest signs and every key verifies, so
+# after `flask rotate-secret-key` cookies signed with the previous keys stay
+# valid until the key is dropped from the ring.
+
+def _split_keys(value):
+    if isinstance(value, (list, tuple)):
+        return [key for key in value if key]
+    return [key.strip() for key in value.split(',') if key.strip()]
+
+def _read_key_file(path):
+    with open(path, encoding='utf-8') as source:
+        return [line.strip() for line in source if line.strip() and not line.startswith('#')]
+
+def _write_key_file(path, keys, replace=True):
+    # Atomically; with replace=False, fails with FileExistsError if another
+    # process wrote the file first
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.secret_keys')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as out:
+            out.write('\n'.join(keys) + '\n')
+        if replace:
+            os.replace(temporary, path)
+        else:
+            os.link(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+def new_secret_key():
+    return secrets.token_urlsafe(32)
+
+def load_secret_keys(app):
+    # The key ring, newest first
+    config = app.config
+    if config.get('SECRET_KEYS'):
+        return _split_keys(config['SECRET_KEYS'])
+    if config.get('SECRET_KEY'):
+        return [config['SECRET_KEY']]
+    if os.environ.get('SECRET_KEYS'):
+        return _split_keys(os.environ['SECRET_KEYS'])
+    if os.environ.get('SECRET_KEY'):
+        return [os.environ['SECRET_KEY']]
+    path = config.setdefault('SECRET_KEY_FILE', os.path.join(app.instance_path, 'secret_keys'))
+    try:
+        keys = _read_key_file(path)
+    except FileNotFoundError:
+        keys = []
+    if not keys:
+        try:
+            _write_key_file(path, [new_secret_key()], replace=False)
+            logger.warning('Created %s; give every host the same key ring through SECRET_KEYS', path)
+        except FileExistsError:
+            pass  # another worker created it first
+        keys = _read_key_file(path)
+    return keys
+
+def rotate_secret_keys(app, keep):
+    # Put a new key in front of the key file's ring and keep the `keep`
+    # newest keys; returns the new ring
+    path = app.config['SECRET_KEY_FILE']
+    try:
+        keys = _read_key_file(path)
+    except FileNotFoundError:
+        keys = []
+    keys = [new_secret_key()] + keys[:max(keep, 1) - 1]
+    _write_key_file(path, keys)
+    return keys
+
+def _verifying_keys(app):
+    # itsdangerous signs with the last key and verifies with all of them
+    return list(reversed(app.config['SECRET_KEYS']))
+
+class KeyRingSessionInterface(SecureCookieSessionInterface):
+
+    def get_signing_serializer(self, app):
+        if not app.config.get('SECRET_KEYS'):
+            return None
+        signer_kwargs = dict(key_derivation=self.key_derivation, digest_method=self.digest_method)
+        return URLSafeTimedSerializer(_verifying_keys(app), salt=self.salt,
+                                      serializer=self.serializer, signer_kwargs=signer_kwargs)
+
+def init_app(app):
+    keys = load_secret_keys(app)
+    app.config['SECRET_KEYS'] = keys
+    app.secret_key = keys[0]
+    app.session_interface = KeyRingSessionInterface()
+
+# Quiz attempt tokens. start_quiz hands the page a token holding the quiz,
+# the student and the attempt's start and end time,
+#
+#     <quiz id>-<user id>-<started at>-<ends at>.<signature>
+#
+# in hex and seconds, about 50 characters. The page sends it back with every
+# autosave and with the submitted form, so the timing is checked without
+# session state or a database read, on whichever worker gets the request.
+
+def _attempt_signer():
+    return Signer(_verifying_keys(current_app), salt='quiz-attempt')
+
+def issue_attempt_token(quiz_id, user_id, started_at, ends_at):
+    payload = '-'.join(format(int(value), 'x') for value in
+                       (quiz_id, user_id, started_at.timestamp(), ends_at.timestamp()))
+    return _attempt_signer().sign(payload).decode('ascii')
+
+def read_attempt_token(token, quiz_id, user_id):
+    # (started_at, ends_at) of a valid token for this quiz and student, or None
+    if not token:
+        return None
+    try:
+        payload = _attempt_signer().unsign(token).decode('ascii')
+        token_quiz, token_user, started_at, ends_at = (int(value, 16) for value in payload.split('-'))
+    except (BadSignature, ValueError):
+        return None
+    if (token_quiz, token_user) != (quiz_id, user_id):
+        return None
+    return datetime.fromtimestamp(started_at), datetime.fromtimestamp(ends_at)
@@ -0,0 +1,318 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db, leaderboard, responses, rollups
+from app.grading import AnswerKey
+from app.models import Score
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals are still written, orphan detection is skipped
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Graded submissions and how they are persisted. By default submit_quiz stores
+# each one in its own transaction. With SUBMISSION_QUEUE_ENABLED the request
+# only appends the graded submission to a local journal and an in-process
+# queue; a background writer then stores queued submissions in group commits
+# every SUBMISSION_QUEUE_FLUSH_MS milliseconds or SUBMISSION_QUEUE_BATCH_SIZE
+# rows, whichever comes first.
+#
+# Each process owns one journal file, locked for as long as the process
+# lives. At startup, journals whose lock is free belong to dead processes and
+# are replayed; replay is idempotent because the (quiz_id, user_id) unique
+# constraint turns already-stored submissions into skipped duplicates.
+#
+# Repeat submissions are refused by the process that queued the first one
+# only (is_pending). A second submit of the same attempt that reaches another
+# worker before the first is written is accepted there, then skipped as a
+# duplicate at its flush, so the first submission stands. A submission that
+# fails for any other reason, e.g. its quiz was deleted after it was
+# accepted, is logged and appended to dead-letter.journal in the journal
+# directory, which is never replayed.
+
+class Submission:
+    __slots__ = ('quiz_id', 'user_id', 'content_version', 'total_scored', 'total_questions',
+                 'time_stamp_of_attempt', 'time_taken', 'question_ids', 'options', 'answers')
+
+    def __init__(self, quiz_id, user_id, content_version, total_scored, total_questions,
+                 time_stamp_of_attempt, time_taken, question_ids, options, answers):
+        self.quiz_id = quiz_id
+        self.user_id = user_id
+        self.content_version = content_version
+        self.total_scored = total_scored
+        self.total_questions = total_questions
+        self.time_stamp_of_attempt = time_stamp_of_attempt
+        self.time_taken = time_taken
+        self.question_ids = question_ids
+        self.options = options
+        self.answers = answers
+
+    def to_json(self):
+        return json.dumps({
+            'quiz_id': self.quiz_id,
+            'user_id': self.user_id,
+            'content_version': self.content_version,
+            'total_scored': self.total_scored,
+            'total_questions': self.total_questions,
+            'time_stamp_of_attempt': self.time_stamp_of_attempt.isoformat(),
+            'time_taken': self.time_taken,
+            'question_ids': list(self.question_ids),
+            'options': self.options.hex(),
+            'answers': self.answers.hex()
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, line):
+        data = json.loads(line)
+        data['time_stamp_of_attempt'] = datetime.fromisoformat(data['time_stamp_of_attempt'])
+        data['options'] = bytes.fromhex(data['options'])
+        data['answers'] = bytes.fromhex(data['answers'])
+        return cls(**data)
+
+def store_submission(submission):
+    # Add the Score, its responses, the leaderboard and rollup updates to the current
+    # transaction; the caller commits
+    score = Score(
+        quiz_id=submission.quiz_id,
+        user_id=submission.user_id,
+        total_scored=submission.total_scored,
+        total_questions=submission.total_questions,
+        time_stamp_of_attempt=submission.time_stamp_of_attempt,
+        time_taken=submission.time_taken
+    )
+    db.session.add(score)
+    key = AnswerKey(submission.question_ids, submission.options)
+    responses.record_responses(score, submission.quiz_id, submission.content_version,
+                               key, submission.answers)
+    percentage = submission.total_scored * 100.0 / submission.total_questions
+    leaderboard.record_attempt(submission.user_id, percentage)
+    rollups.record_attempt(submission.quiz_id, submission.time_stamp_of_attempt,
+                           percentage, submission.time_taken)
+    return score
+
+def is_duplicate_attempt(error):
+    # True if an IntegrityError comes from uq_score_quiz_user, i.e. the
+    # student already has an attempt at the quiz. SQLite names the columns
+    # rather than the constraint
+    diag = getattr(error.orig, 'diag', None)
+    if diag is not None and getattr(diag, 'constraint_name', None):
+        return diag.constraint_name == 'uq_score_quiz_user'
+    message = str(error.orig)
+    return 'uq_score_quiz_user' in message or 'score.quiz_id, score.user_id' in message
+
+class SubmissionQueue:
+
+    def __init__(self):
+        self.enabled = False
+        self._app = None
+        self._queue = deque()
+        self._pending = set()  # (quiz_id, user_id) queued or being written
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._journal = None
+        self._thread = None
+        self._pid = None
+        self.flushed = 0
+        self.duplicates = 0
+        self.dead_letters = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def init_app(self, app):
+        app.config.setdefault('SUBMISSION_QUEUE_ENABLED', os.environ.get('SUBMISSION_QUEUE_ENABLED') == '1')
+        app.config.setdefault('SUBMISSION_QUEUE_FLUSH_MS', 200)
+        app.config.setdefault('SUBMISSION_QUEUE_BATCH_SIZE', 200)
+        app.config.setdefault('SUBMISSION_JOURNAL_DIR', os.path.join(app.instance_path, 'submission_journal'))
+        app.config.setdefault('SUBMISSION_JOURNAL_FSYNC', True)
+        self.enabled = app.config['SUBMISSION_QUEUE_ENABLED']
+        self._app = app
+        app.before_request(self.start)
+
+    def start(self):
+        # Replay orphaned journals and start the writer for this process
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue.clear()
+            self._pending.clear()
+            config = self._app.config
+            os.makedirs(config['SUBMISSION_JOURNAL_DIR'], exist_ok=True)
+            with self._app.app_context():
+                self._replay_orphans()
+            path = os.path.join(config['SUBMISSION_JOURNAL_DIR'], f'submissions-{os.getpid()}.journal')
+            self._journal = open(path, 'a', encoding='utf-8')
+            if fcntl is not None:
+                fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._thread = threading.Thread(target=self._run, name='submission-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+        atexit.register(self._shutdown)
+
+    def _shutdown(self):
+        if self._pid == os.getpid():
+            self.flush()
+
+    def is_pending(self, quiz_id, user_id):
+        with self._cond:
+            return (quiz_id, user_id) in self._pending
+
+    def submit(self, submission):
+        # Journal and enqueue; returns False if this user's attempt is already queued
+        self.start()
+        key = (submission.quiz_id, submission.user_id)
+        with self._cond:
+            if key in self._pending:
+                return False
+            self._journal.write(submission.to_json() + '\n')
+            self._journal.flush()
+            if self._app.config['SUBMISSION_JOURNAL_FSYNC']:
+                os.fsync(self._journal.fileno())
+            self._pending.add(key)
+            self._queue.append(submission)
+            if len(self._queue) >= self._app.config['SUBMISSION_QUEUE_BATCH_SIZE']:
+                self._cond.notify()
+        return True
+
+    def flush(self):
+        # Write everything queued so far; used by the writer and at shutdown
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._cond:
+            batch = list(self._queue)
+            self._queue.clear()
+        if batch:
+            try:
+                with self._app.app_context():
+                    self._write_batch(batch)
+            except Exception:
+                # Keep the batch (and its journal lines) for the next attempt
+                with self._cond:
+                    self._queue.extendleft(reversed(batch))
+                raise
+        with self._cond:
+            for submission in batch:
+                self._pending.discard((submission.quiz_id, submission.user_id))
+            # Everything journaled so far is stored: start a fresh journal
+            if not self._queue and self._journal is not None:
+                self._journal.truncate(0)
+                self._journal.seek(0)
+
+    def _run(self):
+        interval = self._app.config['SUBMISSION_QUEUE_FLUSH_MS'] / 1000
+        batch_size = self._app.config['SUBMISSION_QUEUE_BATCH_SIZE']
+        while True:
+            with self._cond:
+                if len(self._queue) < batch_size:
+                    self._cond.wait(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Submission flush failed; will retry from the journal')
+
+    def _write_batch(self, batch):
+        start = time.perf_counter()
+        try:
+            for submission in batch:
+                store_submission(submission)
+            db.session.commit()
+            self.flushed += len(batch)
+        except IntegrityError:
+            # Some submission was already stored (another worker, or a replay);
+            # fall back to one transaction per row so the rest still commit
+            db.session.rollback()
+            for submission in batch:
+                try:
+                    store_submission(submission)
+                    db.session.commit()
+                    self.flushed += 1
+                except IntegrityError as error:
+                    db.session.rollback()
+                    if is_duplicate_attempt(error):
+                        self.duplicates += 1
+                    else:
+                        self._dead_letter(submission)
+        except Exception:
+            db.session.rollback()
+            raise
+        elapsed = (time.perf_counter() - start) * 1000
+        self.batches += 1
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+
+    def _dead_letter(self, submission):
+        # Keep an accepted submission that can't be stored for an operator
+        path = os.path.join(self._app.config['SUBMISSION_JOURNAL_DIR'], 'dead-letter.journal')
+        logger.exception('Could not store the submission of user %s for quiz %s; kept in %s',
+                         submission.user_id, submission.quiz_id, path)
+        with open(path, 'a', encoding='utf-8') as out:
+            out.write(submission.to_json() + '\n')
+        self.dead_letters += 1
+
+    def _replay_orphans(self):
+        pattern = os.path.join(self._app.config['SUBMISSION_JOURNAL_DIR'], 'submissions-*.journal')
+        for path in glob.glob(pattern):
+            try:
+                journal = open(path, 'r+', encoding='utf-8')
+            except FileNotFoundError:
+                continue  # replayed and removed by another process
+            with journal:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # a live process owns it
+                    # The lock is on the file we opened; skip it if another
+                    # process replayed and removed it in the meantime
+                    try:
+                        if os.stat(path).st_ino != os.fstat(journal.fileno()).st_ino:
+                            continue
+                    except FileNotFoundError:
+                        continue
+                batch = []
+                for line in journal:
+                    try:
+                        batch.append(Submission.from_json(line))
+                    except ValueError:
+                        # A line torn by a crash mid-write was never acknowledged
+                        logger.warning('Skipping unreadable journal line in %s', path)
+                if batch:
+                    logger.info('Replaying %d submissions from %s', len(batch), path)
+                    self._write_batch(batch)
+                # Removed while still locked, so no other process replays it again
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._queue)
+        return {
+            'enabled': self.enabled,
+            'queue_depth': depth,
+            'flushed': self.flushed,
+            'duplicates': self.duplicates,
+            'dead_letters': self.dead_letters,
+            'batches': self.batches,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2)
+        }
+
+submission_queue = SubmissionQueue()
@@ -0,0 +1,47 @@
+"""Query count and latency of the admin dashboard statistics as the data grows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_admin_analytics
+"""
+from app import db, analytics
+from app.models import Subject, Chapter
+from benchmarks.common import make_app, populate, QueryCounter, timed
+
+SCALES = [
+    # subjects, chapters per subject, students
+    (2, 3, 100),
+    (5, 5, 1000),
+    (10, 10, 5000),
+    (20, 10, 20000),
+]
+
+def subject_chapter_stats():
+    subjects = Subject.query.all()
+    chapters = Chapter.query.all()
+    return analytics.subject_and_chapter_stats(subjects, chapters)
+
+def dashboard_stats():
+    subject_chapter_stats()
+    analytics.student_subject_performance()
+
+def main():
+    # Query count must stay constant; latency of the subject/chapter statistics
+    # follows the score scan, while the student x subject table also grows with
+    # its own output size.
+    print(f"{'subjects':>8} {'chapters':>8} {'students':>8} {'attempts':>9} {'queries':>7} "
+          f"{'stats ms':>9} {'students ms':>11}")
+    for subjects, chapters_per_subject, students in SCALES:
+        app = make_app()
+        with app.app_context():
+            attempts = populate(subjects, chapters_per_subject, quizzes_per_chapter=2,
+                                questions_per_quiz=10, students=students, attempts_per_student=5)
+            with QueryCounter(db.engine) as counter:
+                dashboard_stats()
+            stats_ms, _ = timed(subject_chapter_stats)
+            students_ms, _ = timed(analytics.student_subject_performance)
+            print(f'{subjects:>8} {subjects * chapters_per_subject:>8} {students:>8} '
+                  f'{attempts:>9} {counter.count:>7} {stats_ms:>9.1f} {students_ms:>11.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Latency of the cache backends in app/cache.py.
+
+For each backend and value size: get of a cached entry, get of a missing
+one, put, and the invalidation of one entry (which the memory backend
+broadcasts to the other workers through the generation counter). The redis
+backend is measured when the redis package is installed and a server
+answers at CACHE_REDIS_URL (default redis://localhost:6379/0).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cache
+"""
+import os
+import tempfile
+import time
+
+from flask import Flask
+from markupsafe import Markup
+
+from app.cache import Cache
+from benchmarks.common import percentile
+
+SIZES = (1024, 32 * 1024)  # about a dashboard fragment and a long quiz payload
+ENTRIES = 200
+OPERATIONS = 2000
+
+def measure(call, count=OPERATIONS):
+    # Sorted latencies in microseconds
+    latencies = []
+    for n in range(count):
+        started = time.perf_counter()
+        call(n)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return sorted(latencies)
+
+def make_cache(backend):
+    app = Flask(__name__, instance_path=tempfile.mkdtemp(prefix='quiz_master_cache_'))
+    app.config.update(CACHE_BACKEND=backend, CACHE_KEY_PREFIX=f'bench_{os.getpid()}:')
+    cache = Cache('bench', 'BENCH_CACHE_MAX_BYTES', max_bytes=64 * 1024 * 1024)
+    cache.init_app(app)
+    cache.clear()
+    return cache
+
+def run(backend, size):
+    cache = make_cache(backend)
+    value = Markup('x' * size)
+    version = (3, (7, 1024), 12)
+    for key in range(ENTRIES):
+        cache.put(('fragment', key), version, value, size)
+    results = {
+        'get hit': measure(lambda n: cache.get(('fragment', n % ENTRIES), version)),
+        'get miss': measure(lambda n: cache.get(('missing', n), version)),
+        'put': measure(lambda n: cache.put(('fragment', n % ENTRIES), version, value, size)),
+        'invalidate': measure(lambda n: cache.invalidate(('fragment', n % ENTRIES)), count=ENTRIES),
+    }
+    cache.clear()
+    return results
+
+def redis_available():
+    try:
+        import redis
+        redis.Redis.from_url(os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')).ping()
+    except Exception:
+        return False
+    return True
+
+def main():
+    backends = ['memory', 'sqlite']
+    if redis_available():
+        backends.append('redis')
+    else:
+        print('redis: skipped (package not installed or no server at CACHE_REDIS_URL)')
+    print(f"{'backend':<8} {'value':>6} {'operation':<10} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8}")
+    for backend in backends:
+        for size in SIZES:
+            for operation, latencies in run(backend, size).items():
+                print(f'{backend:<8} {size // 1024:>5}K {operation:<10} {percentile(latencies, 50):>8.1f} '
+                      f'{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f}')
+
+if __name__ == '__main__':
+    main()
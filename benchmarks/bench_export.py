@@ -0,0 +1,82 @@
+"""Score export of a million attempts: memory and throughput.
+
+Loads every row with .all() before writing (the straightforward approach)
+and compares it with the streaming CSV and Parquet exports. The database is
+populated once; each method then runs in its own process and reports how
+much its peak RSS grew during the export.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_export
+"""
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from app import db, exports
+from benchmarks.common import make_app, populate, PeakRSS
+
+STUDENTS = 20_000
+ATTEMPTS_PER_STUDENT = 50  # 1M scores over 100 quizzes
+
+def load_all(query, path):
+    rows = db.session.execute(query).all()
+    with open(path, 'w', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(exports.COLUMNS)
+        writer.writerows(rows)
+    return len(rows)
+
+def stream_csv(query, path):
+    with open(path, 'w', newline='') as out:
+        for chunk in exports.iter_csv(query):
+            out.write(chunk)
+    return sum(1 for _ in open(path)) - 1
+
+METHODS = {
+    'all': ('load all rows, csv', load_all),
+    'csv': ('streaming csv', stream_csv),
+    'parquet': ('streaming parquet', exports.write_parquet),
+}
+
+def measure(method, db_path):
+    app = make_app(db_path)
+    out = os.path.join(os.path.dirname(db_path), f'export-{method}')
+    with app.app_context():
+        query = exports.score_export_query()
+        db.session.execute(db.text('SELECT 1'))
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            count = METHODS[method][1](query, out)
+            elapsed = time.perf_counter() - start
+    print(json.dumps({'rows': count, 'seconds': elapsed, 'rss_growth': rss.growth_mib,
+                      'size_mib': os.path.getsize(out) / 2 ** 20}))
+
+def main():
+    db_path = os.path.join(tempfile.mkdtemp(prefix='quiz_master_export_'), 'bench.db')
+    app = make_app(db_path)
+    with app.app_context():
+        populate(5, 10, 2, 10, STUDENTS, ATTEMPTS_PER_STUDENT)
+        db.session.commit()
+
+    print(f'{STUDENTS * ATTEMPTS_PER_STUDENT} scores')
+    print(f"{'method':>20} {'rows/s':>9} {'seconds':>8} {'RSS growth MiB':>15} {'file MiB':>9}")
+    for method, (name, _) in METHODS.items():
+        if method == 'parquet' and not exports.parquet_available():
+            print(f'{name:>20} skipped, pyarrow is not installed')
+            continue
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_export', method, db_path],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f"{name:>20} {result['rows'] / result['seconds']:>9.0f} {result['seconds']:>8.2f} "
+              f"{result['rss_growth']:>15.1f} {result['size_mib']:>9.1f}")
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        measure(*sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,65 @@
+"""Grading throughput: the old per-question ORM loop against cached answer keys.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_grading
+"""
+import random
+
+from app import db, grading
+from app.models import Quiz
+from benchmarks.common import make_app, populate, QueryCounter, timed
+
+SUBMISSIONS = 500
+
+def legacy_grade(quiz_id, form):
+    # The submit_quiz loop before the grading module
+    quiz = db.session.get(Quiz, quiz_id)
+    correct_answers = 0
+    for question in quiz.questions:
+        user_answer = form.get(f'answer_{question.id}')
+        if user_answer and int(user_answer) == question.correct_option:
+            correct_answers += 1
+    return correct_answers
+
+def cached_grade(quiz_id, form):
+    quiz = db.session.get(Quiz, quiz_id)
+    key = grading.get_answer_key(quiz)
+    return grading.grade(key, grading.parse_answers(form, key))
+
+def main():
+    print(f"{'questions':>9} {'legacy ms':>10} {'cached ms':>10} {'speedup':>8} "
+          f"{'legacy sql':>10} {'cached sql':>10} {'batch us/sub':>12}")
+    for questions in (10, 50, 200):
+        app = make_app()
+        grading.answer_key_cache.clear()
+        with app.app_context():
+            populate(1, 1, 1, questions, students=0, attempts_per_student=0)
+            key = grading.load_answer_key(1)
+            rng = random.Random(questions)
+            forms = [{f'answer_{question_id}': str(rng.randint(1, 4)) for question_id in key.question_ids}
+                     for _ in range(SUBMISSIONS)]
+
+            def run(grader):
+                results = []
+                for form in forms:
+                    # Each submit is a fresh request with an empty identity map
+                    db.session.expire_all()
+                    results.append(grader(1, form))
+                return results
+
+            legacy_ms, legacy = timed(lambda: run(legacy_grade), repeat=3)
+            cached_ms, cached = timed(lambda: run(cached_grade), repeat=3)
+            assert legacy == cached
+            with QueryCounter(db.engine) as legacy_sql:
+                run(legacy_grade)
+            with QueryCounter(db.engine) as cached_sql:
+                run(cached_grade)
+
+            vectors = [grading.parse_answers(form, key) for form in forms]
+            batch_ms, _ = timed(lambda: grading.grade_many(key, vectors))
+            print(f'{questions:>9} {legacy_ms:>10.1f} {cached_ms:>10.1f} {legacy_ms / cached_ms:>7.1f}x '
+                  f'{legacy_sql.count:>10} {cached_sql.count:>10} {batch_ms * 1000 / SUBMISSIONS:>12.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Item analysis time for quizzes with tens of thousands of stored attempts.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_item_analysis
+"""
+import time
+
+import numpy as np
+
+from app import db, item_analysis, responses
+from app.models import AnswerKeySnapshot, AttemptResponse
+from benchmarks.common import make_app, populate
+
+QUESTIONS = 50
+
+def store_responses(attempts):
+    # Synthetic answer vectors where stronger students pick the key more often
+    rng = np.random.default_rng(0)
+    key = rng.integers(1, 5, QUESTIONS, dtype=np.uint8)
+    ability = rng.random((attempts, 1))
+    chosen = np.where(rng.random((attempts, QUESTIONS)) < ability, key,
+                      rng.integers(0, 5, (attempts, QUESTIONS), dtype=np.uint8)).astype(np.uint8)
+    db.session.add(AnswerKeySnapshot(quiz_id=1, content_version=1,
+                                     question_ids=responses.pack_ids(range(1, QUESTIONS + 1)),
+                                     correct_options=key.tobytes()))
+    db.session.execute(db.insert(AttemptResponse), [
+        {'score_id': n + 1, 'quiz_id': 1, 'content_version': 1, 'answers': row.tobytes()}
+        for n, row in enumerate(chosen)])
+    db.session.commit()
+
+def main():
+    # analyze_quiz is the end-to-end load + compute + persist path
+    print(f"{'attempts':>9} {'load s':>8} {'compute s':>10} {'analyze_quiz s':>15}")
+    for attempts in (1000, 10000, 50000):
+        app = make_app()
+        with app.app_context():
+            populate(1, 1, 1, QUESTIONS, students=0, attempts_per_student=0)
+            store_responses(attempts)
+
+            start = time.perf_counter()
+            matrix = item_analysis.load_answer_matrix(1)
+            loaded = time.perf_counter()
+            item_analysis.compute_item_stats(*matrix[1:])
+            computed = time.perf_counter()
+            item_analysis.analyze_quiz(1)
+            db.session.commit()
+            analyzed = time.perf_counter()
+            print(f'{attempts:>9} {loaded - start:>8.2f} {computed - loaded:>10.2f} '
+                  f'{analyzed - computed:>15.2f}')
+
+if __name__ == '__main__':
+    main()
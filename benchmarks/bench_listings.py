@@ -0,0 +1,79 @@
+"""Latency of the paginated admin listings at the first and the last page.
+
+Also prints SQLite's plan for a deep rankings page and fails if it sorts
+instead of walking ix_user_stats_rank in order.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_listings
+"""
+from app import db, leaderboard
+from app.listings import LISTINGS
+from app.models import UserStats
+from app.pagination import keyset_page, seek_condition
+from benchmarks.common import make_app, populate, QueryCounter, timed
+
+STUDENTS = [1000, 10000, 50000]
+PAGE_SIZE = 50
+
+def last_cursor(listing):
+    # Walk to the final page, returning the cursor that fetches it
+    cursor, previous = None, None
+    while True:
+        page, _ = listing.page({}, cursor=cursor, limit=PAGE_SIZE)
+        if not page.has_more:
+            return previous
+        previous, cursor = cursor, page.next_cursor
+
+RANK_KEYS = [(UserStats.avg_score, True), (UserStats.user_id, False)]
+
+def seek_page(cursor):
+    return keyset_page(UserStats.query, RANK_KEYS, cursor, PAGE_SIZE, ordering='rank').items
+
+def offset_page(offset):
+    return UserStats.query.order_by(UserStats.avg_score.desc(), UserStats.user_id)\
+        .offset(offset).limit(PAGE_SIZE).all()
+
+def rank_page_plan(values):
+    # EXPLAIN QUERY PLAN of the seek page query after the key `values`
+    statement = UserStats.query.filter(seek_condition(RANK_KEYS, values))\
+        .order_by(UserStats.avg_score.desc(), UserStats.user_id).limit(PAGE_SIZE + 1).statement
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [detail for *_, detail in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+def check_rank_plan():
+    middle = UserStats.query.order_by(UserStats.avg_score.desc(), UserStats.user_id)\
+        .offset(UserStats.query.count() // 2).first()
+    plan = rank_page_plan([middle.avg_score, middle.user_id])
+    print('rankings page plan: ' + '; '.join(plan))
+    if not any('ix_user_stats_rank' in step for step in plan) or any('TEMP B-TREE' in step for step in plan):
+        raise SystemExit('rankings pages do not walk ix_user_stats_rank in order')
+
+def main():
+    # Keyset pages should cost the same at any depth; OFFSET pages slow down
+    # with the number of rows skipped. "page" columns time the full rankings
+    # listing (students and subject averages), "seek"/"offset" the bare
+    # UserStats page query.
+    print(f"{'students':>8} {'queries':>7} {'page first':>10} {'page last':>9} "
+          f"{'seek last':>9} {'offset last':>11}  (ms)")
+    for students in STUDENTS:
+        app = make_app()
+        with app.app_context():
+            populate(2, 3, quizzes_per_chapter=1, questions_per_quiz=5,
+                     students=students, attempts_per_student=3)
+            leaderboard.rebuild()
+            if students == STUDENTS[0]:
+                check_rank_plan()
+            rankings = LISTINGS['rankings']
+            cursor = last_cursor(rankings)
+            with QueryCounter(db.engine) as counter:
+                rankings.page({}, cursor=cursor, limit=PAGE_SIZE)
+            first_ms, _ = timed(lambda: rankings.page({}, limit=PAGE_SIZE))
+            last_ms, _ = timed(lambda: rankings.page({}, cursor=cursor, limit=PAGE_SIZE))
+            seek_ms, _ = timed(lambda: seek_page(cursor))
+            offset_ms, _ = timed(lambda: offset_page(students - PAGE_SIZE))
+            print(f'{students:>8} {counter.count:>7} {first_ms:>10.1f} {last_ms:>9.1f} '
+                  f'{seek_ms:>9.2f} {offset_ms:>11.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Fan-out of the live exam monitor to many watching streams.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_live_monitor
+"""
+import threading
+import time
+
+from app.live import ExamMonitor
+
+WATCHERS = [1, 50, 200]
+SUBMISSIONS = 2000
+DURATION = 2.0  # seconds the submissions are spread over
+
+def run(watchers):
+    monitor = ExamMonitor()
+    monitor.interval = 0.25
+    received = [0] * watchers
+    streams = [monitor.stream(1) for _ in range(watchers)]
+    for stream in streams:
+        next(stream)  # initial snapshot
+
+    def watch(n, stream):
+        for event in stream:
+            if '"submitted":%d,' % SUBMISSIONS in event:
+                return
+            received[n] += 1
+
+    threads = [threading.Thread(target=watch, args=(n, stream), daemon=True)
+               for n, stream in enumerate(streams)]
+    for thread in threads:
+        thread.start()
+    for n in range(SUBMISSIONS):
+        monitor.record_submission(1, n, n % 101)
+        time.sleep(DURATION / SUBMISSIONS)
+    recorded = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return monitor.published, sum(received) / watchers, (time.perf_counter() - recorded) * 1000
+
+def main():
+    # Snapshots are serialized once per interval, not once per submission or
+    # per watcher; each watcher sees about DURATION / interval updates
+    print(f"{'watchers':>8} {'submissions':>11} {'snapshots':>9} {'events/watcher':>14} {'lag ms':>7}")
+    for watchers in WATCHERS:
+        snapshots, events, lag_ms = run(watchers)
+        print(f'{watchers:>8} {SUBMISSIONS:>11} {snapshots:>9} {events:>14.1f} {lag_ms:>7.0f}')
+
+if __name__ == '__main__':
+    main()
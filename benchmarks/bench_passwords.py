@@ -0,0 +1,53 @@
+"""Login throughput for each password hashing configuration.
+
+For every hash method this measures password checks per second done inline
+on the request thread and through the credential service's process pool,
+with many concurrent logins as in the minutes before an exam.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_passwords
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from app.passwords import credential_service
+
+METHODS = ('pbkdf2:sha256:600000', 'pbkdf2:sha256:260000', 'scrypt:32768:8:1', 'scrypt:16384:8:1')
+LOGINS = 64
+CONCURRENCY = 32
+
+def logins_per_second(app, pwhash):
+    def login(_):
+        with app.app_context():
+            return credential_service.verify_password(pwhash, 'correct horse')
+
+    with ThreadPoolExecutor(CONCURRENCY) as threads:
+        list(threads.map(login, range(2)))  # start the pool's processes
+        start = time.perf_counter()
+        assert all(threads.map(login, range(LOGINS)))
+    return LOGINS / (time.perf_counter() - start)
+
+def main():
+    cores = os.cpu_count() or 1
+    print(f'{cores} cores, {LOGINS} logins from {CONCURRENCY} concurrent requests')
+    print(f"{'method':>22} {'ms/login':>8} {'inline/s':>9} {'pool/s':>8} {'pool/s/core':>11}")
+    for method in METHODS:
+        pwhash = generate_password_hash('correct horse', method)
+        rates = []
+        for workers in (0, cores):
+            app = Flask(__name__)
+            app.config.update(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers,
+                              PASSWORD_HASH_MAX_PENDING=CONCURRENCY, PASSWORD_HASH_TIMEOUT=60)
+            credential_service.init_app(app)
+            rates.append(logins_per_second(app, pwhash))
+            credential_service.shutdown()
+        inline, pooled = rates
+        print(f'{method:>22} {1000 / inline:>8.1f} {inline:>9.1f} {pooled:>8.1f} {pooled / cores:>11.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Bulk question import: 100k questions from CSV and JSON Lines.
+
+Compares the streaming importer against adding one Question object per row
+(what create_quiz does). Each method runs in its own process and reports how
+much its RSS grew during the import.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_question_import
+"""
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import subprocess
+import sys
+
+from app import db, question_import
+from app.models import Question
+from benchmarks.common import make_app, populate, PeakRSS
+
+QUESTIONS = 100_000
+QUIZZES = 20
+
+def write_files(directory):
+    rng = random.Random(0)
+    rows = [{'quiz_id': n % QUIZZES + 1, 'question_statement': f'Question {n} ' + 'lorem ipsum ' * 8,
+             'option1': f'Alpha {n}', 'option2': f'Beta {n}', 'option3': f'Gamma {n}', 'option4': f'Delta {n}',
+             'correct_option': rng.randint(1, 4)} for n in range(QUESTIONS)]
+    csv_path = os.path.join(directory, 'questions.csv')
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    jsonl_path = os.path.join(directory, 'questions.jsonl')
+    with open(jsonl_path, 'w') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+    return csv_path, jsonl_path
+
+def orm_import(path):
+    # One Question object per row, as create_quiz does, in one transaction
+    with open(path, newline='') as f:
+        for record in csv.DictReader(f):
+            db.session.add(Question(
+                quiz_id=int(record['quiz_id']),
+                question_statement=record['question_statement'],
+                option1=record['option1'], option2=record['option2'],
+                option3=record['option3'], option4=record['option4'],
+                correct_option=int(record['correct_option'])))
+    db.session.commit()
+    return QUESTIONS
+
+def streaming_import(path, fmt):
+    with open(path, 'rb') as f:
+        report = question_import.import_questions(f, fmt)
+    assert report.error_count == 0, report.errors[:5]
+    return report.imported
+
+METHODS = {
+    'orm': ('ORM add per row (csv)', lambda csv_path, jsonl_path: orm_import(csv_path)),
+    'csv': ('streaming csv', lambda csv_path, jsonl_path: streaming_import(csv_path, 'csv')),
+    'jsonl': ('streaming jsonl', lambda csv_path, jsonl_path: streaming_import(jsonl_path, 'jsonl')),
+}
+
+def measure(method, csv_path, jsonl_path):
+    app = make_app()
+    with app.app_context():
+        populate(1, 1, QUIZZES, 0, students=0, attempts_per_student=0)
+        db.session.commit()
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            count = METHODS[method][1](csv_path, jsonl_path)
+            elapsed = time.perf_counter() - start
+        assert db.session.query(Question).count() == count
+    print(json.dumps({'rate': count / elapsed, 'seconds': elapsed, 'rss_growth': rss.growth_mib}))
+
+def main():
+    csv_path, jsonl_path = write_files(tempfile.mkdtemp(prefix='quiz_master_import_'))
+    print(f'{QUESTIONS} questions into {QUIZZES} quizzes')
+    print(f"{'method':>22} {'rows/s':>9} {'seconds':>8} {'RSS growth MiB':>15}")
+    for method, (name, _) in METHODS.items():
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_question_import',
+                                 method, csv_path, jsonl_path],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f"{name:>22} {result['rate']:>9.0f} {result['seconds']:>8.2f} {result['rss_growth']:>15.1f}")
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4:
+        measure(*sys.argv[1:])
+    else:
+        main()
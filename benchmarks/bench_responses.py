@@ -0,0 +1,91 @@
+"""Storage size and throughput of packed attempt responses against one row per answer.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_responses
+"""
+import os
+import random
+import time
+
+import sqlalchemy as sa
+
+from app import db, responses
+from app.models import Score, AnswerKeySnapshot, AttemptResponse
+from benchmarks.common import make_app, populate
+
+STUDENTS = 5000
+QUESTIONS = 50
+
+response_rows = sa.Table(
+    'response_row', sa.MetaData(),
+    sa.Column('score_id', sa.Integer, primary_key=True),
+    sa.Column('question_id', sa.Integer, primary_key=True),
+    sa.Column('chosen_option', sa.Integer, nullable=False),
+)
+
+def database_size():
+    db.session.execute(db.text('VACUUM'))
+    return os.path.getsize(db.engine.url.database)
+
+def prepare():
+    populate(1, 1, 1, QUESTIONS, students=STUDENTS, attempts_per_student=1)
+    score_ids = [score_id for score_id, in db.session.query(Score.id).order_by(Score.id)]
+    rng = random.Random(0)
+    answers = [bytes(rng.randint(0, 4) for _ in range(QUESTIONS)) for _ in score_ids]
+    return score_ids, answers, database_size()
+
+def store_packed(score_ids, answers):
+    question_ids = list(range(1, QUESTIONS + 1))
+    db.session.add(AnswerKeySnapshot(quiz_id=1, content_version=1,
+                                     question_ids=responses.pack_ids(question_ids),
+                                     correct_options=bytes(QUESTIONS)))
+    db.session.execute(db.insert(AttemptResponse), [
+        {'score_id': score_id, 'quiz_id': 1, 'content_version': 1, 'answers': vector}
+        for score_id, vector in zip(score_ids, answers)])
+    db.session.commit()
+
+def read_packed():
+    snapshots = responses.get_key_snapshots(1)
+    total = 0
+    for _, version, vector in responses.iter_quiz_responses(1):
+        question_ids, _ = snapshots[version]
+        total += len(vector)
+    return total
+
+def store_rows(score_ids, answers):
+    response_rows.create(db.engine)
+    db.session.execute(response_rows.insert(), [
+        {'score_id': score_id, 'question_id': n + 1, 'chosen_option': chosen}
+        for score_id, vector in zip(score_ids, answers) for n, chosen in enumerate(vector)])
+    db.session.commit()
+
+def read_rows():
+    total = 0
+    for _ in db.session.execute(sa.select(response_rows).execution_options(yield_per=1000)):
+        total += 1
+    return total
+
+def measure(label, store, read):
+    app = make_app()
+    with app.app_context():
+        score_ids, answers, base_size = prepare()
+        start = time.perf_counter()
+        store(score_ids, answers)
+        write_s = time.perf_counter() - start
+        size = database_size() - base_size
+        start = time.perf_counter()
+        answered = read()
+        read_s = time.perf_counter() - start
+        assert answered == STUDENTS * QUESTIONS
+        print(f'{label:<15} {size / 1024:>10.0f} {size / STUDENTS:>13.1f} '
+              f'{STUDENTS / write_s:>14.0f} {answered / read_s:>15.0f}')
+
+def main():
+    print(f'{STUDENTS} attempts x {QUESTIONS} questions')
+    print(f"{'layout':<15} {'size KiB':>10} {'bytes/attempt':>13} {'attempts/s in':>14} {'answers/s out':>15}")
+    measure('packed', store_packed, read_packed)
+    measure('row per answer', store_rows, read_rows)
+
+if __name__ == '__main__':
+    main()
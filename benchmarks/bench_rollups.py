@@ -0,0 +1,43 @@
+"""Activity chart queries on raw attempts versus the hourly rollups.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rollups
+"""
+from datetime import datetime, timedelta
+
+from app import db, rollups
+from app.models import Score, AttemptRollup
+from benchmarks.common import make_app, populate, timed
+
+STUDENTS = [1000, 10000, 50000]
+
+def raw_charts():
+    # The queries the dashboard used to run against the score table
+    db.session.query(db.func.extract('hour', Score.time_stamp_of_attempt).label('hour'),
+                     db.func.count()).group_by('hour').all()
+    db.session.query(db.func.date(Score.time_stamp_of_attempt).label('date'), db.func.count())\
+        .filter(Score.time_stamp_of_attempt >= datetime.now() - timedelta(days=7))\
+        .group_by('date').all()
+
+def rollup_charts():
+    rollups.attempts_by_hour_of_day()
+    rollups.series('day', start=datetime.now() - timedelta(days=7))
+
+def main():
+    # Raw chart queries grow with the number of attempts; rollup queries
+    # with the number of (quiz, hour) rows, bounded by quizzes x hours
+    print(f"{'attempts':>9} {'rollups':>8} {'rebuild ms':>10} {'raw ms':>8} {'rollup ms':>9}")
+    for students in STUDENTS:
+        app = make_app()
+        with app.app_context():
+            attempts = populate(5, 5, quizzes_per_chapter=2, questions_per_quiz=5,
+                                students=students, attempts_per_student=5)
+            rebuild_ms, _ = timed(rollups.rebuild, repeat=1)
+            raw_ms, _ = timed(raw_charts)
+            rollup_ms, _ = timed(rollup_charts)
+            print(f'{attempts:>9} {AttemptRollup.query.count():>8} {rebuild_ms:>10.1f} '
+                  f'{raw_ms:>8.1f} {rollup_ms:>9.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Time from process start to first response, cold and preforked.
+
+cold     a new process imports the app, calls create_app and serves its
+         first requests, like a worker that loads the app itself
+preload  a parent imports the app, calls create_app and app.preload.warm,
+         then forks; the child serves the first requests, like a gunicorn
+         worker with preload_app (gunicorn.conf.py)
+
+Every run uses fresh processes against one small generated database. The
+first requests are the login page and a student starting an open quiz
+(compiled templates, answer key and question payload); times are medians.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODES = ('cold', 'preload')
+
+def prepare_database():
+    # Returns (database path, id of an open quiz)
+    from benchmarks.common import make_app, populate
+    from benchmarks.generate import add_open_quizzes, password_hash
+    app = make_app()
+    with app.app_context():
+        populate(2, 2, 1, 10, 20, 2, password_hash=password_hash())
+        quiz_id = add_open_quizzes(count=1)[0]
+    return app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):], quiz_id
+
+def first_requests(app, quiz_id, since):
+    # Serve the first requests; returns ms from `since` (a time.time()) to
+    # the first response and ms each request took
+    from benchmarks.generate import PASSWORD
+    client = app.test_client()
+    started = time.perf_counter()
+    assert client.get('/login').status_code == 200
+    first_response_ms = (time.time() - since) * 1000
+    login_page_ms = (time.perf_counter() - started) * 1000
+    client.post('/login', data={'email': 'student1@example.com', 'password': PASSWORD})
+    started = time.perf_counter()
+    assert client.get(f'/quiz/{quiz_id}/start').status_code == 200
+    return {'first_response_ms': first_response_ms, 'login_page_ms': login_page_ms,
+            'start_quiz_ms': (time.perf_counter() - started) * 1000}
+
+def child(mode, db_path, quiz_id, spawned_at):
+    # Runs in the measured process, which has imported nothing from the app
+    # yet; prints its timings as JSON
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    # Same method as the generated hashes, so the login doesn't rehash, and
+    # no hashing pool whose processes would outlive the measured ones
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+                      'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1', 'PASSWORD_HASH_WORKERS': 0})
+    created = time.perf_counter()
+    result = {'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000}
+    if mode == 'cold':
+        result.update(first_requests(app, quiz_id, spawned_at))
+    else:
+        from app.preload import warm
+        warm(app)
+        result['warm_ms'] = (time.perf_counter() - created) * 1000
+        read_end, write_end = os.pipe()
+        forked_at = time.time()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_end)
+                with os.fdopen(write_end, 'w') as out:
+                    json.dump(first_requests(app, quiz_id, forked_at), out)
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as source:
+            result.update(json.load(source))
+        os.waitpid(pid, 0)
+    print(json.dumps(result))
+
+def run(mode, db_path, quiz_id):
+    spawned_at = time.time()
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_startup', '--child', mode,
+         '--db', db_path, '--quiz-id', str(quiz_id), '--spawned-at', repr(spawned_at)],
+        capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--quiz-id', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--spawned-at', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.db, args.quiz_id, args.spawned_at)
+        return
+
+    db_path, quiz_id = prepare_database()
+    # first_response is measured from process start (cold) or from the fork
+    # (preload); import, create_app and warm happen before the fork there
+    columns = ('import_ms', 'create_app_ms', 'warm_ms', 'first_response_ms', 'login_page_ms', 'start_quiz_ms')
+    print(f"{'mode':<8} " + ' '.join(f'{column[:-3]:>14}' for column in columns) + '  (ms)')
+    for mode in MODES:
+        runs = [run(mode, db_path, quiz_id) for _ in range(args.runs)]
+        medians = [statistics.median(r[column] for r in runs) if column in runs[0] else None for column in columns]
+        print(f'{mode:<8} ' + ' '.join(f'{"-" if m is None else f"{m:.1f}":>14}' for m in medians))
+
+if __name__ == '__main__':
+    main()
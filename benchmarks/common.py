@@ -0,0 +1,147 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import event
+
+from app import db
+from app.models import User, Subject, Chapter, Quiz, Question, Score
+
+# Shared helpers for the benchmark scripts. Each benchmark runs against a
+# throwaway SQLite file so the instance database is never touched.
+
+def make_app(db_path=None):
+    # A fresh throwaway database unless db_path points at an existing one
+    app = Flask(__name__)
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix='quiz_master_bench_'), 'bench.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+INSERT_CHUNK = 10000
+
+def insert_chunked(model, rows):
+    # Executemany INSERTs of at most INSERT_CHUNK rows from any iterable
+    count, chunk = 0, []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == INSERT_CHUNK:
+            db.session.execute(db.insert(model), chunk)
+            count, chunk = count + len(chunk), []
+    if chunk:
+        db.session.execute(db.insert(model), chunk)
+        count += len(chunk)
+    return count
+
+def populate(subjects, chapters_per_subject, quizzes_per_chapter, questions_per_quiz,
+             students, attempts_per_student, seed=0, password_hash=None):
+    # Bulk-insert a synthetic institution; must run inside an app context.
+    # Returns the number of attempts; every student gets password_hash
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    db.session.execute(db.insert(Subject), [
+        {'id': s + 1, 'name': f'Subject {s + 1}'} for s in range(subjects)])
+    chapter_rows = [{'id': c + 1, 'subject_id': c // chapters_per_subject + 1, 'name': f'Chapter {c + 1}'}
+                    for c in range(subjects * chapters_per_subject)]
+    db.session.execute(db.insert(Chapter), chapter_rows)
+    quiz_rows = [{'id': q + 1, 'chapter_id': q // quizzes_per_chapter + 1,
+                  'date_of_quiz': now + timedelta(days=1), 'time_duration': 30}
+                 for q in range(len(chapter_rows) * quizzes_per_chapter)]
+    db.session.execute(db.insert(Quiz), quiz_rows)
+    if questions_per_quiz:
+        insert_chunked(Question, (
+            {'quiz_id': quiz['id'], 'question_statement': f'Question {n + 1}',
+             'option1': 'A', 'option2': 'B', 'option3': 'C', 'option4': 'D',
+             'correct_option': rng.randint(1, 4)}
+            for quiz in quiz_rows for n in range(questions_per_quiz)))
+    insert_chunked(User, (
+        {'id': u + 1, 'email': f'student{u + 1}@example.com', 'full_name': f'Student {u + 1}',
+         'password_hash': password_hash, 'dob': datetime(2000, 1, 1)} for u in range(students)))
+
+    def score_rows():
+        for user_id in range(1, students + 1):
+            for quiz_id in rng.sample(range(1, len(quiz_rows) + 1), min(attempts_per_student, len(quiz_rows))):
+                yield {
+                    'quiz_id': quiz_id, 'user_id': user_id,
+                    'total_scored': rng.randint(0, questions_per_quiz),
+                    'total_questions': questions_per_quiz,
+                    'time_stamp_of_attempt': now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+                    'time_taken': rng.randint(1, 30)}
+    attempts = insert_chunked(Score, score_rows())
+    db.session.commit()
+    return attempts
+
+class QueryCounter:
+    # Counts statements executed on an engine while active
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _after_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'after_cursor_execute', self._after_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'after_cursor_execute', self._after_execute)
+
+class PeakRSS:
+    # Highest resident set size seen while active, sampled from /proc (Linux).
+    # ru_maxrss can't be used in a child process: it starts out at the peak
+    # of the parent that forked it.
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_mib = self.peak_mib = self._current()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _current():
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mib = max(self.peak_mib, self._current())
+
+    @property
+    def growth_mib(self):
+        return self.peak_mib - self.start_mib
+
+    def __enter__(self):
+        self.start_mib = self.peak_mib = self._current()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mib = max(self.peak_mib, self._current())
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))]
+
+def timed(fn, repeat=5):
+    # Best-of-N wall time in milliseconds and the last result
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,86 @@
+"""Synthetic institution for benchmarks and load tests.
+
+Fills a SQLite database with subjects, chapters, quizzes, questions,
+students and their past attempts using bulk inserts, rebuilds the
+leaderboard and attempt rollups, and adds a few open quizzes nobody has
+attempted yet for the load harness to start and submit. The same scale
+and seed always produce the same data.
+
+Run from the repository root:
+
+    python -m benchmarks.generate --scale 10k --db /tmp/quiz_master_10k.db
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import db, leaderboard, rollups
+from app.models import Quiz, Question
+from benchmarks.common import make_app, populate, insert_chunked
+
+SCALES = {
+    # subjects, chapters per subject, quizzes per chapter, questions per quiz,
+    # students, attempts per student
+    '1k': (5, 5, 2, 10, 1000, 5),
+    '10k': (10, 10, 2, 10, 10000, 5),
+    '100k': (20, 10, 3, 10, 100000, 5),
+}
+
+OPEN_QUIZZES = 5
+OPEN_QUIZ_QUESTIONS = 20
+PASSWORD = 'password'
+
+def password_hash():
+    # One cheap hash shared by every student keeps generation and logins fast;
+    # run the app with PASSWORD_HASH_METHOD set to the same method so logins
+    # don't upgrade it
+    return generate_password_hash(PASSWORD, method='pbkdf2:sha256:1')
+
+def add_open_quizzes(count=OPEN_QUIZZES, questions=OPEN_QUIZ_QUESTIONS):
+    # Quizzes starting tomorrow with no attempts; returns their ids
+    first_id = (db.session.query(db.func.max(Quiz.id)).scalar() or 0) + 1
+    quiz_ids = list(range(first_id, first_id + count))
+    db.session.execute(db.insert(Quiz), [
+        {'id': quiz_id, 'chapter_id': 1, 'date_of_quiz': datetime.now() + timedelta(days=1),
+         'time_duration': 60, 'remarks': 'load test'} for quiz_id in quiz_ids])
+    insert_chunked(Question, (
+        {'quiz_id': quiz_id, 'question_statement': f'Open question {n + 1}',
+         'option1': 'A', 'option2': 'B', 'option3': 'C', 'option4': 'D', 'correct_option': n % 4 + 1}
+        for quiz_id in quiz_ids for n in range(questions)))
+    db.session.commit()
+    return quiz_ids
+
+def generate(scale, db_path=None, seed=0):
+    # Returns (app, summary dict); the app is bound to the generated database
+    app = make_app(db_path)
+    started = time.perf_counter()
+    with app.app_context():
+        attempts = populate(*SCALES[scale], seed=seed, password_hash=password_hash())
+        leaderboard.rebuild()
+        rollups.rebuild()
+        open_quizzes = add_open_quizzes()
+    subjects, chapters, quizzes, questions, students, _ = SCALES[scale]
+    return app, {
+        'scale': scale,
+        'database': app.config['SQLALCHEMY_DATABASE_URI'],
+        'students': students,
+        'quizzes': subjects * chapters * quizzes,
+        'attempts': attempts,
+        'open_quizzes': open_quizzes,
+        'seconds': round(time.perf_counter() - started, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=SCALES, default='1k')
+    parser.add_argument('--db', help='SQLite file to create (default: a temporary directory)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    _, summary = generate(args.scale, args.db, args.seed)
+    for key, value in summary.items():
+        print(f'{key}: {value}')
+
+if __name__ == '__main__':
+    main()
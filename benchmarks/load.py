@@ -0,0 +1,224 @@
+"""Load test of the student and admin flows through the real create_app.
+
+Concurrent clients each play students who log in, open their dashboard,
+start one of the open quizzes, autosave half of their answers, submit and
+open the dashboard again, while one client keeps reloading the admin
+dashboard. Requests go through Flask test clients in this process (no
+network). The report is JSON with
+p50/p95/p99 latency, throughput and SQL statements per request for every
+endpoint, tagged with the current commit so runs can be compared.
+
+Run from the repository root:
+
+    python -m benchmarks.load --scale 1k --clients 16 --duration 30 --output run.json
+    python -m benchmarks.load --db /tmp/quiz_master_10k.db --baseline run.json
+
+--db reuses a database made by benchmarks.generate; without it one is
+generated first. Like load_concurrent_submit, run one load test per process.
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from benchmarks.common import percentile
+from benchmarks.generate import SCALES, PASSWORD, generate
+
+ATTEMPT_TOKEN = re.compile(r'name="attempt_token" value="([^"]+)"')
+ENDPOINTS = ('login', 'user_dashboard', 'start_quiz', 'autosave_quiz', 'submit_quiz', 'admin_dashboard')
+
+class Recorder:
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def request(self, endpoint, call, expected_status):
+        start = time.perf_counter()
+        try:
+            status = call().status_code
+        except Exception:
+            status = None
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            if status != expected_status:
+                self.errors[endpoint] += 1
+        return status == expected_status
+
+def commit_id():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def prepare_database(args):
+    # Returns (database URI, scale generated or None, open quiz ids, ids of
+    # students with no attempt on them)
+    scale = None
+    if args.db and os.path.exists(args.db):
+        uri = f'sqlite:///{os.path.abspath(args.db)}'
+    else:
+        _, summary = generate(args.scale, args.db)
+        uri, scale = summary['database'], args.scale
+    from sqlalchemy import create_engine, text
+    engine = create_engine(uri)
+    with engine.begin() as conn:
+        # Reopen the load test quizzes of an older database
+        conn.execute(text("UPDATE quiz SET date_of_quiz = :when WHERE remarks = 'load test'"),
+                     {'when': datetime.now() + timedelta(days=1)})
+        quiz_ids = [row[0] for row in conn.execute(text("SELECT id FROM quiz WHERE remarks = 'load test'"))]
+        student_ids = [row[0] for row in conn.execute(text(
+            'SELECT id FROM "user" WHERE id NOT IN (SELECT user_id FROM score WHERE quiz_id IN '
+            "(SELECT id FROM quiz WHERE remarks = 'load test')) ORDER BY id"))]
+    engine.dispose()
+    return uri, scale, quiz_ids, student_ids
+
+def run(args):
+    uri, scale, quiz_ids, student_ids = prepare_database(args)
+
+    from app import create_app, db
+    from app.commands import init_database
+    from app.instrumentation import request_metrics
+    from app.models import Question
+    from benchmarks.generate import password_hash
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': uri,
+        # Same method as the generated hashes, so logins don't rehash
+        'PASSWORD_HASH_METHOD': password_hash().split('$', 1)[0],
+        'SUBMISSION_QUEUE_ENABLED': args.submission_queue,
+    })
+    with app.app_context():
+        init_database()  # the admin the admin client logs in as
+        questions = defaultdict(list)
+        for quiz_id, question_id in db.session.query(Question.quiz_id, Question.id)\
+                .filter(Question.quiz_id.in_(quiz_ids)):
+            questions[quiz_id].append(question_id)
+
+    # Every (student, quiz) pair is attempted at most once
+    pairs = iter((student_id, quiz_id) for quiz_id in quiz_ids for student_id in student_ids)
+    pairs_lock = threading.Lock()
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+    sessions = itertools.count()
+
+    def student_loop():
+        while time.perf_counter() < deadline:
+            with pairs_lock:
+                pair = next(pairs, None)
+            if pair is None:
+                return
+            student_id, quiz_id = pair
+            client = app.test_client()
+            if not recorder.request('login', lambda: client.post('/login', data={
+                    'email': f'student{student_id}@example.com', 'password': PASSWORD}), 302):
+                continue
+            recorder.request('user_dashboard', lambda: client.get('/user/dashboard'), 200)
+            pages = []
+            if not recorder.request('start_quiz', lambda: pages.append(client.get(f'/quiz/{quiz_id}/start')) or pages[0],
+                                    200):
+                continue
+            # The page's attempt token goes with the autosave and the form, as in the browser
+            token = ATTEMPT_TOKEN.search(pages[0].get_data(as_text=True)).group(1)
+            answers = {f'answer_{question_id}': str(question_id % 4 + 1) for question_id in questions[quiz_id]}
+            first_half = dict(list(answers.items())[:len(answers) // 2])
+            recorder.request('autosave_quiz', lambda: client.post(
+                f'/quiz/{quiz_id}/autosave', json={'answers': first_half}, headers={'X-Attempt-Token': token}), 204)
+            recorder.request('submit_quiz', lambda: client.post(
+                f'/quiz/{quiz_id}/submit', data={**answers, 'attempt_token': token}), 302)
+            recorder.request('user_dashboard', lambda: client.get('/user/dashboard'), 200)
+            next(sessions)
+
+    def admin_loop():
+        client = app.test_client()
+        client.post('/admin_login', data={'username': 'admin', 'password': 'admin123'})
+        while time.perf_counter() < deadline:
+            recorder.request('admin_dashboard', lambda: client.get('/admin/dashboard'), 200)
+            time.sleep(args.admin_pause)
+
+    request_metrics.reset()
+    threads = [threading.Thread(target=student_loop) for _ in range(args.clients)]
+    threads.append(threading.Thread(target=admin_loop))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    server_stats = request_metrics.snapshot()
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        latencies = sorted(recorder.latencies[endpoint])
+        stats = server_stats.get(endpoint, {})
+        endpoints[endpoint] = {
+            'requests': len(latencies),
+            'errors': recorder.errors[endpoint],
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'sql_per_request': round(stats.get('avg_sql', 0), 1),
+        }
+    all_latencies = sorted(itertools.chain.from_iterable(recorder.latencies.values()))
+    return {
+        'commit': commit_id(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'database': uri,
+        'scale': scale,
+        'clients': args.clients,
+        'duration_s': round(elapsed, 1),
+        'submission_queue': args.submission_queue,
+        'student_sessions': next(sessions),
+        'requests': len(all_latencies),
+        'throughput_rps': round(len(all_latencies) / elapsed, 1),
+        'p50_ms': round(percentile(all_latencies, 50), 1),
+        'p95_ms': round(percentile(all_latencies, 95), 1),
+        'p99_ms': round(percentile(all_latencies, 99), 1),
+        'endpoints': endpoints,
+    }
+
+def compare(report, baseline):
+    # Per-endpoint p95 and throughput against an earlier report
+    print(f"{'endpoint':<16} {'p95 ms':>8} {'base':>8} {'change':>7} {'rps':>7} {'base':>7} {'sql':>5} {'base':>5}")
+    for endpoint, stats in report['endpoints'].items():
+        base = baseline['endpoints'].get(endpoint)
+        if not base:
+            continue
+        change = (stats['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0
+        print(f"{endpoint:<16} {stats['p95_ms']:>8.1f} {base['p95_ms']:>8.1f} {change:>+6.0f}% "
+              f"{stats['throughput_rps']:>7.1f} {base['throughput_rps']:>7.1f} "
+              f"{stats['sql_per_request']:>5.1f} {base['sql_per_request']:>5.1f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=SCALES, default='1k', help='Data to generate when --db is not given.')
+    parser.add_argument('--db', help='Database from benchmarks.generate to reuse (or to create).')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent student clients.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--admin-pause', type=float, default=0.5, help='Seconds between admin dashboard loads.')
+    parser.add_argument('--submission-queue', action='store_true', help='Submit through the write-behind queue.')
+    parser.add_argument('--output', help='Write the JSON report to this file.')
+    parser.add_argument('--baseline', help='Compare with an earlier JSON report.')
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as out:
+            out.write(text + '\n')
+    if args.baseline:
+        with open(args.baseline) as source:
+            compare(report, json.load(source))
+
+if __name__ == '__main__':
+    main()
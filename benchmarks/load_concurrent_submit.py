@@ -0,0 +1,119 @@
+"""Concurrent submit_quiz load test against a throwaway SQLite database.
+
+Every simulated student logs in and starts the quiz, then all of them submit
+at the same moment. Each database mode runs in its own process because the
+routes register on the first app created in a process.
+
+Run from the repository root:
+
+    python -m benchmarks.load_concurrent_submit [--students 200] [--threads 32]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+MODES = {
+    # The settings create_app used before the tuning layer
+    'rollback-journal': {'SQLITE_PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+                         'SQLITE_READ_POOL': False},
+    # Defaults from app/database.py
+    'wal': {},
+}
+
+def run_mode(mode, students, threads):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='quiz_master_load_'), 'load.db')
+    config = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}', 'PROPAGATE_EXCEPTIONS': True}
+    config.update(MODES[mode])
+
+    from app import create_app, db
+    from app.models import User, Subject, Chapter, Quiz, Question
+    app = create_app(config)
+
+    with app.app_context():
+        db.create_all()
+        # Cheap hashes keep the setup and logins out of the measurement
+        password_hash = generate_password_hash('password', method='pbkdf2:sha256:1')
+        db.session.add(Subject(id=1, name='Load'))
+        db.session.add(Chapter(id=1, subject_id=1, name='Load'))
+        db.session.add(Quiz(id=1, chapter_id=1, date_of_quiz=datetime.now() + timedelta(minutes=1),
+                            time_duration=60))
+        db.session.execute(db.insert(Question), [
+            {'quiz_id': 1, 'question_statement': f'Q{n}', 'option1': 'A', 'option2': 'B',
+             'option3': 'C', 'option4': 'D', 'correct_option': n % 4 + 1} for n in range(20)])
+        db.session.execute(db.insert(User), [
+            {'email': f'load{n}@example.com', 'password_hash': password_hash,
+             'full_name': f'Load {n}', 'dob': datetime(2000, 1, 1)} for n in range(students)])
+        db.session.commit()
+        question_ids = [question_id for question_id, in db.session.query(Question.id)]
+
+    clients = []
+    for n in range(students):
+        client = app.test_client()
+        client.post('/login', data={'email': f'load{n}@example.com', 'password': 'password'})
+        assert client.get('/quiz/1/start').status_code == 200
+        clients.append(client)
+
+    answers = {f'answer_{question_id}': '1' for question_id in question_ids}
+    barrier = threading.Barrier(min(threads, students))
+    latencies, errors, lock_errors = [], [], []
+
+    def submit(client):
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        start = time.perf_counter()
+        try:
+            response = client.post('/quiz/1/submit', data=answers)
+            if response.status_code != 302:
+                errors.append(response.status_code)
+        except Exception as e:
+            (lock_errors if 'database is locked' in str(e) else errors).append(repr(e))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(submit, clients))
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        from app.models import Score
+        stored = Score.query.count()
+    latencies.sort()
+    return {
+        'mode': mode,
+        'students': students,
+        'threads': threads,
+        'stored_scores': stored,
+        'lock_errors': len(lock_errors),
+        'other_errors': len(errors),
+        'submits_per_second': round(students / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--mode', choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.students, args.threads)))
+        return
+    for mode in MODES:
+        subprocess.run([sys.executable, '-m', 'benchmarks.load_concurrent_submit', '--mode', mode,
+                        '--students', str(args.students), '--threads', str(args.threads)], check=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py run:app
+#
+# The app is imported once in the master and warmed there (app/preload.py)
+# before the workers are forked, so a new worker serves its first request
+# without importing, compiling templates or loading quizzes itself. Schema
+# changes and the default admin are not part of startup: run
+# `flask --app run init-db` / `flask --app run db upgrade` on deploy.
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Live exam streams hold a thread each
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = True
+
+def when_ready(server):
+    # Runs in the master after the app is loaded, before any worker is forked
+    from app.preload import warm
+    warm(server.app.wsgi())
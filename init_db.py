@@ -1,19 +1,10 @@
-from app import create_app, db
-from app.models import Admin
+from app import create_app
+from app.commands import init_database
 
+# Same as `flask --app run init-db`
 app = create_app()
 
 with app.app_context():
-    # Create all tables
-    db.create_all()
-    
-    # Create default admin if it doesn't exist
-    admin = Admin.query.filter_by(username='admin').first()
-    if not admin:
-        admin = Admin(username='admin')
-        admin.set_password('admin123')  # Default password
-        db.session.add(admin)
-        db.session.commit()
-        print("Default admin account created.")
-    else:
-        print("Admin account already exists.")
+    created_schema, created_admin = init_database()
+    print("Database schema created." if created_schema else "Database schema already exists.")
+    print("Default admin account created." if created_admin else "Admin account already exists.")
@@ -1,10 +1,10 @@
 import logging
 from logging.config import fileConfig
 
-from flask import current_app
+from flask import current_app, has_app_context
 
 from alembic import context
-from app import create_app
+from app import create_app, init_migrate
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -37,7 +37,9 @@ def get_engine_url():
 # for 'autogenerate' support
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
-app = create_app()
+# The app running the command (flask db, init-db), or a new one
+app = current_app._get_current_object() if has_app_context() else create_app()
+init_migrate(app)
 
 with app.app_context():
     config.set_main_option('sqlalchemy.url', get_engine_url())
@@ -0,0 +1,30 @@
+"""Add cache stamps for dashboard fragments
+
+Revision ID: 1e6f0b9c4a27
+Revises: c52a9e0d7b31
+Create Date: 2026-10-18 23:05:41.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1e6f0b9c4a27'
+down_revision = 'c52a9e0d7b31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_stamp = op.create_table('cache_stamp',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_stamp, [{'name': name, 'version': 0}
+                                 for name in ('subjects', 'chapters', 'quizzes', 'scores')])
+
+
+def downgrade():
+    op.drop_table('cache_stamp')
@@ -0,0 +1,39 @@
+"""Add sort indexes for the paginated admin listings
+
+Revision ID: 3b9e4a7c2d15
+Revises: 5d2c8e71b0a4
+Create Date: 2026-10-18 20:14:36.902117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e4a7c2d15'
+down_revision = '5d2c8e71b0a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('subject', schema=None) as batch_op:
+        batch_op.create_index('ix_subject_name', ['name', 'id'], unique=False)
+
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.create_index('ix_chapter_name', ['name', 'id'], unique=False)
+        batch_op.create_index('ix_chapter_subject_name', ['subject_id', 'name', 'id'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_full_name', ['full_name', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_full_name')
+
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.drop_index('ix_chapter_subject_name')
+        batch_op.drop_index('ix_chapter_name')
+
+    with op.batch_alter_table('subject', schema=None) as batch_op:
+        batch_op.drop_index('ix_subject_name')
@@ -0,0 +1,47 @@
+"""Add user_stats leaderboard table
+
+Revision ID: 4f31a693f623
+Revises: 7ec54dd1e4b9
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f31a693f623'
+down_revision = '7ec54dd1e4b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('attempt_count', sa.Integer(), nullable=False),
+    sa.Column('percentage_sum', sa.Float(), nullable=False),
+    sa.Column('best_score', sa.Float(), nullable=False),
+    sa.Column('avg_score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('user_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_user_stats_rank', ['avg_score', 'user_id'], unique=False)
+
+    # Backfill from existing attempts
+    op.execute(
+        'INSERT INTO user_stats (user_id, attempt_count, percentage_sum, best_score, avg_score) '
+        'SELECT user_id, COUNT(id), '
+        'SUM(total_scored * 100.0 / total_questions), '
+        'MAX(total_scored * 100.0 / total_questions), '
+        'AVG(total_scored * 100.0 / total_questions) '
+        'FROM score GROUP BY user_id'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('user_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_stats_rank')
+
+    op.drop_table('user_stats')
@@ -0,0 +1,34 @@
+"""Widen password_hash columns for scrypt hashes
+
+Revision ID: 5d2c8e71b0a4
+Revises: a611b39f855e
+Create Date: 2026-10-18 17:52:10.418264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2c8e71b0a4'
+down_revision = 'a611b39f855e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('user', 'admin'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('password_hash',
+                                  existing_type=sa.String(length=128),
+                                  type_=sa.String(length=255),
+                                  existing_nullable=True)
+
+
+def downgrade():
+    for table in ('user', 'admin'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('password_hash',
+                                  existing_type=sa.String(length=255),
+                                  type_=sa.String(length=128),
+                                  existing_nullable=True)
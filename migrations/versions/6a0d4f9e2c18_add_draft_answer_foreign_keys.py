@@ -0,0 +1,34 @@
+"""Add foreign keys from draft answers to their quiz and user
+
+Revision ID: 6a0d4f9e2c18
+Revises: 1e6f0b9c4a27
+Create Date: 2026-10-19 09:41:27.530846
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6a0d4f9e2c18'
+down_revision = '1e6f0b9c4a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drafts left behind by quizzes deleted before drafts were removed with them
+    op.execute('DELETE FROM attempt_draft WHERE quiz_id NOT IN (SELECT id FROM quiz)')
+    op.execute(
+        'DELETE FROM draft_answer WHERE quiz_id NOT IN (SELECT id FROM quiz) '
+        'OR user_id NOT IN (SELECT id FROM "user")'
+    )
+
+    with op.batch_alter_table('draft_answer', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_draft_answer_quiz_id', 'quiz', ['quiz_id'], ['id'])
+        batch_op.create_foreign_key('fk_draft_answer_user_id', 'user', ['user_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('draft_answer', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_draft_answer_user_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_draft_answer_quiz_id', type_='foreignkey')
@@ -0,0 +1,50 @@
+"""Add hourly attempt rollups
+
+Revision ID: 8f47c1d3e2a9
+Revises: 3b9e4a7c2d15
+Create Date: 2026-10-18 21:02:48.317560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f47c1d3e2a9'
+down_revision = '3b9e4a7c2d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attempt_rollup',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('percentage_sum', sa.Float(), nullable=False),
+    sa.Column('time_taken_sum', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id', 'bucket')
+    )
+    with op.batch_alter_table('attempt_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_attempt_rollup_bucket', ['bucket'], unique=False)
+
+    # Backfill from existing attempts; buckets must match how the DateTime
+    # type stores hour starts
+    if op.get_bind().dialect.name == 'sqlite':
+        bucket = "strftime('%Y-%m-%d %H:00:00.000000', time_stamp_of_attempt)"
+    else:
+        bucket = "date_trunc('hour', time_stamp_of_attempt)"
+    op.execute(
+        'INSERT INTO attempt_rollup (quiz_id, bucket, attempts, percentage_sum, time_taken_sum) '
+        f'SELECT quiz_id, {bucket}, COUNT(id), '
+        'SUM(total_scored * 100.0 / total_questions), SUM(time_taken) '
+        f'FROM score GROUP BY quiz_id, {bucket}'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('attempt_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_attempt_rollup_bucket')
+
+    op.drop_table('attempt_rollup')
@@ -0,0 +1,46 @@
+"""Add packed per-attempt response storage
+
+Revision ID: 9064f5449949
+Revises: ef6b3d6019ad
+Create Date: 2026-10-18 12:41:09.870563
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9064f5449949'
+down_revision = 'ef6b3d6019ad'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('answer_key_snapshot',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('content_version', sa.Integer(), nullable=False),
+    sa.Column('question_ids', sa.LargeBinary(), nullable=False),
+    sa.Column('correct_options', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id', 'content_version')
+    )
+    op.create_table('attempt_response',
+    sa.Column('score_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('content_version', sa.Integer(), nullable=False),
+    sa.Column('answers', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id', 'content_version'], ['answer_key_snapshot.quiz_id', 'answer_key_snapshot.content_version'], ),
+    sa.ForeignKeyConstraint(['score_id'], ['score.id'], ),
+    sa.PrimaryKeyConstraint('score_id')
+    )
+    with op.batch_alter_table('attempt_response', schema=None) as batch_op:
+        batch_op.create_index('ix_attempt_response_quiz', ['quiz_id', 'content_version'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('attempt_response', schema=None) as batch_op:
+        batch_op.drop_index('ix_attempt_response_quiz')
+
+    op.drop_table('attempt_response')
+    op.drop_table('answer_key_snapshot')
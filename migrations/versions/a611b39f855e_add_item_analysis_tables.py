@@ -0,0 +1,51 @@
+"""Add item analysis tables
+
+Revision ID: a611b39f855e
+Revises: 9064f5449949
+Create Date: 2026-10-18 13:55:31.026814
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a611b39f855e'
+down_revision = '9064f5449949'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('item_analysis',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('attempt_count', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id')
+    )
+    op.create_table('question_stats',
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('p_value', sa.Float(), nullable=True),
+    sa.Column('discrimination', sa.Float(), nullable=True),
+    sa.Column('unanswered_count', sa.Integer(), nullable=False),
+    sa.Column('option1_count', sa.Integer(), nullable=False),
+    sa.Column('option2_count', sa.Integer(), nullable=False),
+    sa.Column('option3_count', sa.Integer(), nullable=False),
+    sa.Column('option4_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['question.id'], ),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.PrimaryKeyConstraint('question_id')
+    )
+    with op.batch_alter_table('question_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_question_stats_quiz_id'), ['quiz_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('question_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_question_stats_quiz_id'))
+
+    op.drop_table('question_stats')
+    op.drop_table('item_analysis')
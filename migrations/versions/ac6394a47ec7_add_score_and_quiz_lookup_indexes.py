@@ -0,0 +1,67 @@
+"""Add score and quiz lookup indexes and one attempt per user per quiz
+
+Revision ID: ac6394a47ec7
+Revises: 4f31a693f623
+Create Date: 2026-10-18 10:03:17.554021
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'ac6394a47ec7'
+down_revision = '4f31a693f623'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The unique constraint needs one attempt per (quiz, user). Duplicates are
+    # students' attempts, so they are not dropped here: stop and let an
+    # operator decide which to keep
+    duplicates = op.get_bind().exec_driver_sql(
+        'SELECT quiz_id, user_id, COUNT(id) FROM score '
+        'GROUP BY quiz_id, user_id HAVING COUNT(id) > 1 ORDER BY quiz_id, user_id'
+    ).fetchall()
+    if duplicates:
+        extra = sum(count - 1 for _, _, count in duplicates)
+        pairs = ', '.join(f'({quiz_id}, {user_id})' for quiz_id, user_id, _ in duplicates[:50])
+        if len(duplicates) > 50:
+            pairs += f', ... and {len(duplicates) - 50} more'
+        raise RuntimeError(
+            f'score has {extra} duplicate attempts across {len(duplicates)} (quiz_id, user_id) pairs: '
+            f'{pairs}. Archive or remove the extra rows and upgrade again.'
+        )
+
+    # Bring the leaderboard in line with rows removed by hand since the backfill
+    op.execute('DELETE FROM user_stats')
+    op.execute(
+        'INSERT INTO user_stats (user_id, attempt_count, percentage_sum, best_score, avg_score) '
+        'SELECT user_id, COUNT(id), '
+        'SUM(total_scored * 100.0 / total_questions), '
+        'MAX(total_scored * 100.0 / total_questions), '
+        'AVG(total_scored * 100.0 / total_questions) '
+        'FROM score GROUP BY user_id'
+    )
+
+    with op.batch_alter_table('score', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_score_quiz_user', ['quiz_id', 'user_id'])
+        batch_op.create_index('ix_score_user_attempt', ['user_id', 'time_stamp_of_attempt'], unique=False)
+        batch_op.create_index('ix_score_attempt_time', ['time_stamp_of_attempt'], unique=False)
+        batch_op.create_index('ix_score_quiz_result', ['quiz_id', 'total_scored', 'total_questions'], unique=False)
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.create_index('ix_quiz_chapter_date', ['chapter_id', 'date_of_quiz'], unique=False)
+        batch_op.create_index('ix_quiz_date', ['date_of_quiz'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_index('ix_quiz_date')
+        batch_op.drop_index('ix_quiz_chapter_date')
+
+    with op.batch_alter_table('score', schema=None) as batch_op:
+        batch_op.drop_index('ix_score_quiz_result')
+        batch_op.drop_index('ix_score_attempt_time')
+        batch_op.drop_index('ix_score_user_attempt')
+        batch_op.drop_constraint('uq_score_quiz_user', type_='unique')
@@ -0,0 +1,28 @@
+"""Declare the user_stats rank index in leaderboard order
+
+Revision ID: b7e5a2d9c341
+Revises: 6a0d4f9e2c18
+Create Date: 2026-10-19 10:12:53.208417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e5a2d9c341'
+down_revision = '6a0d4f9e2c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_stats_rank')
+        batch_op.create_index('ix_user_stats_rank', [sa.text('avg_score DESC'), 'user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_stats_rank')
+        batch_op.create_index('ix_user_stats_rank', ['avg_score', 'user_id'], unique=False)
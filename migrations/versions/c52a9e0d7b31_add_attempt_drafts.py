@@ -0,0 +1,46 @@
+"""Add autosaved attempt drafts
+
+Revision ID: c52a9e0d7b31
+Revises: 8f47c1d3e2a9
+Create Date: 2026-10-18 22:14:05.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52a9e0d7b31'
+down_revision = '8f47c1d3e2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attempt_draft',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('ends_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id', 'user_id')
+    )
+    with op.batch_alter_table('attempt_draft', schema=None) as batch_op:
+        batch_op.create_index('ix_attempt_draft_ends_at', ['ends_at'], unique=False)
+
+    op.create_table('draft_answer',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.Column('option', sa.SmallInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('quiz_id', 'user_id', 'question_id')
+    )
+
+
+def downgrade():
+    op.drop_table('draft_answer')
+    with op.batch_alter_table('attempt_draft', schema=None) as batch_op:
+        batch_op.drop_index('ix_attempt_draft_ends_at')
+
+    op.drop_table('attempt_draft')
@@ -0,0 +1,26 @@
+"""Add quiz content_version for cached quiz payloads
+
+Revision ID: ef6b3d6019ad
+Revises: ac6394a47ec7
+Create Date: 2026-10-18 11:20:45.302117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ef6b3d6019ad'
+down_revision = 'ac6394a47ec7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_column('content_version')